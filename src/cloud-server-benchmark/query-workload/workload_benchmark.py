@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+評論分析管線查詢負載測試
+
+以 data-clean 的 ReviewAnalysisManager 實際方法與 DatasetBuilder 核心資料集查詢
+組成負載，在指定並行數下重播並輸出 QPS 與延遲百分位數，用於評估主機規格
+與偵測結構變更造成的查詢變慢。
+
+使用方式:
+    python workload_benchmark.py seed --scale 1                 # 建立結構並填入 1 萬則評論
+    python workload_benchmark.py run --concurrency 1,4,16 --duration 60
+    python workload_benchmark.py run --mix fetch_food_relevance=10,core_dataset=1
+    python workload_benchmark.py list                           # 列出可用的查詢操作
+"""
+
+import argparse
+import glob
+import importlib.util
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_CLEAN_DIR = os.path.join(BENCH_DIR, '..', '..', 'data-clean')
+DATASET_QUERIES_PATH = os.path.join(BENCH_DIR, '..', '..', 'data-analysis', 'data', 'builders', 'queries.py')
+MIGRATIONS_DIR = os.path.join(DATA_CLEAN_DIR, 'docs', 'sql')
+
+# 01 建立資料庫與使用者，測試資料庫與帳號由 .env 指定
+SKIPPED_MIGRATIONS = ('01-database-user-setup.sql',)
+
+# 直接使用 data-clean 的管理器，負載 SQL 隨管線程式碼一起更新
+sys.path.insert(0, DATA_CLEAN_DIR)
+
+import mysql.connector
+from dotenv import load_dotenv
+from utils.database_manager import LABEL_SOURCE_GEMINI, DatabaseManager, ReviewAnalysisManager
+from utils.content_hash import content_hash
+from migrate_indexes import apply_index_migrations
+
+load_dotenv(os.path.join(BENCH_DIR, '.env'))
+
+BENCH_CONFIG = {
+    'host': os.getenv('BENCH_MYSQL_HOST', 'localhost'),
+    'port': int(os.getenv('BENCH_MYSQL_PORT', 3306)),
+    'user': os.getenv('BENCH_MYSQL_USER', 'bench_user'),
+    'password': os.getenv('BENCH_MYSQL_PASSWORD', 'bench_pass_2025'),
+    'database': os.getenv('BENCH_MYSQL_DATABASE', 'workload_bench_db'),
+    'charset': 'utf8mb4'
+}
+
+# 規模係數 1 的評論數
+REVIEWS_PER_SCALE = 10000
+SEED_CHUNK_SIZE = 1000
+MAX_CONCURRENCY = 32
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+# 合成評論的組成素材（包含大量重複的短評，貼近實際資料）
+SHORT_REVIEWS = ['好吃', '讚', '不錯', '人很多', '好逛', '推', '還可以', '東西便宜']
+DISHES = ['臭豆腐', '蚵仔煎', '大腸包小腸', '鹽酥雞', '珍珠奶茶', '烤玉米', '蔥油餅', '牛排', '地瓜球', '章魚燒']
+VENDORS = ['326臭臭鍋', '阿嬤蚵仔煎', '夜市牛排', '老王鹽酥雞', '無名攤']
+PHRASES = ['排隊很久', '價格實惠', '份量很多', '有點太鹹', '停車不方便', '會再來', '環境有點亂', '老闆很親切']
+SEARCH_IDS = [f'bench_search_{i}' for i in range(1, 6)]
+SENTIMENTS = ['positive', 'negative', 'neutral']
+COMPLETENESS = ['complete', 'partial', 'minimal']
+
+def synthetic_snippet(rng):
+    """產生一則合成評論內容，約 10% 為空白"""
+    roll = rng.random()
+    if roll < 0.1:
+        return rng.choice([None, '', '  '])
+    if roll < 0.35:
+        return rng.choice(SHORT_REVIEWS)
+    parts = [rng.choice(PHRASES) for _ in range(rng.randint(1, 3))]
+    if roll < 0.75:
+        parts.insert(0, f"{rng.choice(VENDORS)}的{rng.choice(DISHES)}{rng.choice(SHORT_REVIEWS)}")
+    return '，'.join(parts)
+
+def synthetic_labels(rng):
+    """依管線進度比例產生 (is_project_related, has_specific_food_mention, is_food_items_extracted)"""
+    if rng.random() < 0.4:
+        return None, None, False
+    if rng.random() < 0.6:
+        return False, None, False
+    if rng.random() < 0.3:
+        return True, None, False
+    if rng.random() < 0.5:
+        return True, False, False
+    return True, True, rng.random() < 0.6
+
+def connect():
+    """建立測試資料庫連線"""
+    return mysql.connector.connect(**BENCH_CONFIG)
+
+def insert_rows(cursor, table, columns, rows):
+    """以多列 INSERT 寫入一段資料"""
+    placeholders = ", ".join(["(" + ", ".join(["%s"] * len(columns)) + ")"] * len(rows))
+    params = [value for row in rows for value in row]
+    cursor.execute(f"INSERT INTO {table} ({', '.join(columns)}) VALUES {placeholders}", params)
+
+def load_migration_statements():
+    """
+    依檔名順序讀取 data-clean/docs/sql 的遷移腳本，取出建立結構的陳述式
+
+    去除註解（包含註解中的回滾腳本）後只保留 CREATE / ALTER，略過 USE、
+    驗證查詢與資料匯入；正式結構新增遷移腳本後 seed 會自動套用。
+
+    Returns:
+        tuple: (陳述式列表, 建立的資料表名稱列表)
+    """
+    statements = []
+    for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, '[0-9][0-9]-*.sql'))):
+        if os.path.basename(path) in SKIPPED_MIGRATIONS:
+            continue
+
+        with open(path, encoding='utf-8') as f:
+            sql = re.sub(r'/\*.*?\*/', '', f.read(), flags=re.S)
+        sql = '\n'.join(line for line in sql.splitlines() if not line.strip().startswith('--'))
+
+        for statement in sql.split(';'):
+            statement = statement.strip()
+            if statement and statement.split(None, 1)[0].upper() in ('CREATE', 'ALTER'):
+                statements.append(statement)
+
+    tables = [
+        match.group(1) for statement in statements
+        for match in [re.match(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?', statement, re.I)]
+        if match
+    ]
+    return statements, tables
+
+def seed_database(scale, seed=42):
+    """
+    建立資料表並填入合成資料
+
+    Args:
+        scale (float): 規模係數，1 = 10,000 則評論
+        seed (int): 亂數種子，相同參數產生相同資料
+    """
+    rng = random.Random(seed)
+    review_count = int(REVIEWS_PER_SCALE * scale)
+    base_date = datetime(2023, 1, 1)
+
+    statements, tables = load_migration_statements()
+
+    conn = connect()
+    cursor = conn.cursor()
+    try:
+        for table in reversed(tables):
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        for statement in statements:
+            cursor.execute(statement)
+        print(f"✓ 已套用 data-clean 遷移腳本（{len(tables)} 個資料表，{len(statements)} 個陳述式）")
+
+        start = time.perf_counter()
+        analysis_id = 0
+        item_count = 0
+        for chunk_start in range(1, review_count + 1, SEED_CHUNK_SIZE):
+            chunk_ids = range(chunk_start, min(chunk_start + SEED_CHUNK_SIZE, review_count + 1))
+            reviews, analyses, items = [], [], []
+
+            for review_id in chunk_ids:
+                snippet = synthetic_snippet(rng)
+                iso_date = base_date + timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60))
+                reviews.append((
+                    review_id, f"bench_{review_id}", rng.choice(SEARCH_IDS),
+                    rng.choice([1, 2, 3, 4, 5, None]), snippet, iso_date
+                ))
+
+                if not snippet or not snippet.strip():
+                    continue
+
+                analysis_id += 1
+                related, specific, extracted = synthetic_labels(rng)
+                analyses.append((
+                    analysis_id, review_id, snippet, content_hash(snippet), related, specific, extracted,
+                    None if related is None else LABEL_SOURCE_GEMINI, None if specific is None else LABEL_SOURCE_GEMINI
+                ))
+
+                if extracted:
+                    for _ in range(rng.randint(1, 4)):
+                        items.append((
+                            analysis_id, rng.choice(DISHES), rng.choice(VENDORS), rng.choice(PHRASES),
+                            f"{rng.randint(3, 20) * 10}元", rng.choice(SENTIMENTS), rng.choice(COMPLETENESS)
+                        ))
+
+            insert_rows(cursor, 'reviews',
+                        ('id', 'review_id', 'search_id', 'rating', 'snippet', 'iso_date'), reviews)
+            if analyses:
+                insert_rows(cursor, 'review_analysis',
+                            ('id', 'review_id', 'content', 'content_hash', 'is_project_related',
+                             'has_specific_food_mention', 'is_food_items_extracted',
+                             'is_project_related_source', 'has_specific_food_mention_source'), analyses)
+            if items:
+                insert_rows(cursor, 'extracted_food_items',
+                            ('review_id', 'dish_name', 'vendor_name', 'description', 'price',
+                             'rating_sentiment', 'data_completeness'), items)
+            item_count += len(items)
+            conn.commit()
+
+        elapsed = time.perf_counter() - start
+        print(f"✓ 已填入 {review_count} 則評論、{analysis_id} 則分析資料、{item_count} 個提取項目（{elapsed:.1f} 秒）")
+    finally:
+        cursor.close()
+        conn.close()
+
+    # 套用 migrate_indexes.py 的索引集合（並更新統計資訊），與正式環境的索引一致
+    created = apply_index_migrations(DatabaseManager(config=BENCH_CONFIG, use_pool=False))
+    print(f"✓ 已套用索引遷移（新建立 {created} 個索引）")
+
+def load_core_dataset_query():
+    """載入 data-analysis 的核心資料集查詢"""
+    spec = importlib.util.spec_from_file_location('dataset_queries', DATASET_QUERIES_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.CORE_DATASET_QUERY
+
+class WorkloadContext:
+    """負載操作共用的管理器與資料範圍"""
+
+    def __init__(self, concurrency):
+        self.manager = ReviewAnalysisManager(
+            config=BENCH_CONFIG,
+            maintain_counters=False,
+            use_pool=True,
+            pool_size=concurrency,
+            pool_name=f"workload_bench_{concurrency}"
+        )
+        row = self.manager.execute_query("SELECT COALESCE(MAX(id), 0) FROM review_analysis", fetch_all=False)
+        self.max_analysis_id = max(int(row[0]), 1)
+        self.core_dataset_query = load_core_dataset_query()
+
+    def random_ids(self, rng, count):
+        return rng.sample(range(1, self.max_analysis_id + 1), min(count, self.max_analysis_id))
+
+# 各操作對應管線中的一次資料庫互動
+
+def op_fetch_food_relevance(ctx, rng, worker):
+    ctx.manager.fetch_review_page('food_relevance', rng.randint(0, ctx.max_analysis_id), 15)
+
+def op_fetch_specific_food(ctx, rng, worker):
+    ctx.manager.fetch_review_page('specific_food', rng.randint(0, ctx.max_analysis_id), 15)
+
+def op_fetch_extraction(ctx, rng, worker):
+    ctx.manager.fetch_review_page('extraction', rng.randint(0, ctx.max_analysis_id), 10)
+
+def op_claim_and_release(ctx, rng, worker):
+    batch = ctx.manager.claim_review_batch('food_relevance', worker, 15, 600, rng.randint(0, ctx.max_analysis_id))
+    ctx.manager.release_leases(worker, [review_id for review_id, _ in batch])
+
+def op_update_food_relevance(ctx, rng, worker):
+    # 包含 None 讓待處理評論數維持穩定
+    ctx.manager.batch_update_food_relevance(
+        [(rng.choice((True, False, None)), review_id) for review_id in ctx.random_ids(rng, 15)],
+        source=LABEL_SOURCE_GEMINI
+    )
+
+def op_update_specific_food(ctx, rng, worker):
+    ctx.manager.batch_update_specific_food_mention(
+        [(rng.choice((True, False, None)), review_id) for review_id in ctx.random_ids(rng, 15)],
+        source=LABEL_SOURCE_GEMINI
+    )
+
+def op_save_extracted_items(ctx, rng, worker):
+    # 與 extract_food_items.py 批次模式相同：一批評論的項目與已提取標記在同一交易中寫入
+    results = [
+        (review_id, [
+            {
+                'dish_name': rng.choice(DISHES),
+                'vendor_name': rng.choice(VENDORS),
+                'description': rng.choice(PHRASES),
+                'rating_sentiment': rng.choice(SENTIMENTS),
+                'data_completeness': rng.choice(COMPLETENESS)
+            }
+            for _ in range(rng.randint(0, 3))
+        ])
+        for review_id in ctx.random_ids(rng, 5)
+    ]
+    ctx.manager.save_extraction_batch(results)
+
+def op_count_pending(ctx, rng, worker):
+    ctx.manager.count_pending_reviews(rng.choice(('food_relevance', 'specific_food', 'extraction')))
+
+def op_pipeline_statistics(ctx, rng, worker):
+    ctx.manager.get_pipeline_statistics()
+
+def op_core_dataset(ctx, rng, worker):
+    ctx.manager.execute_query(ctx.core_dataset_query)
+
+OPERATIONS = {
+    'fetch_food_relevance': op_fetch_food_relevance,
+    'fetch_specific_food': op_fetch_specific_food,
+    'fetch_extraction': op_fetch_extraction,
+    'claim_and_release': op_claim_and_release,
+    'update_food_relevance': op_update_food_relevance,
+    'update_specific_food': op_update_specific_food,
+    'save_extracted_items': op_save_extracted_items,
+    'count_pending': op_count_pending,
+    'pipeline_statistics': op_pipeline_statistics,
+    'core_dataset': op_core_dataset,
+}
+
+# 預設負載比例：以分頁讀取與批次更新為主，統計與資料集查詢偶爾出現
+DEFAULT_MIX = {
+    'fetch_food_relevance': 20,
+    'fetch_specific_food': 10,
+    'fetch_extraction': 5,
+    'claim_and_release': 5,
+    'update_food_relevance': 15,
+    'update_specific_food': 10,
+    'save_extracted_items': 10,
+    'count_pending': 3,
+    'pipeline_statistics': 1,
+    'core_dataset': 1,
+}
+
+def parse_mix(text):
+    """
+    解析負載比例字串
+
+    Args:
+        text (str): 例如 'fetch_food_relevance=10,core_dataset=1'，None 表示預設比例
+
+    Returns:
+        dict: {操作名稱: 權重}
+    """
+    if not text:
+        return dict(DEFAULT_MIX)
+
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"未知的操作: {name}（可用: {', '.join(OPERATIONS)}）")
+        mix[name] = float(weight) if weight else 1.0
+    return mix
+
+def percentile(sorted_values, pct):
+    """以最近排名法計算百分位數"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def summarize_latencies(latencies_ms, elapsed):
+    """整理單一操作或全部操作的延遲統計"""
+    values = sorted(latencies_ms)
+    return {
+        'count': len(values),
+        'qps': len(values) / elapsed if elapsed else 0.0,
+        'avg_ms': sum(values) / len(values) if values else 0.0,
+        'p50_ms': percentile(values, 50),
+        'p95_ms': percentile(values, 95),
+        'p99_ms': percentile(values, 99),
+        'max_ms': values[-1] if values else 0.0
+    }
+
+def run_workload(concurrency, duration, mix, warmup=5, seed=None):
+    """
+    在指定並行數下執行負載
+
+    Args:
+        concurrency (int): 同時執行的工作執行緒數
+        duration (int): 量測秒數
+        mix (dict): 操作權重
+        warmup (int): 暖機秒數（不計入結果）
+        seed (int): 亂數種子
+
+    Returns:
+        dict: 整體與各操作的 QPS、延遲百分位數及錯誤數
+    """
+    ctx = WorkloadContext(concurrency)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    measure_start = time.perf_counter() + warmup
+    deadline = measure_start + duration
+    results = [dict() for _ in range(concurrency)]
+    errors = [dict() for _ in range(concurrency)]
+
+    def worker(index):
+        rng = random.Random(None if seed is None else seed + index)
+        worker_id = f"workload-bench-{index}"
+        latencies = results[index]
+        failures = errors[index]
+        while True:
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            if start >= deadline:
+                return
+            try:
+                OPERATIONS[name](ctx, rng, worker_id)
+            except Exception as e:
+                failures[name] = failures.get(name, 0) + 1
+                if failures[name] == 1:
+                    print(f"  ✗ {name} 執行錯誤: {e}")
+                continue
+            end = time.perf_counter()
+            if start >= measure_start and end <= deadline:
+                latencies.setdefault(name, []).append((end - start) * 1000)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ReviewAnalysisManager.close_pools(ctx.manager.pool_name)
+
+    per_operation = {}
+    all_latencies = []
+    for name in names:
+        latencies = [value for worker_results in results for value in worker_results.get(name, [])]
+        all_latencies.extend(latencies)
+        per_operation[name] = summarize_latencies(latencies, duration)
+        per_operation[name]['errors'] = sum(worker_errors.get(name, 0) for worker_errors in errors)
+
+    return {
+        'concurrency': concurrency,
+        'duration': duration,
+        'overall': summarize_latencies(all_latencies, duration),
+        'operations': per_operation,
+        'connection_stats': ctx.manager.get_connection_stats()
+    }
+
+def print_result(result):
+    """輸出單一並行數的結果"""
+    overall = result['overall']
+    print(f"\n=== 並行數 {result['concurrency']}（{result['duration']} 秒）===")
+    print(f"整體: {overall['qps']:.1f} QPS，p50 {overall['p50_ms']:.2f} ms，"
+          f"p95 {overall['p95_ms']:.2f} ms，p99 {overall['p99_ms']:.2f} ms")
+    print(f"{'操作':<24}{'次數':>8}{'QPS':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}{'錯誤':>6}")
+    for name, stats in result['operations'].items():
+        print(f"{name:<24}{stats['count']:>8}{stats['qps']:>10.1f}{stats['p50_ms']:>10.2f}"
+              f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}{stats['errors']:>6}")
+    conn_stats = result['connection_stats']
+    print(f"取得連線平均 {conn_stats['avg_acquire_ms']:.2f} ms，最大 {conn_stats['max_acquire_ms']:.2f} ms")
+
+def save_results(results, label):
+    """將結果寫入 results/ 目錄"""
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = os.path.join(RESULTS_DIR, f"workload_{label}_{timestamp}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'config': {k: v for k, v in BENCH_CONFIG.items() if k != 'password'}, 'runs': results},
+                  f, ensure_ascii=False, indent=2)
+    return path
+
+def parse_args():
+    """解析命令列參數"""
+    parser = argparse.ArgumentParser(description='評論分析管線查詢負載測試')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = subparsers.add_parser('seed', help='建立資料表並填入合成資料')
+    seed_parser.add_argument('--scale', type=float, default=1, help='規模係數（1 = 10,000 則評論）')
+    seed_parser.add_argument('--seed', type=int, default=42, help='亂數種子')
+
+    run_parser = subparsers.add_parser('run', help='執行負載並輸出 QPS 與延遲百分位數')
+    run_parser.add_argument('--concurrency', default='1,4,16', help='並行數列表，以逗號分隔')
+    run_parser.add_argument('--duration', type=int, default=60, help='每個並行數的量測秒數')
+    run_parser.add_argument('--warmup', type=int, default=5, help='暖機秒數')
+    run_parser.add_argument('--mix', default=None, help='負載比例，例如 fetch_food_relevance=10,core_dataset=1')
+    run_parser.add_argument('--label', default='default', help='結果檔名標籤（例如主機規格）')
+    run_parser.add_argument('--seed', type=int, default=None, help='亂數種子')
+
+    subparsers.add_parser('list', help='列出可用的查詢操作與預設比例')
+    return parser.parse_args()
+
+def main():
+    """主要執行流程"""
+    args = parse_args()
+
+    if args.command == 'list':
+        for name in OPERATIONS:
+            print(f"{name:<24} 預設權重 {DEFAULT_MIX.get(name, 0)}")
+        return 0
+
+    if args.command == 'seed':
+        print(f"=== 填入測試資料（規模係數 {args.scale}）===")
+        seed_database(args.scale, args.seed)
+        return 0
+
+    mix = parse_mix(args.mix)
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+    if any(level < 1 or level > MAX_CONCURRENCY for level in levels):
+        raise ValueError(f"並行數需介於 1 到 {MAX_CONCURRENCY}（mysql-connector 連線池上限）")
+    print(f"=== 查詢負載測試 ({BENCH_CONFIG['host']}:{BENCH_CONFIG['port']}/{BENCH_CONFIG['database']}) ===")
+    print(f"負載比例: {', '.join(f'{name}={weight:g}' for name, weight in mix.items())}")
+
+    results = []
+    for concurrency in levels:
+        result = run_workload(concurrency, args.duration, mix, args.warmup, args.seed)
+        print_result(result)
+        results.append(result)
+
+    print(f"\n✓ 結果已儲存: {save_results(results, args.label)}")
+    return 0
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n✗ 使用者中斷測試")
+        sys.exit(1)
+    except Exception as e:
+        print(f"✗ 執行錯誤: {e}")
+        sys.exit(1)
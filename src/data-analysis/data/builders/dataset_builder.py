@@ -15,6 +15,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from config import ANALYSIS_CONFIG
 from data.connectors.database_connector import get_db_connector
+from data.builders.queries import CORE_DATASET_QUERY
 
 # 設定日誌
 logger = logging.getLogger(__name__)
@@ -40,26 +41,8 @@ class DatasetBuilder:
         """
         logger.info("開始建立核心資料集...")
 
-        # 核心資料集 SQL 查詢
-        query = """
-        SELECT
-            e.id as item_id,
-            e.dish_name,
-            e.vendor_name,
-            e.price,
-            e.rating_sentiment,
-            e.data_completeness,
-            r.rating,
-            r.iso_date
-        FROM extracted_food_items e
-        JOIN review_analysis ra ON e.review_id = ra.id
-        JOIN reviews r ON ra.review_id = r.id
-        WHERE r.rating IS NOT NULL
-        ORDER BY e.id
-        """
-
         try:
-            self.dataset = self.db.execute_query(query)
+            self.dataset = self.db.execute_query(CORE_DATASET_QUERY)
             logger.info(f"核心資料集建立完成，共 {len(self.dataset)} 筆記錄")
 
             # 整合商業標的資料
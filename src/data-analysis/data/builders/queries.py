@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+資料集查詢語句模組
+
+集中存放資料集建立使用的 SQL，不依賴 pandas 或資料庫套件，
+方便 data-clean 的索引遷移工具載入並以 EXPLAIN 驗證執行計畫
+"""
+
+# 核心資料集查詢
+# 關聯路徑：extracted_food_items.review_id → review_analysis.id → review_analysis.review_id → reviews.id
+CORE_DATASET_QUERY = """
+SELECT
+    e.id as item_id,
+    e.dish_name,
+    e.vendor_name,
+    e.price,
+    e.rating_sentiment,
+    e.data_completeness,
+    r.rating,
+    r.iso_date
+FROM extracted_food_items e
+JOIN review_analysis ra ON e.review_id = ra.id
+JOIN reviews r ON ra.review_id = r.id
+WHERE r.rating IS NOT NULL
+ORDER BY e.id
+"""
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+離線批次作業腳本
+
+大量回填（數十萬則評論）時改用 Gemini Batch API：將待處理評論依 token 預算
+打包成結構化批次 prompt，寫成 JSONL 請求檔後上傳並建立批次作業，輪詢完成後
+下載結果，再以集合式批次更新寫回 review_analysis。
+
+作業狀態記錄在 batch_jobs/<作業名稱>/manifest.json，每個分片（一個請求檔）
+依 written → submitted → succeeded → merged 前進，每一步完成後立即寫回；
+中斷後重新執行相同指令會從未完成的步驟繼續，已合併的分片不會重複寫入。
+
+使用方式:
+    python batch_job_runner.py run --job backfill-1 --stage food_relevance
+    python batch_job_runner.py create --job backfill-1 --stage food_relevance
+    python batch_job_runner.py submit --job backfill-1
+    python batch_job_runner.py poll --job backfill-1 --wait
+    python batch_job_runner.py merge --job backfill-1
+    python batch_job_runner.py status --job backfill-1
+
+離線測試（不連網、不消耗配額）:
+    python batch_job_runner.py fake-server --port 8765 --delay 5
+    GEMINI_BATCH_BASE_URL=http://127.0.0.1:8765 python batch_job_runner.py run --job test --stage food_relevance
+"""
+
+import argparse
+import json
+import sys
+from functools import partial
+from config import BATCH_JOBS, BATCH_PACKING
+from utils.async_gemini_client import STRUCTURED_OUTPUT_TOKENS_PER_ITEM
+from utils.batch_jobs import BatchApiClient, BatchJobManifest, build_request_line, parse_result_line, wait_for_batches
+from utils.batch_packer import TokenBatchPacker
+from utils.database_manager import LABEL_SOURCE_GEMINI, ReviewAnalysisManager, STAGE_LABEL_COLUMNS
+from utils.gemini_client import STRUCTURED_BATCH_CONFIG
+from prompts.base_prompts import parse_json_batch_response
+from prompts.food_relevance_prompts import get_food_relevance_batch_prompt, get_prompt_info as get_food_relevance_info
+from prompts.specific_food_prompts import get_specific_food_batch_prompt, get_prompt_info as get_specific_food_info
+
+MODEL_NAME = 'gemini-2.5-flash-lite'
+PAGE_SIZE = 1000
+
+STAGE_PROMPTS = {
+    'food_relevance': (get_food_relevance_batch_prompt, get_food_relevance_info),
+    'specific_food': (get_specific_food_batch_prompt, get_specific_food_info)
+}
+
+def write_shard(manifest, requests, last_review_id):
+    """
+    寫入一個分片的請求檔與鍵值對應檔，完成後才記錄到狀態檔
+
+    Args:
+        requests (list): [(key, prompt, review_ids), ...]
+        last_review_id (int): 分片中最後一則評論的 id（續傳位置）
+    """
+    shard = {'index': manifest.next_shard_index()}
+    with open(manifest.shard_path(shard, 'requests'), 'w', encoding='utf-8') as requests_file, \
+            open(manifest.shard_path(shard, 'keys'), 'w', encoding='utf-8') as keys_file:
+        for key, prompt, review_ids in requests:
+            line = build_request_line(key, prompt, STRUCTURED_BATCH_CONFIG)
+            requests_file.write(json.dumps(line, ensure_ascii=False) + '\n')
+            keys_file.write(json.dumps({'key': key, 'review_ids': review_ids}) + '\n')
+
+    review_count = sum(len(review_ids) for _, _, review_ids in requests)
+    shard = manifest.add_shard(len(requests), review_count, last_review_id)
+    print(f"✓ 分片 {shard['index']}: {len(requests)} 個請求，{review_count} 則評論")
+
+def create_requests(db_manager, manifest):
+    """
+    將待處理評論寫成請求檔（從上次寫入的最後一則評論之後繼續）
+
+    Returns:
+        int: 本次寫入的評論數
+    """
+    settings = manifest.settings
+    build_prompt, _ = STAGE_PROMPTS[settings['stage']]
+    packer = TokenBatchPacker(partial(build_prompt, structured=True), settings['token_budget'],
+                              settings['max_items'], STRUCTURED_OUTPUT_TOKENS_PER_ITEM)
+
+    remaining = settings.get('limit')
+    if remaining:
+        remaining -= sum(shard['reviews'] for shard in manifest.shards)
+        if remaining <= 0:
+            return 0
+
+    pages = db_manager.iter_review_batches(settings['stage'], PAGE_SIZE, start_after=manifest.data['last_review_id'])
+    requests = []
+    queued = 0
+    for batch in packer.pack(pages):
+        if remaining is not None:
+            if queued >= remaining:
+                break
+            batch = batch[:remaining - queued]
+        queued += len(batch)
+
+        key = f"{manifest.next_shard_index():04d}-{len(requests) + 1:06d}"
+        requests.append((key, build_prompt(batch, structured=True), [review_id for review_id, _ in batch]))
+
+        if len(requests) >= settings['requests_per_file']:
+            write_shard(manifest, requests, batch[-1][0])
+            requests = []
+
+    if requests:
+        write_shard(manifest, requests, requests[-1][2][-1])
+
+    manifest.data['creation_complete'] = True
+    manifest.save()
+    return queued
+
+def submit_shards(client, manifest):
+    """上傳尚未送出（或先前失敗）的分片並建立批次作業"""
+    for shard in manifest.shards_with_status('written', 'failed'):
+        display_name = f"{manifest.data['job_name']}-{shard['index']:04d}"
+        file_name = client.upload_file(manifest.shard_path(shard, 'requests'), display_name)
+        batch_name = client.create_batch(manifest.settings['model'], file_name, display_name)
+        manifest.update_shard(shard, status='submitted', file_name=file_name, batch_name=batch_name,
+                              attempts=shard['attempts'] + 1, remote_state=None)
+        print(f"✓ 分片 {shard['index']} 已送出: {batch_name}")
+
+def print_shard_update(shard):
+    """顯示分片狀態變化"""
+    if shard['status'] == 'succeeded':
+        print(f"✓ 分片 {shard['index']} 完成，結果已下載")
+    else:
+        print(f"✗ 分片 {shard['index']} 失敗（{shard.get('remote_state') or shard.get('error')}），可重新執行 submit")
+
+def load_shard_results(manifest, shard):
+    """
+    解析分片結果檔
+
+    Returns:
+        tuple: (更新列表 [(label, review_id), ...], 失敗請求數, 失敗評論數)
+    """
+    review_ids_by_key = {}
+    with open(manifest.shard_path(shard, 'keys'), encoding='utf-8') as f:
+        for line in f:
+            entry = json.loads(line)
+            review_ids_by_key[entry['key']] = entry['review_ids']
+
+    updates = []
+    answered = set()
+    with open(manifest.shard_path(shard, 'results'), encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            key, text, error = parse_result_line(line)
+            review_ids = review_ids_by_key.get(key)
+            if review_ids is None or key in answered:
+                continue
+            if error is None:
+                results, error = parse_json_batch_response(text, review_ids)
+                if results is not None:
+                    answered.add(key)
+                    updates.extend(zip(results, review_ids))
+                    continue
+            print(f"  請求 {key} 無法使用: {error}")
+
+    failed_keys = [key for key in review_ids_by_key if key not in answered]
+    failed_reviews = sum(len(review_ids_by_key[key]) for key in failed_keys)
+    return updates, len(failed_keys), failed_reviews
+
+def merge_shards(db_manager, manifest):
+    """
+    將已完成分片的結果以集合式批次更新寫回資料庫
+
+    Returns:
+        dict: 合併統計
+    """
+    column = STAGE_LABEL_COLUMNS[manifest.settings['stage']]
+    stats = {'shards': 0, 'updated': 0, 'failed_reviews': 0}
+
+    for shard in manifest.shards_with_status('succeeded'):
+        updates, failed_requests, failed_reviews = load_shard_results(manifest, shard)
+        if updates:
+            db_manager.bulk_update_labels(column, updates, source=LABEL_SOURCE_GEMINI)
+        manifest.update_shard(shard, status='merged', merged_reviews=len(updates),
+                              failed_requests=failed_requests, failed_reviews=failed_reviews)
+
+        stats['shards'] += 1
+        stats['updated'] += len(updates)
+        stats['failed_reviews'] += failed_reviews
+        print(f"✓ 分片 {shard['index']} 已合併: {len(updates)} 則評論，無法使用的請求 {failed_requests} 個")
+
+    # 將結果套用到相同內容的待處理評論
+    if stats['shards']:
+        try:
+            stats['fan_out'] = db_manager.fan_out_labels(manifest.settings['stage'])
+        except Exception as e:
+            print(f"✗ 相同內容標記套用失敗: {e}")
+    return stats
+
+def print_status(manifest):
+    """顯示作業狀態"""
+    settings = manifest.settings
+    print(f"=== 批次作業 {manifest.data['job_name']} ===")
+    print(f"處理階段: {settings['stage']}，模型: {settings['model']}，prompt 版本: {settings['prompt_version']}")
+    print(f"請求檔建立: {'完成' if manifest.data['creation_complete'] else '未完成'}"
+          f"（續傳位置 id > {manifest.data['last_review_id']}）")
+    for status, counts in manifest.get_summary().items():
+        if counts['shards']:
+            print(f"  {status}: {counts['shards']} 個分片，{counts['reviews']} 則評論")
+
+def open_job(args, create=False):
+    """
+    載入作業狀態檔，create=True 且作業不存在時建立新作業
+
+    Returns:
+        BatchJobManifest: 狀態檔
+    """
+    if BatchJobManifest.exists(args.job):
+        manifest = BatchJobManifest.load(args.job)
+        if create and args.stage and args.stage != manifest.settings['stage']:
+            raise ValueError(f"作業 {args.job} 的處理階段為 {manifest.settings['stage']}")
+        return manifest
+
+    if not create:
+        raise ValueError(f"找不到作業 {args.job}，請先執行 create 或 run")
+    if not args.stage:
+        raise ValueError("建立作業需要 --stage")
+
+    _, get_info = STAGE_PROMPTS[args.stage]
+    return BatchJobManifest.create(
+        args.job,
+        stage=args.stage,
+        model=args.model,
+        prompt_version=f"{args.stage}@{get_info()['version']}",
+        token_budget=args.token_budget or BATCH_PACKING['token_budget'],
+        max_items=args.max_batch_size or BATCH_PACKING['max_items'],
+        requests_per_file=args.requests_per_file,
+        limit=args.limit
+    )
+
+def main():
+    """主要執行流程"""
+    args = parse_args()
+
+    if args.command == 'fake-server':
+        from utils.fake_batch_server import FakeBatchServer
+        server = FakeBatchServer(port=args.port, delay=args.delay, error_rate=args.error_rate)
+        print(f"✓ fake 批次伺服器: {server.base_url}（作業 {args.delay} 秒後完成，Ctrl+C 結束）")
+        print(f"  設定 GEMINI_BATCH_BASE_URL={server.base_url} 後執行 batch_job_runner.py")
+        server.serve_forever()
+        return 0
+
+    manifest = open_job(args, create=args.command in ('create', 'run'))
+    if args.command == 'status':
+        print_status(manifest)
+        return 0
+
+    db_manager = ReviewAnalysisManager() if args.command in ('create', 'merge', 'run') else None
+    client = BatchApiClient() if args.command in ('submit', 'poll', 'run') else None
+
+    if args.command in ('create', 'run') and not manifest.data['creation_complete']:
+        written = create_requests(db_manager, manifest)
+        print(f"✓ 請求檔建立完成，本次寫入 {written} 則評論")
+
+    if args.command in ('submit', 'run'):
+        submit_shards(client, manifest)
+
+    if args.command in ('poll', 'run'):
+        interval = args.interval if args.command == 'run' or args.wait else None
+        wait_for_batches(client, manifest, interval, print_shard_update)
+
+    if args.command in ('merge', 'run'):
+        stats = merge_shards(db_manager, manifest)
+        print(f"✓ 合併 {stats['shards']} 個分片，更新 {stats['updated']} 則評論，"
+              f"套用相同內容 {stats.get('fan_out', 0)} 則")
+        if stats['failed_reviews']:
+            print(f"  {stats['failed_reviews']} 則評論沒有可用結果，維持待處理，可建立新作業或以同步腳本處理")
+
+    print_status(manifest)
+    return 1 if manifest.shards_with_status('failed') else 0
+
+def parse_args():
+    """解析命令列參數"""
+    parser = argparse.ArgumentParser(description='以 Gemini Batch API 離線處理大量評論')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    commands = {
+        'run': '依序執行 create、submit、poll --wait 與 merge（可中斷後重新執行）',
+        'create': '將待處理評論寫成 JSONL 請求檔',
+        'submit': '上傳請求檔並建立批次作業（包含先前失敗的分片）',
+        'poll': '查詢作業狀態並下載完成的結果',
+        'merge': '將下載的結果寫回資料庫',
+        'status': '顯示作業狀態'
+    }
+    for name, help_text in commands.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.add_argument('--job', required=True, help='作業名稱（batch_jobs/<作業名稱>）')
+        if name in ('create', 'run'):
+            subparser.add_argument('--stage', choices=sorted(STAGE_PROMPTS), default=None, help='處理階段')
+            subparser.add_argument('--model', default=MODEL_NAME, help='Gemini 模型名稱')
+            subparser.add_argument('--token-budget', type=int, default=None,
+                                   help='每個請求估算 token 上限（預設依 BATCH_TOKEN_BUDGET）')
+            subparser.add_argument('--max-batch-size', type=int, default=None,
+                                   help='每個請求最多評論數（預設依 BATCH_MAX_ITEMS）')
+            subparser.add_argument('--requests-per-file', type=int, default=BATCH_JOBS['requests_per_file'],
+                                   help='每個請求檔（分片）的請求數')
+            subparser.add_argument('--limit', type=int, default=None, help='最多寫入幾則評論')
+        if name in ('poll', 'run'):
+            subparser.add_argument('--interval', type=int, default=BATCH_JOBS['poll_interval'], help='輪詢間隔秒數')
+        if name == 'poll':
+            subparser.add_argument('--wait', action='store_true', help='持續輪詢直到所有分片完成或失敗')
+
+    fake_parser = subparsers.add_parser('fake-server', help='啟動本地 fake 批次伺服器（離線測試用）')
+    fake_parser.add_argument('--port', type=int, default=8765, help='監聽埠號')
+    fake_parser.add_argument('--delay', type=float, default=5.0, help='作業建立後幾秒完成')
+    fake_parser.add_argument('--error-rate', type=float, default=0.0, help='每個請求回傳錯誤的機率')
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n✗ 使用者中斷（重新執行相同指令即可從中斷處繼續）")
+        sys.exit(1)
+    except Exception as e:
+        print(f"✗ 執行錯誤: {e}")
+        sys.exit(1)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+批次標記更新效能比較腳本
+
+比較逐列 executemany 與集合式 UPDATE ... JOIN (VALUES ...) 兩種更新路徑。
+測試在獨立的 bench_review_labels 表上進行，不會修改 review_analysis。
+
+使用方式:
+    python benchmark_bulk_update.py            # 預設 10000 筆
+    python benchmark_bulk_update.py 50000      # 指定筆數
+"""
+
+import random
+import sys
+import time
+from utils.database_manager import DatabaseManager
+
+BENCH_TABLE = 'bench_review_labels'
+DEFAULT_ROWS = 10000
+SEED_CHUNK_SIZE = 1000
+
+def setup_bench_table(db_manager, row_count):
+    """建立並填入測試表"""
+    with db_manager.get_connection() as conn:
+        with db_manager.get_cursor(conn) as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+            cursor.execute(f"""
+                CREATE TABLE {BENCH_TABLE} (
+                    id BIGINT PRIMARY KEY,
+                    is_project_related BOOLEAN DEFAULT NULL
+                ) ENGINE=InnoDB
+            """)
+
+            for start in range(1, row_count + 1, SEED_CHUNK_SIZE):
+                ids = range(start, min(start + SEED_CHUNK_SIZE, row_count + 1))
+                placeholders = ", ".join(["(%s)"] * len(ids))
+                cursor.execute(f"INSERT INTO {BENCH_TABLE} (id) VALUES {placeholders}", list(ids))
+            conn.commit()
+
+def reset_labels(db_manager):
+    """將測試表的標記重設為 NULL"""
+    db_manager.execute_update(f"UPDATE {BENCH_TABLE} SET is_project_related = NULL")
+
+def drop_bench_table(db_manager):
+    """刪除測試表"""
+    db_manager.execute_update(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+
+def run_benchmark(row_count=DEFAULT_ROWS):
+    """執行比較並輸出結果"""
+    print(f"=== 批次標記更新效能比較 ({row_count} 筆) ===")
+
+    db_manager = DatabaseManager()
+    updates = [(random.choice((True, False)), review_id) for review_id in range(1, row_count + 1)]
+
+    try:
+        setup_bench_table(db_manager, row_count)
+        print(f"✓ 已建立測試表 {BENCH_TABLE}")
+
+        # 逐列 executemany
+        start = time.perf_counter()
+        db_manager.execute_batch_update(
+            f"UPDATE {BENCH_TABLE} SET is_project_related = %s WHERE id = %s",
+            updates
+        )
+        executemany_seconds = time.perf_counter() - start
+
+        reset_labels(db_manager)
+
+        # 集合式 UPDATE ... JOIN (VALUES ...)
+        start = time.perf_counter()
+        db_manager.bulk_update_column(BENCH_TABLE, 'is_project_related', updates)
+        bulk_seconds = time.perf_counter() - start
+
+        # 確認兩種路徑寫入相同結果
+        true_count = db_manager.execute_query(
+            f"SELECT COUNT(*) FROM {BENCH_TABLE} WHERE is_project_related = TRUE",
+            fetch_all=False
+        )[0]
+        expected_true = sum(1 for label, _ in updates if label)
+
+        print(f"\nexecutemany 逐列更新: {executemany_seconds:.3f} 秒 ({row_count / executemany_seconds:.0f} 列/秒)")
+        print(f"VALUES JOIN 集合更新: {bulk_seconds:.3f} 秒 ({row_count / bulk_seconds:.0f} 列/秒)")
+        print(f"加速倍數: {executemany_seconds / bulk_seconds:.1f}x")
+        print(f"結果檢查: {'一致' if true_count == expected_true else f'不一致 ({true_count} != {expected_true})'}")
+
+    finally:
+        drop_bench_table(db_manager)
+        print(f"\n✓ 已刪除測試表 {BENCH_TABLE}")
+
+if __name__ == "__main__":
+    try:
+        rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+        run_benchmark(rows)
+    except KeyboardInterrupt:
+        print("\n✗ 使用者中斷測試")
+    except Exception as e:
+        print(f"✗ 執行錯誤: {e}")
@@ -11,4 +11,62 @@ DATABASE_CONFIG = {
     'database': 'manager_reviews_db',
     'charset': 'utf8mb4',
     'auth_plugin': 'caching_sha2_password'
-}
\ No newline at end of file
+}
+
+# 連線池設定（DatabaseManager 預設使用連線池以避免每次查詢重新握手）
+POOL_CONFIG = {
+    'enabled': os.getenv('MYSQL_POOL_ENABLED', 'true').lower() == 'true',
+    'pool_name': 'manager_reviews_pool',
+    'pool_size': int(os.getenv('MYSQL_POOL_SIZE', 5)),
+    'health_check': True,       # 取出連線時先 ping，失效則自動重連
+    'acquire_timeout': 10       # 連線池耗盡時的最長等待秒數
+}
+
+# 標記更新時是否同步維護 review_analysis_counters（需先執行 docs/sql/09-create-pipeline-counters-table.sql）
+COUNTERS_ENABLED = os.getenv('PIPELINE_COUNTERS_ENABLED', 'false').lower() == 'true'
+
+# LLM 結果預寫日誌目錄（資料庫更新前先寫入本地，失敗時可重播）
+JOURNAL_DIR = os.getenv('LLM_JOURNAL_DIR', 'journal')
+
+# Gemini API 配額（AsyncGeminiClient 依此同時保留多個請求，付費方案請調高）
+GEMINI_RATE_LIMITS = {
+    'requests_per_minute': int(os.getenv('GEMINI_RPM', 15)),
+    'tokens_per_minute': int(os.getenv('GEMINI_TPM', 250000)),
+    'max_concurrency': int(os.getenv('GEMINI_MAX_CONCURRENCY', 4))
+}
+
+# 分類批次打包（依 prompt 與評論估算 token 數分批，取代固定每批 15 則）
+BATCH_PACKING = {
+    'token_budget': int(os.getenv('BATCH_TOKEN_BUDGET', 3000)),
+    'max_items': int(os.getenv('BATCH_MAX_ITEMS', 40))
+}
+
+# LLM 回應持久化快取（依模型、prompt 版本與內容雜湊保存每則評論的判別結果）
+LLM_CACHE = {
+    'enabled': os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true',
+    'path': os.getenv('LLM_CACHE_PATH', os.path.join('cache', 'llm_responses.sqlite3')),
+    'max_entries': int(os.getenv('LLM_CACHE_MAX_ENTRIES', 200000))
+}
+
+# 本地分類器（以既有 Gemini 標記訓練，只有低信心評論送交 Gemini）
+LOCAL_CLASSIFIER = {
+    'model_dir': os.getenv('LOCAL_MODEL_DIR', 'models'),
+    'target_accuracy': float(os.getenv('LOCAL_MODEL_TARGET_ACCURACY', 0.98))
+}
+
+# 離線批次作業（Gemini Batch API；GEMINI_BATCH_BASE_URL 可指向本地的 fake 批次伺服器）
+BATCH_JOBS = {
+    'dir': os.getenv('BATCH_JOB_DIR', 'batch_jobs'),
+    'base_url': os.getenv('GEMINI_BATCH_BASE_URL', ''),
+    'requests_per_file': int(os.getenv('BATCH_JOB_REQUESTS_PER_FILE', 5000)),
+    'poll_interval': int(os.getenv('BATCH_JOB_POLL_INTERVAL', 60))
+}
+
+# 多 API Key / 多模型路由（GEMINI_API_KEYS 或 GEMINI_MODELS 有多個值時啟用，每組 Key 與模型各自計算配額）
+GEMINI_ROUTER = {
+    'api_keys': [key.strip() for key in os.getenv('GEMINI_API_KEYS', '').split(',') if key.strip()],
+    'models': [model.strip() for model in os.getenv('GEMINI_MODELS', '').split(',') if model.strip()],
+    'requests_per_day': int(os.getenv('GEMINI_RPD', 1000)),
+    'model_limits': os.getenv('GEMINI_MODEL_LIMITS', ''),  # 例如 gemini-2.5-flash=10/250000/250（RPM/TPM/RPD）
+    'state_path': os.getenv('GEMINI_QUOTA_STATE_PATH', os.path.join('cache', 'gemini_quota.json'))
+}
@@ -0,0 +1,45 @@
+-- =====================================================
+-- Manager專案 - 建立資料匯入進度檢查點表
+-- 適用於 MySQL 9.4.0
+-- 執行環境：phpMyAdmin (可使用 manager_reviews_user 執行)
+-- 前置條件：需先執行 01-02 的建表腳本
+-- =====================================================
+
+-- 切換到專案資料庫
+USE manager_reviews_db;
+
+-- =====================================================
+-- 建立 import_progress 表 - 匯入進度檢查點
+-- =====================================================
+
+-- import_data.py 每提交一個分段就更新一次本表
+-- 中斷後重新執行時會從 rows_imported 之後繼續匯入
+CREATE TABLE IF NOT EXISTS import_progress (
+    source_file VARCHAR(255) PRIMARY KEY COMMENT '原始 JSON 檔案名稱',
+    search_id VARCHAR(50) COMMENT '關聯搜尋記錄的業務識別碼',
+    rows_imported INT NOT NULL DEFAULT 0 COMMENT '已提交的評論筆數',
+    total_rows INT NOT NULL DEFAULT 0 COMMENT '檔案內評論總筆數',
+    status ENUM('in_progress', 'completed') NOT NULL DEFAULT 'in_progress' COMMENT '匯入狀態',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '最後更新時間'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='資料匯入進度表 - 記錄各檔案已提交的評論筆數';
+
+-- =====================================================
+-- 驗證表格建立
+-- =====================================================
+
+DESCRIBE import_progress;
+
+-- 查看匯入進度
+SELECT source_file, rows_imported, total_rows, status, updated_at
+FROM import_progress
+ORDER BY source_file;
+
+-- =====================================================
+-- 重新完整匯入（如需要）
+-- =====================================================
+
+/*
+-- 清除檢查點後 import_data.py 會從頭匯入所有檔案
+TRUNCATE TABLE import_progress;
+*/
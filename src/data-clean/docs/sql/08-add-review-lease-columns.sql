@@ -0,0 +1,53 @@
+-- =====================================================
+-- Manager專案 - 新增評論處理租約欄位
+-- 適用於 MySQL 9.4.0
+-- 執行環境：phpMyAdmin (可使用 manager_reviews_user 執行)
+-- 前置條件：需先執行 01-05 的建表腳本
+-- =====================================================
+
+-- 切換到專案資料庫
+USE manager_reviews_db;
+
+-- =====================================================
+-- 新增租約欄位到 review_analysis 表
+-- =====================================================
+
+-- 多個分析程序以 SELECT ... FOR UPDATE SKIP LOCKED 認領批次後，
+-- 寫入租約擁有者與到期時間；到期未完成的租約可被其他程序重新認領
+ALTER TABLE review_analysis
+ADD COLUMN lease_owner VARCHAR(64) DEFAULT NULL
+COMMENT '目前認領此評論的處理程序（NULL=未被認領）'
+AFTER is_food_items_extracted,
+ADD COLUMN lease_expires_at DATETIME DEFAULT NULL
+COMMENT '租約到期時間（到期後可被重新認領）'
+AFTER lease_owner;
+
+-- =====================================================
+-- 驗證欄位新增
+-- =====================================================
+
+DESCRIBE review_analysis;
+
+-- 查看目前有效的租約
+SELECT lease_owner, COUNT(*) as leased_count, MIN(lease_expires_at) as earliest_expiry
+FROM review_analysis
+WHERE lease_expires_at > NOW()
+GROUP BY lease_owner;
+
+-- =====================================================
+-- 清除所有租約（如需要）
+-- =====================================================
+
+/*
+UPDATE review_analysis
+SET lease_owner = NULL, lease_expires_at = NULL
+WHERE lease_owner IS NOT NULL;
+*/
+
+-- =====================================================
+-- 回滾腳本（如需要）
+-- =====================================================
+
+/*
+ALTER TABLE review_analysis DROP COLUMN lease_expires_at, DROP COLUMN lease_owner;
+*/
@@ -0,0 +1,53 @@
+-- =====================================================
+-- Manager專案 - 建立管線進度計數器表
+-- 適用於 MySQL 9.4.0
+-- 執行環境：phpMyAdmin (可使用 manager_reviews_user 執行)
+-- 前置條件：需先執行 01-05 的建表腳本
+-- =====================================================
+
+-- 切換到專案資料庫
+USE manager_reviews_db;
+
+-- =====================================================
+-- 建立 review_analysis_counters 表 - 各標記值的計數
+-- =====================================================
+
+-- 設定 PIPELINE_COUNTERS_ENABLED=true 後，ReviewAnalysisManager 的批次標記更新
+-- 會在同一交易中依舊值與新值調整計數，儀表板可直接讀取本表而不掃描 review_analysis
+-- counter_key 格式：'total' 或 '<標記欄位>:null|true|false'
+-- 每個鍵值分成多個分片列，每次更新隨機寫入其中一列，並行的標記更新不會鎖定同一列；
+-- 實際筆數為同一鍵值所有分片的加總
+CREATE TABLE IF NOT EXISTS review_analysis_counters (
+    counter_key VARCHAR(64) NOT NULL COMMENT '計數器鍵值',
+    shard TINYINT UNSIGNED NOT NULL DEFAULT 0 COMMENT '分片編號（0-15）',
+    count BIGINT NOT NULL DEFAULT 0 COMMENT '本分片的累計增減量',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '最後更新時間',
+    PRIMARY KEY (counter_key, shard)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='管線進度計數器表 - 依標記更新增量維護';
+
+-- =====================================================
+-- 初始化計數器
+-- =====================================================
+
+-- 建表後請執行一次以掃描 review_analysis 建立初始值：
+--   python pipeline_stats.py --refresh-counters
+
+-- =====================================================
+-- 驗證表格建立
+-- =====================================================
+
+DESCRIBE review_analysis_counters;
+
+SELECT counter_key, SUM(count) as count, COUNT(*) as shards, MAX(updated_at) as updated_at
+FROM review_analysis_counters
+GROUP BY counter_key
+ORDER BY counter_key;
+
+-- =====================================================
+-- 回滾腳本（如需要）
+-- =====================================================
+
+/*
+DROP TABLE IF EXISTS review_analysis_counters;
+*/
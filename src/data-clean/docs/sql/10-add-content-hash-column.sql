@@ -0,0 +1,66 @@
+-- =====================================================
+-- Manager專案 - 新增評論內容雜湊欄位
+-- 適用於 MySQL 9.4.0
+-- 執行環境：phpMyAdmin (可使用 manager_reviews_user 執行)
+-- 前置條件：需先執行 03-create-review-filter-table.sql
+-- =====================================================
+
+-- 切換到專案資料庫
+USE manager_reviews_db;
+
+-- =====================================================
+-- 新增 content_hash 欄位
+-- =====================================================
+
+-- 正規化內容（NFKC、忽略大小寫、合併空白）的 SHA-256，由 utils/content_hash.py 計算
+-- 分析腳本每種內容只送一則代表評論給 LLM，再以集合式 UPDATE 套用到相同雜湊的評論
+ALTER TABLE review_analysis
+ADD COLUMN content_hash CHAR(64) NULL DEFAULT NULL
+COMMENT '正規化評論內容的 SHA-256（NULL=尚未計算）'
+AFTER content;
+
+-- 針對 content_hash 建立索引（標記擴散與重複內容統計用）
+CREATE INDEX idx_review_analysis_content_hash ON review_analysis(content_hash)
+COMMENT '基於內容雜湊的重複內容索引';
+
+-- =====================================================
+-- 計算既有評論的雜湊
+-- =====================================================
+
+-- 正規化規則需與 Python 一致，請勿以 SQL 的 SHA2() 直接計算；建欄後執行：
+--   python sync_review_analysis.py
+-- 同步腳本每次執行都會補齊 content_hash 為 NULL 的評論
+
+-- =====================================================
+-- 驗證欄位新增
+-- =====================================================
+
+DESCRIBE review_analysis;
+
+-- 檢查雜湊計算進度
+SELECT
+    COUNT(*) as total_reviews,
+    SUM(content_hash IS NULL) as pending_hashes,
+    COUNT(DISTINCT content_hash) as distinct_contents
+FROM review_analysis;
+
+-- 重複次數最多的內容
+SELECT
+    content_hash,
+    COUNT(*) as duplicates,
+    LEFT(MIN(content), 50) as content_preview
+FROM review_analysis
+WHERE content_hash IS NOT NULL
+GROUP BY content_hash
+HAVING COUNT(*) > 1
+ORDER BY duplicates DESC
+LIMIT 10;
+
+-- =====================================================
+-- 回滾腳本（如需要）
+-- =====================================================
+
+/*
+DROP INDEX idx_review_analysis_content_hash ON review_analysis;
+ALTER TABLE review_analysis DROP COLUMN content_hash;
+*/
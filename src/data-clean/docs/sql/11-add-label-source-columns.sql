@@ -0,0 +1,70 @@
+-- =====================================================
+-- Manager專案 - 新增判別標記來源欄位
+-- 適用於 MySQL 9.4.0
+-- 執行環境：phpMyAdmin (可使用 manager_reviews_user 執行)
+-- 前置條件：需先執行 04-add-specific-food-column.sql
+-- =====================================================
+
+-- 切換到專案資料庫
+USE manager_reviews_db;
+
+-- =====================================================
+-- 新增標記來源欄位
+-- =====================================================
+
+-- 每個判別標記記錄寫入者：gemini（含回應快取與批次作業）、local（本地分類器）、
+-- lexicon（詞彙比對）、fan_out（相同內容擴散）；NULL 表示來源未知
+-- train_local_classifier.py 只以 gemini 標記訓練，本地分類器不會學習自己的輸出
+ALTER TABLE review_analysis
+ADD COLUMN is_project_related_source ENUM('gemini', 'local', 'lexicon', 'fan_out') NULL DEFAULT NULL
+COMMENT '食物相關性標記來源（NULL=未判別或來源未知）'
+AFTER is_project_related,
+ADD COLUMN has_specific_food_mention_source ENUM('gemini', 'local', 'lexicon', 'fan_out') NULL DEFAULT NULL
+COMMENT '具體食物提及標記來源（NULL=未判別或來源未知）'
+AFTER has_specific_food_mention;
+
+-- =====================================================
+-- 既有標記的來源
+-- =====================================================
+
+-- 建欄前只有 Gemini 判別（含回應快取與批次作業）會寫入標記；本地分類器、詞彙比對與
+-- 內容擴散都在本欄位之後才加入，且寫入時需要本欄位，因此既有標記一律回填為 gemini，
+-- 升級後的資料庫即可直接以既有標記訓練本地分類器
+UPDATE review_analysis
+SET is_project_related_source = 'gemini'
+WHERE is_project_related IS NOT NULL AND is_project_related_source IS NULL;
+
+UPDATE review_analysis
+SET has_specific_food_mention_source = 'gemini'
+WHERE has_specific_food_mention IS NOT NULL AND has_specific_food_mention_source IS NULL;
+
+-- =====================================================
+-- 驗證欄位新增
+-- =====================================================
+
+DESCRIBE review_analysis;
+
+-- 各來源的標記數
+SELECT
+    is_project_related_source,
+    COUNT(*) as labeled_reviews
+FROM review_analysis
+WHERE is_project_related IS NOT NULL
+GROUP BY is_project_related_source;
+
+SELECT
+    has_specific_food_mention_source,
+    COUNT(*) as labeled_reviews
+FROM review_analysis
+WHERE has_specific_food_mention IS NOT NULL
+GROUP BY has_specific_food_mention_source;
+
+-- =====================================================
+-- 回滾腳本（如需要）
+-- =====================================================
+
+/*
+ALTER TABLE review_analysis
+DROP COLUMN is_project_related_source,
+DROP COLUMN has_specific_food_mention_source;
+*/
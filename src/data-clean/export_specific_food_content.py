@@ -1,42 +1,180 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+"""
+具體食物評論串流匯出腳本
 
-import mysql.connector
-from config import DATABASE_CONFIG
+以 keyset 分頁逐批讀取 has_specific_food_mention = 1 的評論，分段寫出
+Markdown、JSONL 或 Parquet，記憶體用量與資料量無關。
+
+使用方式:
+    python export_specific_food_content.py                          # 與舊版相同的 specific_food_mentions.md
+    python export_specific_food_content.py --format jsonl --output mentions.jsonl
+    python export_specific_food_content.py --format parquet --since 2024-01-01 --until 2024-12-31
+    python export_specific_food_content.py --search-id yongda_night_market_2025 --extracted no
+"""
+
+import argparse
+import json
+from datetime import datetime
+from utils.database_manager import DatabaseManager
+
+EXPORT_COLUMNS = ('id', 'review_id', 'search_id', 'rating', 'iso_date', 'is_food_items_extracted', 'content')
+
+DEFAULT_OUTPUTS = {
+    'markdown': 'specific_food_mentions.md',
+    'jsonl': 'specific_food_mentions.jsonl',
+    'parquet': 'specific_food_mentions.parquet'
+}
+
+def build_filters(args):
+    """
+    依命令列參數建立篩選條件
+
+    Returns:
+        tuple: (where_clause, params)
+    """
+    conditions = ["ra.has_specific_food_mention = 1"]
+    params = []
+
+    if args.since:
+        conditions.append("r.iso_date >= %s")
+        params.append(args.since)
+    if args.until:
+        conditions.append("r.iso_date < %s + INTERVAL 1 DAY")
+        params.append(args.until)
+    if args.search_id:
+        conditions.append("r.search_id = %s")
+        params.append(args.search_id)
+    if args.extracted == 'yes':
+        conditions.append("ra.is_food_items_extracted = TRUE")
+    elif args.extracted == 'no':
+        conditions.append("(ra.is_food_items_extracted = FALSE OR ra.is_food_items_extracted IS NULL)")
+
+    return " AND ".join(conditions), params
+
+def iter_export_pages(db_manager, where_clause, params, batch_size):
+    """逐頁產生匯出資料"""
+    return db_manager.iter_keyset_pages(
+        select_clause="""
+            ra.id, ra.review_id, r.search_id, r.rating, r.iso_date,
+            ra.is_food_items_extracted, ra.content
+        """,
+        from_clause="review_analysis ra LEFT JOIN reviews r ON ra.review_id = r.id",
+        id_column="ra.id",
+        where_clause=where_clause,
+        params=params,
+        batch_size=batch_size
+    )
+
+def to_record(row):
+    """將資料列轉為可序列化的 dict"""
+    record = dict(zip(EXPORT_COLUMNS, row))
+    if record['rating'] is not None:
+        record['rating'] = float(record['rating'])
+    if isinstance(record['iso_date'], datetime):
+        record['iso_date'] = record['iso_date'].isoformat(sep=' ')
+    if record['is_food_items_extracted'] is not None:
+        record['is_food_items_extracted'] = bool(record['is_food_items_extracted'])
+    return record
+
+class MarkdownWriter:
+    """編號 Markdown 輸出（與舊版格式相同）"""
+
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.count = 0
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.count += 1
+            self.file.write(f"{self.count}. {row[-1]}\n\n")
+
+    def close(self):
+        self.file.close()
+
+class JsonlWriter:
+    """每行一筆 JSON 的輸出"""
+
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.file.write(json.dumps(to_record(row), ensure_ascii=False) + '\n')
+
+    def close(self):
+        self.file.close()
+
+class ParquetWriter:
+    """每頁寫成一個 row group 的 Parquet 輸出（需安裝 pyarrow）"""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("匯出 Parquet 需要 pyarrow，請先執行 pip install pyarrow")
+
+        self.pa = pa
+        self.schema = pa.schema([
+            ('id', pa.int64()),
+            ('review_id', pa.int64()),
+            ('search_id', pa.string()),
+            ('rating', pa.float64()),
+            ('iso_date', pa.string()),
+            ('is_food_items_extracted', pa.bool_()),
+            ('content', pa.string())
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write_rows(self, rows):
+        records = [to_record(row) for row in rows]
+        table = self.pa.Table.from_pylist(records, schema=self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+WRITERS = {
+    'markdown': MarkdownWriter,
+    'jsonl': JsonlWriter,
+    'parquet': ParquetWriter
+}
+
+def parse_args():
+    """解析命令列參數"""
+    parser = argparse.ArgumentParser(description='串流匯出具體食物評論')
+    parser.add_argument('--format', choices=sorted(WRITERS), default='markdown', help='輸出格式')
+    parser.add_argument('--output', default=None, help='輸出檔案路徑')
+    parser.add_argument('--since', default=None, help='評論日期起（YYYY-MM-DD，含）')
+    parser.add_argument('--until', default=None, help='評論日期迄（YYYY-MM-DD，含）')
+    parser.add_argument('--search-id', default=None, help='只匯出指定 search_id 的評論')
+    parser.add_argument('--extracted', choices=['yes', 'no', 'any'], default='any',
+                        help='依結構化提取狀態篩選')
+    parser.add_argument('--batch-size', type=int, default=1000, help='每批讀取筆數')
+    return parser.parse_args()
 
 def export_specific_food_content():
+    args = parse_args()
+    output = args.output or DEFAULT_OUTPUTS[args.format]
+
     try:
-        # 連接資料庫
-        connection = mysql.connector.connect(**DATABASE_CONFIG)
-        cursor = connection.cursor()
-
-        # 查詢 has_specific_food_mention = 1 的內容
-        query = """
-        SELECT content
-        FROM review_analysis
-        WHERE has_specific_food_mention = 1
-        ORDER BY id
-        """
-
-        cursor.execute(query)
-        results = cursor.fetchall()
-
-        # 寫入 md 檔案
-        with open('specific_food_mentions.md', 'w', encoding='utf-8') as f:
-            for i, (content,) in enumerate(results, 1):
-                f.write(f"{i}. {content}\n\n")
-
-        print(f"已匯出 {len(results)} 則具體食物評論到 specific_food_mentions.md")
-
-    except mysql.connector.Error as err:
-        print(f"資料庫錯誤: {err}")
+        db_manager = DatabaseManager()
+        where_clause, params = build_filters(args)
+
+        writer = WRITERS[args.format](output)
+        total = 0
+        try:
+            for rows in iter_export_pages(db_manager, where_clause, params, args.batch_size):
+                writer.write_rows(rows)
+                total += len(rows)
+        finally:
+            writer.close()
+
+        print(f"已匯出 {total} 則具體食物評論到 {output}")
+
     except Exception as e:
         print(f"執行錯誤: {e}")
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'connection' in locals():
-            connection.close()
 
 if __name__ == "__main__":
-    export_specific_food_content()
\ No newline at end of file
+    export_specific_food_content()
@@ -1,16 +1,35 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+"""
+結構化食物項目提取腳本
+
+預設將多則評論打包成一個以評論 id 標示的 prompt，要求 JSON 陣列回應，
+每批的提取項目與已提取標記在同一個交易中寫入；速率由客戶端的 RPM/TPM
+限制器控制。--single 保留逐則提取的方式以便比較。
 
-import mysql.connector
-import google.generativeai as genai
+使用方式:
+    python extract_food_items.py
+    python extract_food_items.py --token-budget 8000 --max-batch-size 20
+    python extract_food_items.py --single
+"""
+
+import argparse
 import json
-import time
 import logging
-from config import DATABASE_CONFIG
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+import time
+from functools import partial
+from utils.database_manager import ReviewAnalysisManager
+from utils.async_gemini_client import create_async_gemini_client
+from utils.batch_packer import TokenBatchPacker
+from utils.batch_pipeline import BatchPipeline
+from prompts.extraction_prompts import (
+    EXTRACTION_RESPONSE_SCHEMA,
+    clean_extracted_item,
+    get_extraction_batch_prompt,
+    get_extraction_single_prompt,
+    get_prompt_info,
+    parse_extraction_batch_response
+)
 
 # 設定日誌
 logging.basicConfig(
@@ -22,67 +41,38 @@ logging.basicConfig(
     ]
 )
 
-# 設定 Gemini API
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-model = genai.GenerativeModel('gemini-2.5-flash-lite')
+MODEL_NAME = 'gemini-2.5-flash-lite'
 
-# 提取 Prompt 模板
-EXTRACTION_PROMPT = """
-從評論中提取食物相關資訊，返回JSON格式。
+# 逐則模式每頁評論數與每則評論的預估回應 token 數
+PAGE_SIZE = 10
+EXTRACTION_OUTPUT_TOKENS = 300
 
-評論：{content}
+# 批次模式設定
+TOKEN_BUDGET = 6000
+MAX_BATCH_SIZE = 15
+OUTPUT_TOKENS_PER_REVIEW = 150
 
-請提取：
-- dish_name: 料理名稱（如：臭豆腐）
-- vendor_name: 店家名稱（如：326臭臭鍋）
-- description: 描述內容
-- price: 價格（如：40元）
-- rating_sentiment: positive/negative/neutral
-- data_completeness: complete/partial/minimal
+EXTRACTION_GENERATION_CONFIG = {
+    'response_mime_type': 'application/json',
+    'response_schema': EXTRACTION_RESPONSE_SCHEMA
+}
 
-返回格式：
-{{"items": [{{"dish_name": "料理名稱", "vendor_name": "店家名稱", "description": "描述", "price": "價格", "rating_sentiment": "positive", "data_completeness": "partial"}}]}}
+def submit_extraction(client, content):
+    """
+    送出單則評論的提取請求，不等待回應
 
-如果沒有項目，返回：{{"items": []}}
-"""
+    Returns:
+        concurrent.futures.Future: API 回應文字
+    """
+    prompt = get_extraction_single_prompt(content)
+    return client.submit_content(prompt, EXTRACTION_OUTPUT_TOKENS)
 
-def get_pending_reviews(batch_size=10):
-    """取得待處理的評論"""
+def parse_extraction_response(response_text):
+    """解析 LLM 提取回應為食物項目列表"""
+    raw_text = response_text
     try:
-        connection = mysql.connector.connect(**DATABASE_CONFIG)
-        cursor = connection.cursor()
-
-        query = """
-        SELECT id, content
-        FROM review_analysis
-        WHERE has_specific_food_mention = TRUE
-            AND (is_food_items_extracted = FALSE OR is_food_items_extracted IS NULL)
-        ORDER BY id
-        LIMIT %s
-        """
-
-        cursor.execute(query, (batch_size,))
-        results = cursor.fetchall()
-
-        return results
-
-    except mysql.connector.Error as err:
-        logging.error(f"資料庫查詢錯誤: {err}")
-        return []
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'connection' in locals():
-            connection.close()
-
-def extract_food_items_with_llm(content):
-    """使用 LLM 提取食物項目"""
-    try:
-        prompt = EXTRACTION_PROMPT.format(content=content)
-        response = model.generate_content(prompt)
-
         # 清理回應內容，移除可能的 markdown 格式
-        response_text = response.text.strip()
+        response_text = response_text.strip()
         if response_text.startswith('```json'):
             response_text = response_text[7:]
         if response_text.endswith('```'):
@@ -97,148 +87,136 @@ def extract_food_items_with_llm(content):
             logging.warning(f"LLM 回應格式錯誤，缺少 items 欄位")
             return []
 
-        return result['items']
+        return [item for item in map(clean_extracted_item, result['items']) if item]
 
     except json.JSONDecodeError as e:
         logging.error(f"JSON 解析錯誤: {e}")
         logging.error(f"清理後的回應: {response_text}")
-        logging.error(f"原始回應: {response.text}")
-        return []
-    except Exception as e:
-        logging.error(f"LLM 提取錯誤: {e}")
+        logging.error(f"原始回應: {raw_text}")
         return []
 
-def save_extracted_items(review_id, items):
-    """儲存提取的食物項目到資料庫"""
-    connection = None
+def collect_extraction(future):
+    """等待提取回應並解析，API 錯誤時返回 None（評論留待下次執行）"""
     try:
-        connection = mysql.connector.connect(**DATABASE_CONFIG)
-        cursor = connection.cursor()
-
-        # 開始事務
-        connection.start_transaction()
-
-        # 插入提取的項目
-        insert_query = """
-        INSERT INTO extracted_food_items
-        (review_id, dish_name, vendor_name, description, price, rating_sentiment, data_completeness)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """
-
-        for item in items:
-            cursor.execute(insert_query, (
-                review_id,
-                item.get('dish_name'),
-                item.get('vendor_name'),
-                item.get('description'),
-                item.get('price'),
-                item.get('rating_sentiment'),
-                item.get('data_completeness', 'partial')
-            ))
-
-        # 更新處理狀態
-        update_query = """
-        UPDATE review_analysis
-        SET is_food_items_extracted = TRUE
-        WHERE id = %s
-        """
-        cursor.execute(update_query, (review_id,))
-
-        # 提交事務
-        connection.commit()
-
-        logging.info(f"成功處理評論 {review_id}，提取 {len(items)} 個食物項目")
-        return True
-
-    except mysql.connector.Error as err:
-        if connection:
-            connection.rollback()
-        logging.error(f"資料庫儲存錯誤: {err}")
-        return False
+        return parse_extraction_response(future.result())
     except Exception as e:
-        if connection:
-            connection.rollback()
-        logging.error(f"儲存過程錯誤: {e}")
-        return False
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if connection:
-            connection.close()
+        logging.error(f"LLM 提取錯誤: {e}")
+        return None
 
-def mark_as_processed_only(review_id):
-    """僅標記為已處理（當沒有提取到任何項目時）"""
-    try:
-        connection = mysql.connector.connect(**DATABASE_CONFIG)
-        cursor = connection.cursor()
-
-        update_query = """
-        UPDATE review_analysis
-        SET is_food_items_extracted = TRUE
-        WHERE id = %s
-        """
-        cursor.execute(update_query, (review_id,))
-        connection.commit()
-
-        logging.info(f"評論 {review_id} 已標記為已處理（無提取項目）")
-        return True
-
-    except mysql.connector.Error as err:
-        logging.error(f"標記處理狀態錯誤: {err}")
-        return False
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'connection' in locals():
-            connection.close()
+def submit_extraction_batch(client, batch):
+    """
+    送出多則評論的批次提取請求，不等待回應
 
-def main():
-    """主要執行函數"""
-    logging.info("開始食物項目提取程序")
+    Returns:
+        concurrent.futures.Future: API 回應文字（JSON 陣列）
+    """
+    prompt = get_extraction_batch_prompt(batch)
+    return client.submit_content(prompt, len(batch) * OUTPUT_TOKENS_PER_REVIEW, EXTRACTION_GENERATION_CONFIG)
 
-    total_processed = 0
-    total_extracted = 0
+def parse_extraction_response_batch(response_text, batch):
+    """解析批次提取回應，返回 (與 batch 對應的項目列表或 None, 錯誤訊息)"""
+    return parse_extraction_batch_response(response_text, [review_id for review_id, _ in batch])
 
-    while True:
-        # 取得一批待處理的評論
-        reviews = get_pending_reviews(batch_size=10)
+def save_extraction_results(db_manager, rows, stats):
+    """
+    在單一交易中寫入提取結果並更新統計
 
-        if not reviews:
-            logging.info("沒有更多待處理的評論")
-            break
+    Args:
+        rows (list): [(review_id, items), ...]
+        stats (dict): 累計統計
+    """
+    if not rows:
+        return
 
+    try:
+        saved = db_manager.save_extraction_batch(rows)
+        stats['processed'] += saved['reviews']
+        stats['extracted'] += sum(len(items) for _, items in rows)
+    except Exception as e:
+        logging.error(f"資料庫儲存錯誤（{len(rows)} 則評論）: {e}")
+        stats['failed'] += len(rows)
+
+def run_batched_extraction(client, db_manager, stats, token_budget=TOKEN_BUDGET, max_items=MAX_BATCH_SIZE):
+    """批次模式：多則評論共用一個 prompt，每批一個交易"""
+    packer = TokenBatchPacker(get_extraction_batch_prompt, token_budget, max_items, OUTPUT_TOKENS_PER_REVIEW)
+    batches = db_manager.iter_pending_extraction_reviews(max_items)
+
+    # 回應快取鍵值包含 prompt 版本，修改 prompt 並更新版本後不會取用舊結果
+    prompt_version = f"extraction@{get_prompt_info()['version']}"
+
+    def save_batch(batch_num, batch, results, content_hashes, sources):
+        """在單一交易中寫入批次的提取結果"""
+        rows = [(review_id, items) for (review_id, _), items in zip(batch, results) if items is not None]
+        stats['failed'] += len(batch) - len(rows)
+        save_extraction_results(db_manager, rows, stats)
+        logging.info(f"批次 {batch_num} 完成 - 處理: {len(rows)}, 失敗: {len(batch) - len(rows)}")
+
+    # 送出、收集、二分法重試與回應快取由 BatchPipeline 負責
+    pipeline = BatchPipeline(client, partial(submit_extraction_batch, client), parse_extraction_response_batch,
+                             prompt_version, log=logging.info)
+    pipeline.run(packer.pack(batches), save_batch)
+
+    pack_stats = packer.get_stats()
+    logging.info(f"API 批次 {pack_stats['batches']} 次，平均每次 {pack_stats['avg_items']:.1f} 則；"
+                 f"批次失敗 {pipeline.stats['batches']} 次，回退呼叫 {pipeline.stats['calls']} 次")
+
+def run_single_extraction(client, db_manager, stats):
+    """逐則模式：每則評論一個請求，整頁送出後依序寫入"""
+    for reviews in db_manager.iter_pending_extraction_reviews(PAGE_SIZE):
         logging.info(f"處理 {len(reviews)} 則評論...")
 
-        for review_id, content in reviews:
-            try:
-                logging.info(f"處理評論 ID: {review_id}")
-
-                # 使用 LLM 提取食物項目
-                items = extract_food_items_with_llm(content)
-
-                if items:
-                    # 儲存提取的項目
-                    if save_extracted_items(review_id, items):
-                        total_extracted += len(items)
-                    else:
-                        logging.error(f"評論 {review_id} 儲存失敗")
-                        continue
-                else:
-                    # 沒有提取到項目，僅標記為已處理
-                    if not mark_as_processed_only(review_id):
-                        logging.error(f"評論 {review_id} 標記失敗")
-                        continue
-
-                total_processed += 1
-
-                # API 呼叫間隔 - 遵守免費版限制 (15 requests/minute)
-                time.sleep(5)
-
-            except Exception as e:
-                logging.error(f"處理評論 {review_id} 時發生錯誤: {e}")
+        # 一次送出整頁的提取請求，由客戶端的限制器控制同時進行數與速率
+        futures = [submit_extraction(client, content) for _, content in reviews]
+
+        rows = []
+        for (review_id, _), future in zip(reviews, futures):
+            items = collect_extraction(future)
+            if items is None:
+                stats['failed'] += 1
                 continue
+            rows.append((review_id, items))
+
+        save_extraction_results(db_manager, rows, stats)
+
+def main(single=False, token_budget=TOKEN_BUDGET, max_items=MAX_BATCH_SIZE, concurrency=None):
+    """主要執行函數"""
+    logging.info(f"開始食物項目提取程序（{'逐則' if single else '批次'}模式）")
 
-    logging.info(f"處理完成！總共處理 {total_processed} 則評論，提取 {total_extracted} 個食物項目")
+    client = create_async_gemini_client(model_name=MODEL_NAME, max_concurrency=concurrency)
+    db_manager = ReviewAnalysisManager()
+
+    stats = {'processed': 0, 'extracted': 0, 'failed': 0}
+    start = time.perf_counter()
+
+    try:
+        if single:
+            run_single_extraction(client, db_manager, stats)
+        else:
+            run_batched_extraction(client, db_manager, stats, token_budget, max_items)
+    finally:
+        client.close()
+
+    elapsed = time.perf_counter() - start
+    rate_stats = client.get_rate_stats()
+    per_minute = stats['processed'] / elapsed * 60 if elapsed else 0.0
+    logging.info(f"處理完成！總共處理 {stats['processed']} 則評論，提取 {stats['extracted']} 個食物項目，失敗 {stats['failed']} 則")
+    logging.info(f"耗時 {elapsed:.1f} 秒（{per_minute:.1f} 則/分鐘）")
+    logging.info(f"API 請求 {rate_stats['requests']} 次，限速等待 {rate_stats['throttled']} 次（{rate_stats['wait_seconds']:.1f} 秒）")
+
+    cache_stats = client.get_cache_stats()
+    if cache_stats:
+        logging.info(f"回應快取命中 {cache_stats['hits']} 則，未命中 {cache_stats['misses']} 則")
+
+def parse_args():
+    """解析命令列參數"""
+    parser = argparse.ArgumentParser(description='從具體食物評論提取結構化食物項目')
+    parser.add_argument('--single', action='store_true', help='逐則提取（每則評論一個請求）')
+    parser.add_argument('--token-budget', type=int, default=TOKEN_BUDGET, help='批次模式每批估算 token 上限')
+    parser.add_argument('--max-batch-size', type=int, default=MAX_BATCH_SIZE, help='批次模式每批最多評論數')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help='同時進行中的請求數（預設依 GEMINI_MAX_CONCURRENCY）')
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    main(args.single, args.token_budget, args.max_batch_size, args.concurrency)
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+融合判別腳本
+
+以單一結構化請求同時完成食物相關性、具體食物提及與食物項目提取，並在
+同一個交易中寫入三個階段的結果，每則評論的內容只送出一次。
+
+分階段流程（food_relevance_checker → specific_food_analyzer → extract_food_items）
+仍可使用；兩種模式結束時都會顯示 API 請求數與 token 數，可比較每則評論的成本。
+
+資料庫存取使用 AsyncReviewAnalysisManager，在 Gemini 客戶端的背景事件迴圈上執行：
+處理目前批次時已預取下一頁評論，寫回上一批結果時不阻塞下一批的送出。
+
+限制：融合流程不使用分階段腳本的評論租用（claim_review_batch）與結果日誌
+（utils/result_journal.py），同一時間只應執行一個融合程序；中斷時尚未寫入的批次
+不會保留，下次執行會重新送出這些評論。
+
+使用方式:
+    python fused_review_analyzer.py
+    python fused_review_analyzer.py --token-budget 8000 --max-batch-size 20
+"""
+
+import argparse
+from collections import deque
+from functools import partial
+from utils.async_gemini_client import create_async_gemini_client
+from utils.async_database_manager import AsyncReviewAnalysisManager
+from utils.database_manager import print_connection_stats
+from utils.batch_pipeline import BatchPipeline
+from utils.batch_packer import TokenBatchPacker
+from utils.prompt_loader import create_prompt_loader, validate_prompt_input
+from prompts.fused_prompts import FUSED_RESPONSE_SCHEMA, get_fused_batch_prompt, parse_fused_batch_response
+
+# 處理設定
+TOKEN_BUDGET = 8000
+MAX_BATCH_SIZE = 20
+OUTPUT_TOKENS_PER_REVIEW = 80  # 兩個判別欄位加上平均約一個提取項目
+
+FUSED_GENERATION_CONFIG = {
+    'response_mime_type': 'application/json',
+    'response_schema': FUSED_RESPONSE_SCHEMA
+}
+
+def submit_fused_batch(client, prompt_loader, batch):
+    """
+    送出融合判別批次，不等待回應
+
+    Returns:
+        concurrent.futures.Future or None: API 回應文字，輸入驗證失敗時為 None
+    """
+    is_valid, message = validate_prompt_input(review_batch=batch)
+    if not is_valid:
+        print(f"批次輸入驗證失敗: {message}")
+        return None
+
+    prompt = prompt_loader.get_fused_prompt(batch)
+    return client.submit_content(prompt, len(batch) * OUTPUT_TOKENS_PER_REVIEW, FUSED_GENERATION_CONFIG)
+
+def parse_fused_response(response_text, batch):
+    """解析融合判別回應，返回 (與 batch 對應的結果列表或 None, 錯誤訊息)"""
+    return parse_fused_batch_response(response_text, [review_id for review_id, _ in batch])
+
+def iter_prefetched_batches(client, db_manager, stage, batch_size):
+    """
+    在客戶端的背景事件迴圈上逐批讀取待處理評論
+
+    AsyncReviewAnalysisManager 在產生目前批次時即開始查詢下一頁，
+    資料庫延遲與進行中的 Gemini 請求重疊。
+
+    Yields:
+        list: 評論批次 [(id, content), ...]
+    """
+    pages = db_manager.iter_review_batches(stage, batch_size, prefetch=True)
+
+    async def next_page():
+        return await pages.__anext__()
+
+    while True:
+        try:
+            yield client.submit(next_page()).result()
+        except StopAsyncIteration:
+            return
+
+def process_fused_analysis(token_budget=TOKEN_BUDGET, max_items=MAX_BATCH_SIZE, concurrency=None):
+    """
+    主要處理流程
+
+    Args:
+        token_budget (int): 每批估算 token 上限
+        max_items (int): 每批最多評論數
+        concurrency (int): 同時進行中的批次數，預設依 GEMINI_MAX_CONCURRENCY
+    """
+    print("=== 融合判別處理（相關性 + 具體提及 + 項目提取）===")
+
+    # 初始化元件
+    try:
+        client = create_async_gemini_client(max_concurrency=concurrency)
+        db_manager = AsyncReviewAnalysisManager()
+        prompt_loader = create_prompt_loader()
+        print("✓ 系統元件初始化完成")
+    except Exception as e:
+        print(f"✗ 系統初始化失敗: {e}")
+        return
+
+    # 取得待處理評論（尚未判別食物相關性的評論）
+    try:
+        total_reviews = client.submit(db_manager.count_pending_reviews('food_relevance')).result()
+        print(f"✓ 找到 {total_reviews} 則需要處理的評論")
+
+        if total_reviews == 0:
+            print("沒有需要處理的評論")
+            client.submit(db_manager.close()).result()
+            client.close()
+            return
+    except Exception as e:
+        print(f"✗ 取得評論資料失敗: {e}")
+        client.submit(db_manager.close()).result()
+        client.close()
+        return
+
+    packer = TokenBatchPacker(get_fused_batch_prompt, token_budget, max_items, OUTPUT_TOKENS_PER_REVIEW)
+    batches = iter_prefetched_batches(client, db_manager, 'food_relevance', max_items)
+    total_batches = (total_reviews + max_items - 1) // max_items
+
+    # 回應快取鍵值包含 prompt 版本，修改 prompt 並更新版本後不會取用舊結果
+    prompt_version = f"fused@{prompt_loader.get_prompt_info('fused')['version']}"
+
+    total_stats = {'processed': 0, 'food_related': 0, 'specific_food': 0, 'items': 0, 'failed': 0}
+
+    def record_write(batch_num, batch_size, processed, future):
+        """等待批次寫入完成並累計統計"""
+        try:
+            saved = future.result() if future else None
+        except Exception as e:
+            print(f"✗ 批次 {batch_num} 資料庫更新失敗: {e}")
+            total_stats['failed'] += batch_size
+            return
+
+        total_stats['processed'] += processed
+        total_stats['failed'] += batch_size - processed
+        if saved:
+            total_stats['food_related'] += saved['food_related']
+            total_stats['specific_food'] += saved['specific_food']
+            total_stats['items'] += saved['items']
+
+        print(f"✓ 批次 {batch_num} 完成 - 處理: {processed}, 失敗: {batch_size - processed}")
+
+    def save_batch(batch_num, batch, results, content_hashes, sources):
+        """送出單一交易的三階段寫入（不等待寫入完成）"""
+        rows = [(review_id, *result) for (review_id, _), result in zip(batch, results) if result is not None]
+        write = client.submit(db_manager.save_fused_results(rows)) if rows else None
+        pending_writes.append((batch_num, len(batch), len(rows), write))
+
+        # 上一批的寫入與本批的 Gemini 請求重疊，只保留一個進行中的寫入
+        while len(pending_writes) > 1:
+            record_write(*pending_writes.popleft())
+
+    # 送出、收集、二分法重試與回應快取由 BatchPipeline 負責
+    pending_writes = deque()
+    pipeline = BatchPipeline(client, partial(submit_fused_batch, client, prompt_loader), parse_fused_response,
+                             prompt_version)
+    pipeline.run(packer.pack(batches), save_batch, total_batches)
+
+    while pending_writes:
+        record_write(*pending_writes.popleft())
+
+    client.submit(db_manager.close()).result()
+    client.close()
+
+    # 顯示最終統計
+    print(f"\n=== 處理完成 ===")
+    print(f"總共處理: {total_stats['processed']} 則評論")
+    print(f"食物相關: {total_stats['food_related']} 則")
+    print(f"具體提及: {total_stats['specific_food']} 則")
+    print(f"提取項目: {total_stats['items']} 個")
+    print(f"處理失敗: {total_stats['failed']} 則")
+
+    pack_stats = packer.get_stats()
+    print(f"\n=== 批次統計 ===")
+    print(f"API 批次: {pack_stats['batches']} 次，平均每次 {pack_stats['avg_items']:.1f} 則（最多 {pack_stats['max_items']} 則）")
+    print(f"批次失敗: {pipeline.stats['batches']} 次，回退呼叫: {pipeline.stats['calls']} 次")
+
+    # 每則評論的呼叫數與 token 數，可與分階段腳本三個階段的總和比較
+    rate_stats = client.get_rate_stats()
+    processed = total_stats['processed'] or 1
+    print(f"\n=== API 配額使用統計 ===")
+    print(f"API 請求: {rate_stats['requests']} 次，估計 {rate_stats['tokens']} tokens")
+    print(f"每則評論: {rate_stats['requests'] / processed:.3f} 次請求，{rate_stats['tokens'] / processed:.0f} tokens")
+    print(f"限速等待: {rate_stats['throttled']} 次，共 {rate_stats['wait_seconds']:.1f} 秒")
+    if 'slots' in rate_stats:
+        print(f"配額錯誤切換: {rate_stats['failovers']} 次")
+        for slot in rate_stats['slots']:
+            exhausted = '（今日配額已用完）' if slot['exhausted'] else ''
+            print(f"  {slot['slot']}: 請求 {slot['requests']} 次，今日 {slot['requests_today']}/{slot['requests_per_day']}，"
+                  f"429 錯誤 {slot['quota_errors']} 次{exhausted}")
+
+    cache_stats = client.get_cache_stats()
+    if cache_stats:
+        print(f"回應快取: 命中 {cache_stats['hits']} 則，未命中 {cache_stats['misses']} 則（命中率 {cache_stats['hit_rate']:.1f}%）")
+
+    print_connection_stats(db_manager.get_connection_stats())
+
+def parse_args():
+    """解析命令列參數"""
+    parser = argparse.ArgumentParser(description='融合判別：一次請求完成相關性、具體提及與項目提取')
+    parser.add_argument('--token-budget', type=int, default=TOKEN_BUDGET, help='每批估算 token 上限')
+    parser.add_argument('--max-batch-size', type=int, default=MAX_BATCH_SIZE, help='每批最多評論數')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help='同時進行中的批次數（預設依 GEMINI_MAX_CONCURRENCY）')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    try:
+        args = parse_args()
+        process_fused_analysis(args.token_budget, args.max_batch_size, args.concurrency)
+    except KeyboardInterrupt:
+        print("\n✗ 使用者中斷處理")
+    except Exception as e:
+        print(f"✗ 執行錯誤: {e}")
@@ -2,9 +2,13 @@
 import json
 import os
 import mysql.connector
+from mysql.connector import errorcode
 from datetime import datetime
 from config import DATABASE_CONFIG
 
+# 每次提交的評論筆數，避免單一大交易造成長時間鎖定與大量 undo log
+CHUNK_SIZE = 500
+
 def connect_database():
     """連接MySQL資料庫"""
     try:
@@ -75,8 +79,82 @@ def insert_reviews(cursor, reviews_data, search_id):
 
     cursor.executemany(sql, values_list)
 
-def process_json_files():
-    """處理所有JSON檔案"""
+def has_search_metadata(cursor, search_id):
+    """檢查搜尋元數據是否已匯入"""
+    cursor.execute("SELECT COUNT(*) FROM search_metadata WHERE search_id = %s", (search_id,))
+    return cursor.fetchone()[0] > 0
+
+def get_import_progress(cursor, filename):
+    """
+    取得檔案的匯入進度
+
+    Returns:
+        tuple: (rows_imported, status)，尚未開始匯入時為 (0, None)
+    """
+    cursor.execute(
+        "SELECT rows_imported, status FROM import_progress WHERE source_file = %s",
+        (filename,)
+    )
+    row = cursor.fetchone()
+    return row if row else (0, None)
+
+def save_import_progress(cursor, filename, search_id, rows_imported, total_rows):
+    """更新檔案的匯入檢查點（需與評論寫入在同一交易中提交）"""
+    status = 'completed' if rows_imported >= total_rows else 'in_progress'
+    sql = """
+    INSERT INTO import_progress (source_file, search_id, rows_imported, total_rows, status)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        rows_imported = VALUES(rows_imported),
+        total_rows = VALUES(total_rows),
+        status = VALUES(status)
+    """
+    cursor.execute(sql, (filename, search_id, rows_imported, total_rows, status))
+
+def import_file_in_chunks(conn, cursor, filename, reviews, search_id, chunk_size=CHUNK_SIZE):
+    """
+    分段匯入單一檔案的評論，每個分段連同檢查點一起提交
+
+    Args:
+        conn: 資料庫連接
+        cursor: 資料庫游標
+        filename (str): 檔案名稱（檢查點鍵值）
+        reviews (list): 檔案內所有評論
+        search_id (str): 搜尋業務識別碼
+        chunk_size (int): 每次提交的評論筆數
+
+    Returns:
+        int: 本次執行新匯入的評論筆數
+    """
+    total_rows = len(reviews)
+    rows_imported, status = get_import_progress(cursor, filename)
+
+    if status == 'completed':
+        return 0
+
+    imported_now = 0
+    # 沒有評論的檔案也寫入檢查點，避免重複讀取
+    if rows_imported >= total_rows:
+        save_import_progress(cursor, filename, search_id, total_rows, total_rows)
+        conn.commit()
+        return 0
+
+    for offset in range(rows_imported, total_rows, chunk_size):
+        chunk = reviews[offset:offset + chunk_size]
+        try:
+            insert_reviews(cursor, chunk, search_id)
+            save_import_progress(cursor, filename, search_id, offset + len(chunk), total_rows)
+            conn.commit()
+        except Exception:
+            # 只回滾當前分段，已提交的分段保留，重新執行時由檢查點續傳
+            conn.rollback()
+            raise
+        imported_now += len(chunk)
+
+    return imported_now
+
+def process_json_files(chunk_size=CHUNK_SIZE):
+    """處理所有JSON檔案（分段提交，可從檢查點續傳）"""
     data_dir = './data/raw/'
     search_id = 'yongda_night_market_2025'
 
@@ -84,6 +162,8 @@ def process_json_files():
     if not conn:
         return
 
+    cursor = None
+    total_reviews = 0
     try:
         cursor = conn.cursor()
 
@@ -94,16 +174,16 @@ def process_json_files():
         print(f"找到 {len(json_files)} 個JSON檔案")
 
         # 插入search_metadata (只需要一次，使用第一個檔案)
-        if json_files:
+        if json_files and not has_search_metadata(cursor, search_id):
             first_file = os.path.join(data_dir, json_files[0])
             with open(first_file, 'r', encoding='utf-8') as f:
                 first_data = json.load(f)
 
             print("插入搜尋元數據...")
             insert_search_metadata(cursor, first_data, search_id)
+            conn.commit()
 
         # 處理所有檔案的評論資料
-        total_reviews = 0
         for i, filename in enumerate(json_files, 1):
             file_path = os.path.join(data_dir, filename)
 
@@ -111,23 +191,29 @@ def process_json_files():
                 data = json.load(f)
 
             reviews = data.get('reviews', [])
-            if reviews:
-                insert_reviews(cursor, reviews, search_id)
-                total_reviews += len(reviews)
+            imported = import_file_in_chunks(conn, cursor, filename, reviews, search_id, chunk_size)
+            total_reviews += imported
 
-            print(f"處理第 {i}/{len(json_files)} 個檔案: {filename} ({len(reviews)} 則評論)")
+            if imported == 0 and reviews:
+                print(f"略過第 {i}/{len(json_files)} 個檔案: {filename}（已匯入）")
+            else:
+                print(f"處理第 {i}/{len(json_files)} 個檔案: {filename} ({imported}/{len(reviews)} 則評論)")
 
-        # 提交變更
-        conn.commit()
         print(f"\n資料匯入完成！")
-        print(f"- 搜尋元數據: 1 筆")
-        print(f"- 評論資料: {total_reviews} 筆")
+        print(f"- 評論資料: 本次新增 {total_reviews} 筆")
 
+    except mysql.connector.Error as e:
+        if e.errno == errorcode.ER_NO_SUCH_TABLE and 'import_progress' in (e.msg or ''):
+            print(f"錯誤: {e.msg}，請先執行 docs/sql/07-create-import-progress-table.sql")
+        else:
+            print(f"錯誤: {e}")
+        print(f"已提交 {total_reviews} 筆評論，重新執行將從檢查點繼續")
     except Exception as e:
         print(f"錯誤: {e}")
-        conn.rollback()
+        print(f"已提交 {total_reviews} 筆評論，重新執行將從檢查點繼續")
     finally:
-        cursor.close()
+        if cursor:
+            cursor.close()
         conn.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+詞彙預篩腳本
+
+在 food_relevance_checker / specific_food_analyzer 之前執行：評論中出現已知的
+料理或店家名稱（人工詞彙檔與 extracted_food_items 的名稱）時，直接在本地
+標記為食物相關且具體提及，不呼叫 Gemini；沒有命中的評論維持待處理，
+交由後續的 LLM 判別。
+
+詞彙以 Aho-Corasick 自動機比對，每則評論只需單次掃描；處理期間定期讀取
+新增的提取項目並加入詞彙。
+
+使用方式:
+    python lexicon_prefilter.py                   # 預篩並寫入標記
+    python lexicon_prefilter.py --dry-run         # 只統計命中數
+    python lexicon_prefilter.py --min-support 3   # 提取名稱至少出現 3 次才採用
+"""
+
+import argparse
+import sys
+import time
+from collections import Counter
+from utils.database_manager import ReviewAnalysisManager
+from utils.lexicon_matcher import DEFAULT_LEXICON_PATH, FoodLexicon
+
+PAGE_SIZE = 1000
+REFRESH_EVERY_PAGES = 20  # 每處理幾頁讀取一次新增的提取項目
+
+def prefilter_stage(db_manager, lexicon, stage, args, term_counter):
+    """
+    預篩某處理階段的待處理評論
+
+    Returns:
+        dict: 掃描數、命中數與比對耗時
+    """
+    stats = {'scanned': 0, 'matched': 0, 'match_seconds': 0.0}
+
+    for page_num, page in enumerate(db_manager.iter_review_batches(stage, args.batch_size), 1):
+        start = time.perf_counter()
+        matched_ids = []
+        for review_id, content in page:
+            terms = lexicon.match(content)
+            if terms:
+                matched_ids.append(review_id)
+                term_counter.update(terms)
+        stats['match_seconds'] += time.perf_counter() - start
+
+        stats['scanned'] += len(page)
+        stats['matched'] += len(matched_ids)
+        if matched_ids and not args.dry_run:
+            db_manager.apply_lexicon_labels(matched_ids)
+
+        # 其他程序持續提取新項目時，定期擴充詞彙
+        if page_num % REFRESH_EVERY_PAGES == 0:
+            added = lexicon.refresh_from_database(db_manager)
+            if added:
+                print(f"  + 詞彙新增 {added} 個（共 {lexicon.term_count} 個）")
+
+    return stats
+
+def main():
+    """主要執行流程"""
+    parser = argparse.ArgumentParser(description='以已知料理與店家名稱在本地預先標記評論')
+    parser.add_argument('--batch-size', type=int, default=PAGE_SIZE, help='每頁評論數')
+    parser.add_argument('--min-support', type=int, default=2,
+                        help='提取項目中的名稱至少出現幾次才加入詞彙')
+    parser.add_argument('--lexicon', default=DEFAULT_LEXICON_PATH, help='人工詞彙檔路徑')
+    parser.add_argument('--dry-run', action='store_true', help='只統計命中數，不寫入標記')
+    args = parser.parse_args()
+
+    db_manager = ReviewAnalysisManager()
+    lexicon = FoodLexicon(min_support=args.min_support)
+
+    curated = lexicon.load_curated(args.lexicon)
+    extracted = lexicon.refresh_from_database(db_manager)
+    print(f"✓ 詞彙載入完成: 人工 {curated} 個，提取項目 {extracted} 個"
+          f"（掃描 {lexicon.stats['items_scanned']} 個項目）")
+
+    term_counter = Counter()
+    for stage, label in (('food_relevance', '食物相關性待判別'), ('specific_food', '具體提及待判別')):
+        stats = prefilter_stage(db_manager, lexicon, stage, args, term_counter)
+        rate = stats['matched'] / stats['scanned'] * 100 if stats['scanned'] else 0.0
+        per_review_us = stats['match_seconds'] / stats['scanned'] * 1e6 if stats['scanned'] else 0.0
+        print(f"{'○' if args.dry_run else '✓'} {label}: 掃描 {stats['scanned']} 則，"
+              f"命中 {stats['matched']} 則（{rate:.1f}%），平均比對 {per_review_us:.1f} µs/則")
+
+    if term_counter:
+        top_terms = ", ".join(f"{term}({count})" for term, count in term_counter.most_common(10))
+        print(f"最常命中: {top_terms}")
+    if args.dry_run:
+        print("（--dry-run：未寫入任何標記）")
+    return 0
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n✗ 使用者中斷")
+        sys.exit(1)
+    except Exception as e:
+        print(f"✗ 執行錯誤: {e}")
+        sys.exit(1)
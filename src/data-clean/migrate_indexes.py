@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+索引遷移與執行計畫驗證工具
+
+1. 建立管線查詢需要的索引（已存在相同欄位組合的索引則略過）
+2. 對 ReviewAnalysisManager 每個查詢方法與 DatasetBuilder 核心資料集查詢執行 EXPLAIN
+3. 任一查詢出現全表掃描 (type = ALL) 時以非零結束碼結束
+
+ReviewAnalysisManager 的 SQL 透過記錄用連線實際呼叫各方法取得，
+新增方法時若未加入 MANAGER_CALL_PLAN，驗證會直接失敗，避免遺漏。
+
+使用方式:
+    python migrate_indexes.py               # 建立索引並驗證
+    python migrate_indexes.py --check-only  # 只驗證，不建立索引
+
+注意：資料量很小時 MySQL 可能仍選擇全表掃描，請在有代表性資料的資料庫上執行。
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+from utils.database_manager import DatabaseManager, ReviewAnalysisManager
+
+# 管線需要的索引 (資料表, 索引名稱, 欄位)
+INDEX_DEFINITIONS = [
+    ('review_analysis', 'idx_review_analysis_review_id', ('review_id',)),
+    ('review_analysis', 'idx_review_analysis_project_related', ('is_project_related',)),
+    ('review_analysis', 'idx_review_analysis_pipeline_flags',
+     ('is_project_related', 'has_specific_food_mention', 'is_food_items_extracted')),
+    ('review_analysis', 'idx_review_analysis_content_hash', ('content_hash',)),
+    ('review_analysis', 'idx_review_analysis_extract_target',
+     ('has_specific_food_mention', 'is_food_items_extracted')),
+    ('extracted_food_items', 'idx_extracted_food_review_id', ('review_id',)),
+    ('reviews', 'idx_reviews_review_id', ('review_id',)),
+]
+
+# ReviewAnalysisManager 各方法的代表性呼叫參數
+MANAGER_CALL_PLAN = {
+    'fetch_review_page': [('food_relevance', 0, 15), ('specific_food', 0, 15), ('extraction', 0, 10)],
+    'iter_review_batches': [('food_relevance', 15)],
+    'iter_labeled_reviews': [('food_relevance', 5000), ('specific_food', 5000)],
+    'iter_unprocessed_reviews': [(15,)],
+    'iter_food_related_reviews': [(15,)],
+    'iter_pending_extraction_reviews': [(10,)],
+    'claim_review_batch': [('food_relevance', 'explain', 15)],
+    'iter_claimed_batches': [('specific_food', 'explain', 15)],
+    'release_leases': [('explain', [1, 2])],
+    'save_leased_labels': [('is_project_related', [(True, 1), (False, 2)], 'explain', 'gemini')],
+    'count_pending_reviews': [('food_relevance',), ('specific_food',), ('extraction',)],
+    'get_food_related_reviews': [(15,)],
+    'get_unprocessed_reviews': [(15,)],
+    'update_food_relevance': [(1, True)],
+    'update_specific_food_mention': [(1, True)],
+    'batch_update_food_relevance': [([(True, 1), (False, 2)], 'gemini')],
+    'batch_update_specific_food_mention': [([(True, 1), (False, 2)], 'local')],
+    'batch_mark_food_items_extracted': [([1, 2],)],
+    'insert_extracted_food_items': [([(1, {'dish_name': '臭豆腐', 'rating_sentiment': 'positive'})],)],
+    'save_extraction_batch': [([(1, [{'dish_name': '臭豆腐'}, {'dish_name': '蚵仔煎'}]), (2, [])],)],
+    'save_fused_results': [([(1, True, True, [{'dish_name': '臭豆腐'}]), (2, True, False, []), (3, False, False, [])],)],
+    'apply_lexicon_labels': [([1, 2, 3],)],
+    'bulk_update_labels': [('is_project_related', [(True, 1), (False, 2)]),
+                           ('is_food_items_extracted', [(True, 1)])],
+    'get_sync_high_water_mark': [()],
+    'sync_new_reviews': [(0, 1000)],
+    'iter_changed_content': [(1000,), (1000, '2025-01-01')],
+    'refresh_review_content': [([(1, 'updated'), (2, 'updated')],)],
+    'backfill_content_hashes': [(1000,)],
+    'fan_out_labels': [('food_relevance',), ('specific_food', ['a' * 64, 'b' * 64])],
+    'get_pipeline_statistics': [()],
+    'get_analysis_statistics': [()],
+    'refresh_counters': [()],
+    'get_counter_statistics': [()],
+    'get_sample_reviews': [('food_related',), ('non_food',), ('specific_food',), ('general_food',), ('all',)],
+}
+
+# DatasetBuilder 查詢以全部提取項目為輸入，允許驅動表 e 完整讀取
+DATASET_FULL_SCAN_ALLOWED = ('e',)
+
+class RecordingCursor:
+    """只記錄 SQL 而不實際執行的游標"""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        self.recorder.append((query, params))
+
+    def executemany(self, query, params_list):
+        params_list = list(params_list)
+        self.recorder.append((query, params_list[0] if params_list else None))
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        # 足夠長的全 0 資料列，讓聚合查詢的結果解析可以完成
+        return (0,) * 32
+
+    def close(self):
+        pass
+
+class RecordingConnection:
+    """搭配 RecordingCursor 的假連線"""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def cursor(self, *args, **kwargs):
+        return RecordingCursor(self.recorder)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+class RecordingReviewAnalysisManager(ReviewAnalysisManager):
+    """將所有 SQL 導向記錄用連線的 ReviewAnalysisManager"""
+
+    def __init__(self):
+        super().__init__(use_pool=False)
+        self.recorded = []
+
+    def connect(self):
+        return RecordingConnection(self.recorded)
+
+def collect_manager_queries():
+    """
+    呼叫 ReviewAnalysisManager 的每個公開方法並收集其 SQL
+
+    Returns:
+        list: [(標籤, SQL, 參數, 允許全表掃描的資料表), ...]
+    """
+    public_methods = {
+        name for name, value in vars(ReviewAnalysisManager).items()
+        if callable(value) and not name.startswith('_')
+    }
+    missing = sorted(public_methods - set(MANAGER_CALL_PLAN))
+    if missing:
+        raise ValueError(f"MANAGER_CALL_PLAN 未涵蓋的方法: {', '.join(missing)}")
+
+    queries = []
+    for method_name, calls in MANAGER_CALL_PLAN.items():
+        for args in calls:
+            manager = RecordingReviewAnalysisManager()
+            result = getattr(manager, method_name)(*args)
+            # 迭代器方法需實際迭代才會送出查詢
+            if hasattr(result, '__next__'):
+                list(result)
+            for query, params in manager.recorded:
+                label = f"ReviewAnalysisManager.{method_name}{args if len(repr(args)) < 60 else '(...)'}"
+                queries.append((label, query, params, ()))
+    return queries
+
+def load_dataset_queries():
+    """
+    載入 data-analysis 的核心資料集查詢
+
+    Returns:
+        list: [(標籤, SQL, 參數, 允許全表掃描的資料表), ...]
+    """
+    queries_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        '..', 'data-analysis', 'data', 'builders', 'queries.py'
+    )
+    if not os.path.exists(queries_path):
+        print(f"⚠ 找不到 {queries_path}，略過 DatasetBuilder 查詢")
+        return []
+
+    spec = importlib.util.spec_from_file_location('dataset_queries', queries_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return [('DatasetBuilder.build_core_dataset', module.CORE_DATASET_QUERY, None, DATASET_FULL_SCAN_ALLOWED)]
+
+def get_existing_indexes(db_manager, table):
+    """
+    取得資料表現有索引的欄位組合
+
+    Returns:
+        dict: {索引名稱: (欄位, ...)}
+    """
+    rows = db_manager.execute_query("""
+        SELECT INDEX_NAME, COLUMN_NAME
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """, (table,))
+
+    indexes = {}
+    for index_name, column_name in rows:
+        indexes.setdefault(index_name, []).append(column_name)
+    return {name: tuple(columns) for name, columns in indexes.items()}
+
+def get_table_columns(db_manager, table):
+    """取得資料表欄位名稱集合"""
+    rows = db_manager.execute_query("""
+        SELECT COLUMN_NAME
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    return {column for (column,) in rows}
+
+def apply_index_migrations(db_manager):
+    """
+    建立缺少的索引
+
+    Returns:
+        int: 新建立的索引數
+    """
+    created = 0
+    for table, index_name, columns in INDEX_DEFINITIONS:
+        existing = get_existing_indexes(db_manager, table)
+        if index_name in existing or columns in existing.values():
+            print(f"  = {table}.{index_name} 已存在")
+            continue
+
+        missing_columns = set(columns) - get_table_columns(db_manager, table)
+        if missing_columns:
+            print(f"  ⚠ {table}.{index_name} 略過，缺少欄位: {', '.join(sorted(missing_columns))}")
+            continue
+
+        column_list = ", ".join(columns)
+        db_manager.execute_update(
+            f"CREATE INDEX {index_name} ON {table} ({column_list}) ALGORITHM=INPLACE LOCK=NONE"
+        )
+        print(f"  + 建立 {table}.{index_name} ({column_list})")
+        created += 1
+
+    # 更新統計資訊，讓 EXPLAIN 反映新索引
+    for table in sorted({table for table, _, _ in INDEX_DEFINITIONS}):
+        db_manager.execute_query(f"ANALYZE TABLE {table}")
+
+    return created
+
+def explain_query(db_manager, query, params):
+    """
+    執行 EXPLAIN 並返回執行計畫列
+
+    Returns:
+        list: 每個資料表的 dict 執行計畫
+    """
+    with db_manager.get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(f"EXPLAIN {query}", params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+def verify_query_plans(db_manager, queries):
+    """
+    驗證每個查詢沒有全表掃描
+
+    Returns:
+        list: 出現全表掃描的 [(標籤, 資料表), ...]
+    """
+    violations = []
+    for label, query, params, allowed_tables in queries:
+        plan = explain_query(db_manager, query, params)
+        summary = []
+        for row in plan:
+            table = row.get('table') or ''
+            access_type = row.get('type')
+            summary.append(f"{table}:{access_type}:{row.get('key') or '-'}")
+
+            # <derivedN> 等衍生表（如 VALUES 列表）不是實體資料表
+            if access_type == 'ALL' and not table.startswith('<') and table not in allowed_tables:
+                violations.append((label, table))
+
+        status = '✗' if any(v[0] == label for v in violations) else '✓'
+        print(f"  {status} {label}: {', '.join(summary)}")
+
+    return violations
+
+def main():
+    """主要執行流程"""
+    parser = argparse.ArgumentParser(description='建立管線索引並以 EXPLAIN 驗證查詢計畫')
+    parser.add_argument('--check-only', action='store_true', help='只驗證執行計畫，不建立索引')
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(use_pool=False)
+
+    if not args.check_only:
+        print("=== 建立索引 ===")
+        created = apply_index_migrations(db_manager)
+        print(f"新建立 {created} 個索引")
+
+    print("\n=== 驗證查詢執行計畫 ===")
+    queries = collect_manager_queries() + load_dataset_queries()
+    violations = verify_query_plans(db_manager, queries)
+
+    if violations:
+        print(f"\n✗ {len(violations)} 個查詢出現全表掃描:")
+        for label, table in violations:
+            print(f"  - {label} ({table})")
+        return 1
+
+    print(f"\n✓ {len(queries)} 個查詢皆未出現全表掃描")
+    return 0
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n✗ 使用者中斷")
+        sys.exit(1)
+    except Exception as e:
+        print(f"✗ 執行錯誤: {e}")
+        sys.exit(1)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+管線進度統計腳本
+
+預設以單次條件聚合掃描 review_analysis 取得所有階段的統計；
+--from-counters 改讀 review_analysis_counters，不掃描評論表，適合儀表板輪詢。
+
+使用方式:
+    python pipeline_stats.py                    # 單次掃描統計
+    python pipeline_stats.py --from-counters    # 讀取計數器
+    python pipeline_stats.py --refresh-counters # 掃描後重建計數器
+    python pipeline_stats.py --json             # 輸出 JSON
+"""
+
+import argparse
+import json
+from utils.database_manager import ReviewAnalysisManager, LABEL_COLUMNS
+
+STATE_LABELS = {'null': '未處理', 'true': '是', 'false': '否'}
+
+def print_statistics(stats, source):
+    """輸出統計結果"""
+    print(f"=== 管線進度統計（{source}）===")
+    print(f"總評論數: {stats['total_reviews']}")
+
+    for column in LABEL_COLUMNS:
+        counts = stats[column]
+        summary = ", ".join(f"{STATE_LABELS[state]}: {counts[state]}" for state in ('null', 'true', 'false'))
+        print(f"{column}: {summary}")
+
+    pending = stats['pending']
+    print(f"\n待處理:")
+    print(f"  食物相關性判別: {pending['food_relevance']} 則")
+    print(f"  具體食物判別: {pending['specific_food']} 則")
+    print(f"  結構化提取: {pending['extraction']} 則")
+
+def main():
+    """主要執行流程"""
+    parser = argparse.ArgumentParser(description='顯示評論分析管線的進度統計')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--from-counters', action='store_true', help='讀取計數器表，不掃描 review_analysis')
+    group.add_argument('--refresh-counters', action='store_true', help='掃描 review_analysis 後重建計數器表')
+    parser.add_argument('--json', action='store_true', help='以 JSON 格式輸出')
+    args = parser.parse_args()
+
+    db_manager = ReviewAnalysisManager()
+
+    if args.refresh_counters:
+        db_manager.refresh_counters()
+        stats = db_manager.get_counter_statistics()
+        source = '計數器已重建'
+    elif args.from_counters:
+        stats = db_manager.get_counter_statistics()
+        source = '計數器'
+    else:
+        stats = db_manager.get_pipeline_statistics()
+        source = '單次掃描'
+
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+    else:
+        print_statistics(stats, source)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n✗ 使用者中斷")
+    except Exception as e:
+        print(f"✗ 執行錯誤: {e}")
@@ -4,6 +4,8 @@ Prompts 模組 - 管理所有 AI 分析用的 Prompt 模板
 此模組包含：
 - food_relevance_prompts: 食物相關性判別 prompt
 - specific_food_prompts: 具體食物項目判別 prompt
+- extraction_prompts: 結構化食物項目提取 prompt
+- fused_prompts: 相關性、具體提及與項目提取的融合判別 prompt
 - base_prompts: 共用的 prompt 元素和工具函數
 
 使用範例:
@@ -21,10 +23,19 @@ from .specific_food_prompts import (
     get_specific_food_single_prompt
 )
 
+from .extraction_prompts import (
+    get_extraction_batch_prompt,
+    get_extraction_single_prompt
+)
+
+from .fused_prompts import get_fused_batch_prompt
+
 from .base_prompts import (
     format_batch_prompt,
     format_answer_format,
-    create_review_list
+    create_review_list,
+    parse_json_batch_response,
+    BATCH_RESPONSE_SCHEMA
 )
 
 __all__ = [
@@ -32,7 +43,12 @@ __all__ = [
     'get_food_relevance_single_prompt',
     'get_specific_food_batch_prompt',
     'get_specific_food_single_prompt',
+    'get_extraction_batch_prompt',
+    'get_extraction_single_prompt',
+    'get_fused_batch_prompt',
     'format_batch_prompt',
     'format_answer_format',
-    'create_review_list'
+    'create_review_list',
+    'parse_json_batch_response',
+    'BATCH_RESPONSE_SCHEMA'
 ]
\ No newline at end of file
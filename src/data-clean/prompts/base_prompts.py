@@ -4,11 +4,31 @@
 提供共用的 prompt 格式化和建構函數
 """
 
-def create_review_list(review_batch):
-    """建立評論列表字串"""
+import json
+import re
+
+# 文字回應的單行格式：「編號. Yes/No」（可有「評論」前綴，編號後可接 . : ： 、 ) 或空白）
+_ANSWER_LINE_PATTERN = re.compile(r'^\s*(?:評論\s*)?(\d+)\s*[.:：、)]?\s*(yes|no)\b', re.IGNORECASE)
+
+# 結構化輸出的回應格式：以評論 id 為鍵的 JSON 陣列
+BATCH_RESPONSE_SCHEMA = {
+    'type': 'array',
+    'items': {
+        'type': 'object',
+        'properties': {
+            'id': {'type': 'integer'},
+            'answer': {'type': 'boolean'}
+        },
+        'required': ['id', 'answer']
+    }
+}
+
+def create_review_list(review_batch, structured=False):
+    """建立評論列表字串（結構化輸出時以評論 id 標示）"""
     review_list = ""
     for i, (review_id, content) in enumerate(review_batch, 1):
-        review_list += f"評論{i}：「{content}」\n"
+        label = f"評論 id={review_id}" if structured else f"評論{i}"
+        review_list += f"{label}：「{content}」\n"
     return review_list.strip()
 
 def format_answer_format(review_count):
@@ -18,10 +38,14 @@ def format_answer_format(review_count):
         answer_format += f"{i}. Yes/No\n"
     return answer_format.strip()
 
-def format_batch_prompt(template, review_batch, **kwargs):
-    """格式化批次處理 prompt"""
-    review_list = create_review_list(review_batch)
-    answer_format = format_answer_format(len(review_batch))
+def format_batch_prompt(template, review_batch, structured=False, **kwargs):
+    """格式化批次處理 prompt（structured=True 時要求以評論 id 為鍵的 JSON 陣列）"""
+    review_list = create_review_list(review_batch, structured)
+    if structured:
+        answer_format = COMMON_INSTRUCTIONS['json_answer_format']
+        kwargs['response_format'] = COMMON_INSTRUCTIONS['json_response_format']
+    else:
+        answer_format = format_answer_format(len(review_batch))
 
     return template.format(
         review_list=review_list,
@@ -29,55 +53,106 @@ def format_batch_prompt(template, review_batch, **kwargs):
         **kwargs
     )
 
+def _parse_answer_lines(response_text, expected_count):
+    """
+    單次掃描文字回應，依行首編號取得答案
+
+    編號必須位於行首並完整比對，"1" 不會比對到 "10"；答案只接受編號後的
+    Yes/No，不會因為行中其他位置出現 "no" 而誤判。
+
+    Returns:
+        tuple: (答案字典 {編號: bool}, 錯誤訊息或 None)
+    """
+    answers = {}
+    for line in response_text.strip().split('\n'):
+        match = _ANSWER_LINE_PATTERN.match(line)
+        if not match:
+            continue
+
+        index = int(match.group(1))
+        if index < 1 or index > expected_count:
+            return answers, f"回應編號 {index} 超出範圍"
+        if index in answers:
+            return answers, f"回應編號 {index} 重複"
+        answers[index] = match.group(2).lower() == 'yes'
+
+    return answers, None
+
 def validate_batch_response(response_text, expected_count):
     """驗證 AI 回應格式是否正確"""
     if not response_text:
         return False, "回應為空"
 
-    lines = response_text.strip().split('\n')
-    valid_lines = []
-
-    for line in lines:
-        line = line.strip()
-        if line and any(str(i) in line for i in range(1, expected_count + 1)):
-            if 'Yes' in line or 'No' in line:
-                valid_lines.append(line)
+    answers, error = _parse_answer_lines(response_text, expected_count)
+    if error:
+        return False, error
 
-    if len(valid_lines) != expected_count:
-        return False, f"預期 {expected_count} 行回應，實際得到 {len(valid_lines)} 行"
+    if len(answers) != expected_count:
+        return False, f"預期 {expected_count} 行回應，實際得到 {len(answers)} 行"
 
     return True, "格式正確"
 
 def parse_batch_response(response_text, expected_count):
-    """解析批次回應為布林值列表"""
-    lines = response_text.strip().split('\n')
-    results = []
-
-    for i in range(expected_count):
-        found = False
-        for line in lines:
-            line = line.strip()
-            if str(i+1) in line or f"{i+1}." in line:
-                if 'Yes' in line or 'yes' in line or 'YES' in line:
-                    results.append(True)
-                    found = True
-                    break
-                elif 'No' in line or 'no' in line or 'NO' in line:
-                    results.append(False)
-                    found = True
-                    break
-
-        if not found:
-            results.append(None)
-
-    return results
+    """解析批次回應為布林值列表（缺少的編號為 None）"""
+    answers, _ = _parse_answer_lines(response_text, expected_count)
+    return [answers.get(i) for i in range(1, expected_count + 1)]
+
+def parse_json_batch_response(response_text, review_ids):
+    """
+    嚴格解析結構化批次回應
+
+    回應必須是 JSON 陣列，每個元素為 {"id": 評論 id, "answer": true/false}，
+    且每個評論 id 恰好出現一次；任何格式錯誤都視為整批無效。
+
+    Args:
+        response_text (str): API 回應文字
+        review_ids (list): 批次中的評論 id（依 prompt 順序）
+
+    Returns:
+        tuple: (與 review_ids 對應的布林值列表或 None, 錯誤訊息)
+    """
+    try:
+        items = json.loads(response_text)
+    except (TypeError, ValueError) as e:
+        return None, f"JSON 解析錯誤: {e}"
+
+    if not isinstance(items, list):
+        return None, "回應不是 JSON 陣列"
+
+    positions = {review_id: i for i, review_id in enumerate(review_ids)}
+    results = [None] * len(review_ids)
+
+    for item in items:
+        if not isinstance(item, dict):
+            return None, "陣列元素不是物件"
+
+        review_id = item.get('id')
+        answer = item.get('answer')
+        # bool 是 int 的子類別，需排除 true/false 被當成 id
+        if isinstance(review_id, bool) or not isinstance(review_id, int) or review_id not in positions:
+            return None, f"未知的評論 id: {review_id!r}"
+        if not isinstance(answer, bool):
+            return None, f"評論 id {review_id} 的 answer 不是布林值"
+
+        position = positions[review_id]
+        if results[position] is not None:
+            return None, f"評論 id {review_id} 重複"
+        results[position] = answer
+
+    missing = results.count(None)
+    if missing:
+        return None, f"缺少 {missing} 則評論的結果"
+
+    return results, "格式正確"
 
 # 共用的 prompt 元素
 COMMON_INSTRUCTIONS = {
     'response_format': "請按順序回答（只要數字和答案）：",
     'yes_no_format': "對每則評論回答 Yes 或 No。",
     'batch_intro': "請判斷以下夜市評論",
-    'single_intro': "請判斷以下夜市評論"
+    'single_intro': "請判斷以下夜市評論",
+    'json_response_format': "請以 JSON 陣列回答，每則評論一個物件，id 為評論的 id，answer 為答案（Yes 為 true，No 為 false）：",
+    'json_answer_format': '[{"id": 評論 id, "answer": true 或 false}, ...]'
 }
 
 # 評論品質檢查
@@ -0,0 +1,181 @@
+"""
+食物項目提取 Prompt 模組
+
+提供從具體食物評論中提取結構化食物項目的 prompt 模板，
+批次 prompt 以評論 id 標示每則評論並要求 JSON 陣列回應
+"""
+
+import json
+from .base_prompts import create_review_list
+
+# 提取欄位說明
+EXTRACTION_FIELDS = """
+- dish_name: 料理名稱（如：臭豆腐）
+- vendor_name: 店家名稱（如：326臭臭鍋）
+- description: 描述內容
+- price: 價格（如：40元）
+- rating_sentiment: positive/negative/neutral
+- data_completeness: complete/partial/minimal
+"""
+
+# 提取項目欄位的長度上限（與 extracted_food_items 欄位定義一致）
+ITEM_FIELD_LIMITS = {
+    'dish_name': 100,
+    'vendor_name': 100,
+    'description': None,
+    'price': 50
+}
+
+RATING_SENTIMENTS = ('positive', 'negative', 'neutral')
+DATA_COMPLETENESS = ('complete', 'partial', 'minimal')
+
+# 單一提取項目的結構化輸出格式
+EXTRACTED_ITEM_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'dish_name': {'type': 'string', 'nullable': True},
+        'vendor_name': {'type': 'string', 'nullable': True},
+        'description': {'type': 'string', 'nullable': True},
+        'price': {'type': 'string', 'nullable': True},
+        'rating_sentiment': {'type': 'string', 'enum': list(RATING_SENTIMENTS)},
+        'data_completeness': {'type': 'string', 'enum': list(DATA_COMPLETENESS)}
+    },
+    'required': ['dish_name', 'rating_sentiment', 'data_completeness']
+}
+
+# 批次提取的結構化輸出格式：以評論 id 為鍵的 JSON 陣列
+EXTRACTION_RESPONSE_SCHEMA = {
+    'type': 'array',
+    'items': {
+        'type': 'object',
+        'properties': {
+            'id': {'type': 'integer'},
+            'items': {'type': 'array', 'items': EXTRACTED_ITEM_SCHEMA}
+        },
+        'required': ['id', 'items']
+    }
+}
+
+def get_extraction_single_prompt(content):
+    """取得單則評論的提取 prompt"""
+    return f"""
+從評論中提取食物相關資訊，返回JSON格式。
+
+評論：{content}
+
+請提取：
+{EXTRACTION_FIELDS.strip()}
+
+返回格式：
+{{"items": [{{"dish_name": "料理名稱", "vendor_name": "店家名稱", "description": "描述", "price": "價格", "rating_sentiment": "positive", "data_completeness": "partial"}}]}}
+
+如果沒有項目，返回：{{"items": []}}
+"""
+
+def get_extraction_batch_prompt(review_batch):
+    """取得多則評論的批次提取 prompt"""
+    template = """從以下每則評論中提取食物相關資訊。
+
+請提取：
+{fields}
+
+{review_list}
+
+請以 JSON 陣列回答，每則評論一個物件，id 為評論的 id，沒有項目時 items 為空陣列：
+[{{"id": 評論 id, "items": [{{"dish_name": "料理名稱", "vendor_name": "店家名稱", "description": "描述", "price": "價格", "rating_sentiment": "positive", "data_completeness": "partial"}}]}}, ...]"""
+
+    return template.format(
+        fields=EXTRACTION_FIELDS.strip(),
+        review_list=create_review_list(review_batch, structured=True)
+    )
+
+def clean_extracted_item(item):
+    """
+    整理單一提取項目
+
+    字串欄位去除空白並截斷至欄位長度，列舉欄位不符時使用預設值。
+
+    Returns:
+        dict or None: 整理後的項目，格式不符時為 None
+    """
+    if not isinstance(item, dict):
+        return None
+
+    cleaned = {}
+    for field, limit in ITEM_FIELD_LIMITS.items():
+        value = item.get(field)
+        if value is not None and not isinstance(value, str):
+            value = str(value)
+        if value is not None:
+            value = value.strip() or None
+        if value is not None and limit is not None:
+            value = value[:limit]
+        cleaned[field] = value
+
+    sentiment = item.get('rating_sentiment')
+    cleaned['rating_sentiment'] = sentiment if sentiment in RATING_SENTIMENTS else None
+    completeness = item.get('data_completeness')
+    cleaned['data_completeness'] = completeness if completeness in DATA_COMPLETENESS else 'partial'
+    return cleaned
+
+def parse_extraction_batch_response(response_text, review_ids):
+    """
+    嚴格解析批次提取回應
+
+    每個評論 id 必須恰好出現一次，items 必須是陣列，否則整批無效。
+
+    Args:
+        response_text (str): API 回應文字
+        review_ids (list): 批次中的評論 id（依 prompt 順序）
+
+    Returns:
+        tuple: (與 review_ids 對應的項目列表或 None, 錯誤訊息)
+    """
+    try:
+        entries = json.loads(response_text)
+    except (TypeError, ValueError) as e:
+        return None, f"JSON 解析錯誤: {e}"
+
+    if not isinstance(entries, list):
+        return None, "回應不是 JSON 陣列"
+
+    positions = {review_id: i for i, review_id in enumerate(review_ids)}
+    results = [None] * len(review_ids)
+
+    for entry in entries:
+        if not isinstance(entry, dict):
+            return None, "陣列元素不是物件"
+
+        review_id = entry.get('id')
+        if isinstance(review_id, bool) or not isinstance(review_id, int) or review_id not in positions:
+            return None, f"未知的評論 id: {review_id!r}"
+
+        items = entry.get('items')
+        if not isinstance(items, list):
+            return None, f"評論 id {review_id} 的 items 不是陣列"
+
+        position = positions[review_id]
+        if results[position] is not None:
+            return None, f"評論 id {review_id} 重複"
+        results[position] = [item for item in map(clean_extracted_item, items) if item]
+
+    missing = results.count(None)
+    if missing:
+        return None, f"缺少 {missing} 則評論的結果"
+
+    return results, "格式正確"
+
+# Prompt 版本資訊
+PROMPT_VERSION = {
+    'version': '1.0',
+    'last_updated': '2026-10-19',
+    'description': '結構化食物項目提取 prompt',
+    'criteria': [
+        '提取料理名稱、店家名稱、描述、價格',
+        '情感評價 positive/negative/neutral，資料完整度 complete/partial/minimal'
+    ]
+}
+
+def get_prompt_info():
+    """取得 prompt 版本資訊"""
+    return PROMPT_VERSION
@@ -12,8 +12,8 @@ FOOD_RELEVANCE_CRITERIA = """
 如果只談論環境、設施、管理、服務等，回答 "No"
 """
 
-def get_food_relevance_batch_prompt(review_batch):
-    """取得食物相關性批次判別 prompt"""
+def get_food_relevance_batch_prompt(review_batch, structured=False):
+    """取得食物相關性批次判別 prompt（structured=True 時要求 JSON 陣列回應）"""
     template = """{batch_intro}是否與食物相關，{yes_no_format}
 
 {criteria}
@@ -26,6 +26,7 @@ def get_food_relevance_batch_prompt(review_batch):
     return format_batch_prompt(
         template,
         review_batch,
+        structured=structured,
         batch_intro=COMMON_INSTRUCTIONS['batch_intro'],
         yes_no_format=COMMON_INSTRUCTIONS['yes_no_format'],
         criteria=FOOD_RELEVANCE_CRITERIA.strip(),
@@ -0,0 +1,127 @@
+"""
+融合判別 Prompt 模組
+
+一次請求同時取得食物相關性、具體食物提及與結構化食物項目，
+每則評論的內容只需送出一次
+"""
+
+import json
+from .base_prompts import create_review_list
+from .food_relevance_prompts import FOOD_RELEVANCE_CRITERIA
+from .specific_food_prompts import SPECIFIC_FOOD_CRITERIA
+from .extraction_prompts import EXTRACTED_ITEM_SCHEMA, EXTRACTION_FIELDS, clean_extracted_item
+
+# 結構化輸出格式：以評論 id 為鍵的 JSON 陣列
+FUSED_RESPONSE_SCHEMA = {
+    'type': 'array',
+    'items': {
+        'type': 'object',
+        'properties': {
+            'id': {'type': 'integer'},
+            'is_food_related': {'type': 'boolean'},
+            'has_specific_food': {'type': 'boolean'},
+            'items': {
+                'type': 'array',
+                'items': EXTRACTED_ITEM_SCHEMA
+            }
+        },
+        'required': ['id', 'is_food_related', 'has_specific_food', 'items']
+    }
+}
+
+def get_fused_batch_prompt(review_batch):
+    """取得融合判別批次 prompt"""
+    template = """請分析以下夜市評論，對每則評論完成三個步驟：
+
+1. is_food_related：評論是否與食物相關
+{relevance_criteria}
+
+2. has_specific_food：食物相關的評論是否提到具體的食物項目或店家（不相關時為 false）
+{specific_criteria}
+
+3. items：具體提及的評論提取食物項目（沒有具體提及時為空陣列）
+{extraction_fields}
+
+{review_list}
+
+請以 JSON 陣列回答，每則評論一個物件，id 為評論的 id：
+[{{"id": 評論 id, "is_food_related": true, "has_specific_food": true, "items": [{{"dish_name": "料理名稱", "vendor_name": "店家名稱", "description": "描述", "price": "價格", "rating_sentiment": "positive", "data_completeness": "partial"}}]}}, ...]"""
+
+    return template.format(
+        relevance_criteria=FOOD_RELEVANCE_CRITERIA.strip(),
+        specific_criteria=SPECIFIC_FOOD_CRITERIA.strip(),
+        extraction_fields=EXTRACTION_FIELDS.strip(),
+        review_list=create_review_list(review_batch, structured=True)
+    )
+
+def parse_fused_batch_response(response_text, review_ids):
+    """
+    嚴格解析融合判別回應
+
+    每個評論 id 必須恰好出現一次，兩個判別欄位必須是布林值，否則整批無效；
+    不相關的評論不計具體提及，沒有具體提及的評論不保留提取項目。
+
+    Args:
+        response_text (str): API 回應文字
+        review_ids (list): 批次中的評論 id（依 prompt 順序）
+
+    Returns:
+        tuple: (與 review_ids 對應的 (is_food_related, has_specific_food, items) 列表或 None, 錯誤訊息)
+    """
+    try:
+        entries = json.loads(response_text)
+    except (TypeError, ValueError) as e:
+        return None, f"JSON 解析錯誤: {e}"
+
+    if not isinstance(entries, list):
+        return None, "回應不是 JSON 陣列"
+
+    positions = {review_id: i for i, review_id in enumerate(review_ids)}
+    results = [None] * len(review_ids)
+
+    for entry in entries:
+        if not isinstance(entry, dict):
+            return None, "陣列元素不是物件"
+
+        review_id = entry.get('id')
+        if isinstance(review_id, bool) or not isinstance(review_id, int) or review_id not in positions:
+            return None, f"未知的評論 id: {review_id!r}"
+
+        is_food = entry.get('is_food_related')
+        has_specific = entry.get('has_specific_food')
+        if not isinstance(is_food, bool) or not isinstance(has_specific, bool):
+            return None, f"評論 id {review_id} 的判別欄位不是布林值"
+
+        items = entry.get('items') or []
+        if not isinstance(items, list):
+            return None, f"評論 id {review_id} 的 items 不是陣列"
+
+        has_specific = is_food and has_specific
+        cleaned = [item for item in map(clean_extracted_item, items) if item] if has_specific else []
+
+        position = positions[review_id]
+        if results[position] is not None:
+            return None, f"評論 id {review_id} 重複"
+        results[position] = (is_food, has_specific, cleaned)
+
+    missing = results.count(None)
+    if missing:
+        return None, f"缺少 {missing} 則評論的結果"
+
+    return results, "格式正確"
+
+# Prompt 版本資訊
+PROMPT_VERSION = {
+    'version': '1.0',
+    'last_updated': '2026-10-19',
+    'description': '食物相關性、具體食物提及與食物項目提取的融合判別 prompt',
+    'criteria': [
+        '食物相關性判別標準同 food_relevance_prompts',
+        '具體食物提及判別標準同 specific_food_prompts',
+        '具體提及的評論提取料理、店家、描述、價格、情感與完整度'
+    ]
+}
+
+def get_prompt_info():
+    """取得 prompt 版本資訊"""
+    return PROMPT_VERSION
@@ -30,8 +30,8 @@ SPECIFIC_FOOD_EXAMPLES = """
 ❌ 划算、貴、值得
 """
 
-def get_specific_food_batch_prompt(review_batch, include_examples=True):
-    """取得具體食物項目批次判別 prompt"""
+def get_specific_food_batch_prompt(review_batch, include_examples=True, structured=False):
+    """取得具體食物項目批次判別 prompt（structured=True 時要求 JSON 陣列回應）"""
     template = """{batch_intro}是否提到具體的食物項目或店家。
 
 {criteria}
@@ -48,6 +48,7 @@ def get_specific_food_batch_prompt(review_batch, include_examples=True):
     return format_batch_prompt(
         template,
         review_batch,
+        structured=structured,
         batch_intro=COMMON_INSTRUCTIONS['batch_intro'],
         criteria=SPECIFIC_FOOD_CRITERIA.strip(),
         examples=examples_text.strip(),
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+LLM 結果日誌重播腳本
+
+將 journal 目錄中尚未寫入資料庫的 Gemini 判別結果重新套用，
+適用於資料庫中斷後的復原，不需要重新呼叫 API。分析腳本啟動時也會自動
+重播並壓縮同一階段的日誌；正在執行的腳本持有的日誌會略過。
+
+使用方式:
+    python replay_journal.py             # 重播所有日誌
+    python replay_journal.py --dry-run   # 只列出待重播的筆數
+    python replay_journal.py --compact   # 重播後壓縮日誌，只保留仍未提交的批次
+"""
+
+import argparse
+import glob
+import os
+import sys
+from config import JOURNAL_DIR
+from utils.database_manager import ReviewAnalysisManager
+from utils.result_journal import ResultJournal
+
+def main():
+    """主要執行流程"""
+    parser = argparse.ArgumentParser(description='重播尚未寫入資料庫的 LLM 結果日誌')
+    parser.add_argument('--journal-dir', default=JOURNAL_DIR, help='日誌目錄')
+    parser.add_argument('--dry-run', action='store_true', help='只統計，不寫入資料庫')
+    parser.add_argument('--compact', action='store_true', help='重播後壓縮日誌檔')
+    args = parser.parse_args()
+
+    journal_paths = sorted(glob.glob(os.path.join(args.journal_dir, '*.jsonl')))
+    if not journal_paths:
+        print(f"{args.journal_dir} 中沒有日誌檔")
+        return 0
+
+    db_manager = None if args.dry_run else ReviewAnalysisManager()
+    total_entries = 0
+    failed = 0
+
+    for path in journal_paths:
+        journal = ResultJournal(path)
+
+        # 正在執行的分析腳本持有日誌的鎖，略過以免與其寫入交錯
+        if not args.dry_run and not journal.acquire():
+            print(f"- {path}: 使用中，略過")
+            continue
+
+        try:
+            stats = journal.replay(db_manager, dry_run=args.dry_run)
+            total_entries += stats['entries']
+            action = '待重播' if args.dry_run else '已重播'
+            print(f"✓ {path}: {action} {stats['batches']} 批 / {stats['entries']} 則")
+
+            if args.compact and not args.dry_run:
+                remaining = journal.compact()
+                print(f"  已壓縮，保留 {remaining} 批未提交結果")
+        except Exception as e:
+            print(f"✗ {path} 重播失敗: {e}")
+            failed += 1
+        finally:
+            journal.release()
+
+    print(f"\n合計{'待重播' if args.dry_run else '重播'} {total_entries} 則結果")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n✗ 使用者中斷")
+        sys.exit(1)
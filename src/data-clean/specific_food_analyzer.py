@@ -11,67 +11,49 @@
 - prompts.specific_food_prompts: 具體食物項目 prompt
 """
 
-import time
-from utils.gemini_client import create_gemini_client
-from utils.database_manager import ReviewAnalysisManager
-from utils.prompt_loader import create_prompt_loader, validate_prompt_input
+import argparse
+from functools import partial
+from utils.async_gemini_client import (
+    OUTPUT_TOKENS_PER_ITEM,
+    STRUCTURED_OUTPUT_TOKENS_PER_ITEM,
+    create_async_gemini_client
+)
+from utils.database_manager import (
+    LABEL_SOURCE_GEMINI,
+    ReviewAnalysisManager,
+    STAGE_LABEL_COLUMNS,
+    default_worker_id,
+    print_connection_stats
+)
+from utils.result_journal import create_result_journal, recover_journals
+from utils.prompt_loader import create_prompt_loader
+from utils.batch_packer import TokenBatchPacker
+from utils.batch_pipeline import BatchPipeline, parse_classification_result, submit_classification
+from utils.local_classifier import LocalReviewClassifier, get_model_path
+from config import BATCH_PACKING
+from prompts.specific_food_prompts import get_specific_food_batch_prompt
 
 # 處理設定
-BATCH_SIZE = 15
-BATCH_DELAY = 5  # 批次間延遲秒數
-
-def process_batch(client, db_manager, prompt_loader, batch, batch_num, total_batches):
-    """處理單一批次的評論"""
-    print(f"\n處理第 {batch_num}/{total_batches} 批次 ({len(batch)} 則評論)")
-
-    # 驗證批次輸入
-    is_valid, message = validate_prompt_input(review_batch=batch)
-    if not is_valid:
-        print(f"批次輸入驗證失敗: {message}")
-        return None
-
-    # 取得批次 prompt
-    try:
-        prompt = prompt_loader.get_specific_food_prompt(review_batch=batch)
-        batch_results = client.analyze_batch(prompt, len(batch))
-
-        if batch_results is not None:
-            return batch_results
-        else:
-            print(f"批次 {batch_num} API 分析失敗")
-            return None
-
-    except Exception as e:
-        print(f"批次 {batch_num} 處理錯誤: {e}")
-        return None
-
-def process_single_fallback(client, db_manager, prompt_loader, batch, batch_num):
-    """單則處理的回退方案"""
-    print(f"批次 {batch_num} 回退到逐則處理")
-
-    results = []
-    for review_id, content in batch:
-        print(f"  處理評論 ID: {review_id}")
-
-        try:
-            prompt = prompt_loader.get_specific_food_prompt(content=content)
-            result = client.analyze_single(prompt)
-            results.append(result)
-            time.sleep(2)  # 較短的延遲
-        except Exception as e:
-            print(f"  評論 ID {review_id} 處理失敗: {e}")
-            results.append(None)
-
-    return results
-
-def update_database_batch(db_manager, batch, results):
-    """批次更新資料庫"""
-    updates = []
-    stats = {'processed': 0, 'specific_food': 0, 'general_food': 0, 'failed': 0}
-
-    for (review_id, content), result in zip(batch, results):
+BATCH_SIZE = 15  # 固定分批（--token-budget 0）時的每批數量
+LEASE_SECONDS = 600  # 租約模式下每批評論的租約秒數
+
+def update_database_batch(db_manager, batch, results, journal=None, worker_id=None, sources=None):
+    """
+    批次更新資料庫
+
+    有提供 journal 時先將結果寫入本地日誌，資料庫更新成功後再標記提交，
+    更新失敗時結果保留在日誌中，下次執行或 replay_journal.py 會重新套用。
+    租約模式（提供 worker_id）只寫入仍持有租約的評論並同時釋放租約，
+    租約到期後已被其他程序接手的評論不寫入。
+    sources 為每則結果的標記來源（預設皆為 Gemini），不同來源分別寫入並記錄於標記來源欄位。
+    """
+    updates_by_source = {}
+    stats = {'processed': 0, 'specific_food': 0, 'general_food': 0, 'failed': 0, 'lease_lost': 0}
+
+    sources = sources or [LABEL_SOURCE_GEMINI] * len(batch)
+    for (review_id, content), result, source in zip(batch, results, sources):
         if result is not None:
-            updates.append((result, review_id))
+            updates_by_source.setdefault(source, []).append((result, review_id))
             stats['processed'] += 1
             if result:
                 stats['specific_food'] += 1
@@ -80,18 +62,54 @@ def update_database_batch(db_manager, batch, results):
         else:
             stats['failed'] += 1
 
-    if updates:
-        db_manager.batch_update_specific_food_mention(updates)
+    for source, updates in updates_by_source.items():
+        batch_id = journal.append_results(STAGE_LABEL_COLUMNS['specific_food'], updates, source) if journal else None
+        if worker_id:
+            _, lost_ids = db_manager.save_leased_labels(STAGE_LABEL_COLUMNS['specific_food'], updates, worker_id,
+                                                        source)
+            stats['lease_lost'] += len(lost_ids)
+        else:
+            db_manager.batch_update_specific_food_mention(updates, source)
+        if journal:
+            journal.mark_committed(batch_id)
 
     return stats
 
-def process_specific_food_analysis():
-    """主要處理流程（重構版本）"""
+def fan_out_duplicates(db_manager, content_hashes=None):
+    """
+    將判別結果套用到相同內容雜湊的待處理評論
+
+    Returns:
+        int: 套用標記的評論數（未建立 content_hash 欄位時為 0）
+    """
+    try:
+        return db_manager.fan_out_labels('specific_food', content_hashes)
+    except Exception as e:
+        print(f"相同內容標記套用失敗: {e}")
+        return 0
+
+def process_specific_food_analysis(worker_mode=False, worker_id=None, lease_seconds=LEASE_SECONDS, concurrency=None,
+                                   token_budget=None, max_items=None, structured=True, local_model=None,
+                                   local_threshold=None):
+    """
+    主要處理流程（重構版本）
+
+    Args:
+        worker_mode (bool): 是否以租約模式認領批次（可多個程序同時執行）
+        worker_id (str): 租約認領者識別碼，預設為主機名稱與程序 ID
+        lease_seconds (int): 租約有效秒數
+        concurrency (int): 同時進行中的批次數，預設依 GEMINI_MAX_CONCURRENCY
+        token_budget (int): 每批估算 token 上限，預設依 BATCH_PACKING，0 表示固定每批 BATCH_SIZE 則
+        max_items (int): 每批最多評論數，預設依 BATCH_PACKING
+        structured (bool): 是否使用結構化 JSON 輸出（response_schema），否則使用逐行 Yes/No 文字
+        local_model (str): 本地分類器模型檔，提供時只有低信心的評論送交 Gemini
+        local_threshold (float): 本地分類器信心門檻，預設使用訓練時選擇的門檻
+    """
     print("=== 具體食物項目分析處理 ===")
 
     # 初始化元件
     try:
-        client = create_gemini_client(use_rate_limit=True, requests_per_minute=15)
+        client = create_async_gemini_client(max_concurrency=concurrency)
         db_manager = ReviewAnalysisManager()
         prompt_loader = create_prompt_loader()
         print("系統元件初始化完成")
@@ -99,10 +117,36 @@ def process_specific_food_analysis():
         print(f"系統初始化失敗: {e}")
         return
 
+    # 載入本地分類器：快取未命中的評論先在本地判別，信心不足的才送交 Gemini
+    local_classifier = None
+    local_stats = {'local': 0, 'routed': 0}
+    if local_model:
+        try:
+            local_classifier = LocalReviewClassifier.load(local_model, 'specific_food')
+            print(f"本地分類器: {local_model}（信心門檻 {local_threshold or local_classifier.threshold}）")
+        except Exception as e:
+            print(f"本地分類器載入失敗: {e}")
+            return
+
+    if worker_mode:
+        worker_id = worker_id or default_worker_id()
+
+    # 先重播並壓縮同一階段未被其他程序使用的日誌（包含先前 worker 留下的檔案），避免重複呼叫 API
+    journal = create_result_journal('specific_food', worker_id if worker_mode else None)
+    recovered = recover_journals('specific_food', db_manager, current=journal)
+    if recovered['entries']:
+        print(f"已從 {recovered['files']} 個日誌檔重播 {recovered['entries']} 則先前未寫入的結果")
+    for path, error in recovered['failed']:
+        print(f"日誌重播失敗，結果保留於 {path}: {error}")
+
+    # 先將既有判別結果套用到相同內容的待處理評論，這些評論不需再送交 LLM
+    dedupe_stats = {'in_batch': 0, 'prefilled': fan_out_duplicates(db_manager), 'fan_out': 0}
+    if dedupe_stats['prefilled']:
+        print(f"已套用相同內容的既有判別結果 {dedupe_stats['prefilled']} 則")
+
     # 取得待處理的食物相關評論
     try:
-        reviews = db_manager.get_food_related_reviews()
-        total_reviews = len(reviews)
+        total_reviews = db_manager.count_pending_reviews('specific_food')
         print(f"找到 {total_reviews} 則需要處理的食物相關評論")
 
         if total_reviews == 0:
@@ -113,37 +157,71 @@ def process_specific_food_analysis():
         return
 
     # 批次處理
-    total_stats = {'processed': 0, 'specific_food': 0, 'general_food': 0, 'failed': 0}
-
-    for i in range(0, total_reviews, BATCH_SIZE):
-        batch = reviews[i:i + BATCH_SIZE]
-        batch_num = i // BATCH_SIZE + 1
-        total_batches = (total_reviews + BATCH_SIZE - 1) // BATCH_SIZE
-
-        # 嘗試批次處理
-        batch_results = process_batch(client, db_manager, prompt_loader, batch, batch_num, total_batches)
-
-        # 如果批次處理失敗，回退到逐則處理
-        if batch_results is None:
-            batch_results = process_single_fallback(client, db_manager, prompt_loader, batch, batch_num)
-
-        # 更新資料庫
-        if batch_results:
-            try:
-                batch_stats = update_database_batch(db_manager, batch, batch_results)
+    total_stats = {'processed': 0, 'specific_food': 0, 'general_food': 0, 'failed': 0, 'lease_lost': 0}
+
+    # 依 token 預算重新分批：短評論合併成較大的批次，長評論分到較小的批次
+    if token_budget is None:
+        token_budget = BATCH_PACKING['token_budget']
+    if token_budget:
+        max_items = max_items or BATCH_PACKING['max_items']
+    else:
+        max_items = BATCH_SIZE
+    output_tokens = STRUCTURED_OUTPUT_TOKENS_PER_ITEM if structured else OUTPUT_TOKENS_PER_ITEM
+    packer = TokenBatchPacker(partial(get_specific_food_batch_prompt, structured=structured), token_budget, max_items,
+                              output_tokens)
+
+    total_batches = (total_reviews + max_items - 1) // max_items
+
+    if worker_mode:
+        # 租約模式：以 SKIP LOCKED 認領互不重疊的批次，多個程序可同時執行
+        print(f"租約模式，認領者: {worker_id}")
+        batches = db_manager.iter_claimed_batches('specific_food', worker_id, max_items, lease_seconds)
+    else:
+        # 以 keyset 分頁逐批讀取，不預先載入全部待處理評論
+        batches = db_manager.iter_food_related_reviews(max_items)
+
+    def save_batch(batch_num, batch, batch_results, content_hashes, sources):
+        """寫入資料庫並將結果套用到批次外相同內容的待處理評論"""
+        try:
+            batch_stats = update_database_batch(db_manager, batch, batch_results, journal,
+                                                worker_id if worker_mode else None, sources)
 
-                # 累計統計
-                for key in total_stats:
-                    total_stats[key] += batch_stats[key]
+            done_hashes = list(dict.fromkeys(digest for digest, result in zip(content_hashes, batch_results)
+                                             if result is not None))
+            dedupe_stats['fan_out'] += fan_out_duplicates(db_manager, done_hashes)
 
-                print(f"批次 {batch_num} 完成 - 處理: {batch_stats['processed']}, 失敗: {batch_stats['failed']}")
+            # 累計統計
+            for key in total_stats:
+                total_stats[key] += batch_stats[key]
 
-                # 批次間延遲
-                if batch_num < total_batches:
-                    time.sleep(BATCH_DELAY)
+            print(f"批次 {batch_num} 完成 - 處理: {batch_stats['processed']}, 失敗: {batch_stats['failed']}")
+            if batch_stats['lease_lost']:
+                print(f"  租約已被其他程序接手，未寫入: {batch_stats['lease_lost']} 則")
 
-            except Exception as e:
-                print(f"批次 {batch_num} 資料庫更新失敗: {e}")
+        except Exception as e:
+            print(f"批次 {batch_num} 資料庫更新失敗: {e}")
+            print(f"  結果已保留於 {journal.path}，可執行 python replay_journal.py 重新套用")
+
+    def fill_local_results(representatives, results):
+        """快取未命中的評論先由本地分類器判別，信心不足的維持 None 送交 Gemini"""
+        local_stats['local'] += local_classifier.fill_results(representatives, results, local_threshold)
+
+    # 回應快取鍵值包含 prompt 版本，修改 prompt 並更新版本後不會取用舊結果
+    prompt_version = f"specific_food@{prompt_loader.get_prompt_info('specific_food')['version']}"
+
+    # 批次內相同內容只送一則代表評論，送出、收集與二分法重試由 BatchPipeline 負責
+    pipeline = BatchPipeline(
+        client,
+        partial(submit_classification, client, prompt_loader.get_specific_food_prompt, structured=structured),
+        parse_classification_result,
+        prompt_version,
+        prefill=fill_local_results if local_classifier else None
+    )
+    pipeline.run(packer.pack(batches), save_batch, total_batches)
+    dedupe_stats['in_batch'] = pipeline.stats['in_batch']
+    local_stats['routed'] = pipeline.stats['sent']
+
+    client.close()
 
     # 顯示最終統計
     print(f"\n=== 處理完成 ===")
@@ -151,6 +229,15 @@ def process_specific_food_analysis():
     print(f"具體食物提及: {total_stats['specific_food']} 則")
     print(f"泛指食物評論: {total_stats['general_food']} 則")
     print(f"處理失敗: {total_stats['failed']} 則")
+    if worker_mode:
+        print(f"租約被接手未寫入: {total_stats['lease_lost']} 則")
+
+    # 顯示重複內容統計
+    saved = dedupe_stats['in_batch'] + dedupe_stats['prefilled'] + dedupe_stats['fan_out']
+    print(f"\n=== 重複內容統計 ===")
+    print(f"批次內相同內容: {dedupe_stats['in_batch']} 則")
+    print(f"套用既有結果: {dedupe_stats['prefilled'] + dedupe_stats['fan_out']} 則")
+    print(f"節省 LLM 判別: {saved} 則")
 
     # 顯示資料庫統計
     try:
@@ -188,6 +275,52 @@ def process_specific_food_analysis():
     except Exception as e:
         print(f"取得 Prompt 統計失敗: {e}")
 
+    # 顯示批次打包統計（以 --token-budget 0 執行可取得固定分批的對照數據）
+    pack_stats = packer.get_stats()
+    failure_rate = pipeline.stats['batches'] / pack_stats['batches'] * 100 if pack_stats['batches'] else 0.0
+    print(f"\n=== 批次打包統計 ===")
+    print(f"回應格式: {'結構化 JSON' if structured else '逐行文字'}")
+    if pack_stats['token_budget']:
+        print(f"分批方式: token 預算 {pack_stats['token_budget']}，每批最多 {pack_stats['max_items_limit']} 則")
+    else:
+        print(f"分批方式: 固定每批 {pack_stats['max_items_limit']} 則")
+    print(f"API 批次: {pack_stats['batches']} 次，平均每次 {pack_stats['avg_items']:.1f} 則（最多 {pack_stats['max_items']} 則）")
+    print(f"平均估算: {pack_stats['avg_tokens']:.0f} tokens/批次，超過預算的單則評論: {pack_stats['oversized']} 則")
+    print(f"批次失敗: {pipeline.stats['batches']} 次（{failure_rate:.1f}%），涉及評論: {pipeline.stats['fallback_reviews']} 則")
+    print(f"回退呼叫: {pipeline.stats['calls']} 次（其中單則 {pipeline.stats['single_calls']} 次）")
+
+    # 顯示本地分類器統計
+    if local_classifier:
+        local_total = local_stats['local'] + local_stats['routed']
+        local_rate = local_stats['local'] / local_total * 100 if local_total else 0.0
+        print(f"\n=== 本地分類器統計 ===")
+        print(f"本地判別: {local_stats['local']} 則（{local_rate:.1f}%），送交 Gemini: {local_stats['routed']} 則")
+
+    # 顯示回應快取統計
+    cache_stats = client.get_cache_stats()
+    if cache_stats:
+        print(f"\n=== 回應快取統計 ===")
+        print(f"命中: {cache_stats['hits']} 則，未命中: {cache_stats['misses']} 則（命中率 {cache_stats['hit_rate']:.1f}%）")
+        print(f"寫入: {cache_stats['writes']} 則，淘汰: {cache_stats['evictions']} 則，"
+              f"目前 {cache_stats['entries']}/{cache_stats['max_entries']} 則")
+
+    # 顯示 API 配額使用統計
+    rate_stats = client.get_rate_stats()
+    print(f"\n=== API 配額使用統計 ===")
+    print(f"配額設定: {rate_stats['requests_per_minute']} RPM / {rate_stats['tokens_per_minute']} TPM，"
+          f"並行 {rate_stats['max_concurrency']}")
+    print(f"API 請求: {rate_stats['requests']} 次，估計 {rate_stats['tokens']} tokens")
+    print(f"限速等待: {rate_stats['throttled']} 次，共 {rate_stats['wait_seconds']:.1f} 秒")
+    if 'slots' in rate_stats:
+        print(f"配額錯誤切換: {rate_stats['failovers']} 次")
+        for slot in rate_stats['slots']:
+            exhausted = '（今日配額已用完）' if slot['exhausted'] else ''
+            print(f"  {slot['slot']}: 請求 {slot['requests']} 次，今日 {slot['requests_today']}/{slot['requests_per_day']}，"
+                  f"429 錯誤 {slot['quota_errors']} 次{exhausted}")
+
+    # 顯示資料庫連線統計
+    print_connection_stats(db_manager.get_connection_stats())
+
 def generate_analysis_report():
     """生成詳細的分析結果報告"""
     try:
@@ -209,13 +342,37 @@ def generate_analysis_report():
     except Exception as e:
         print(f"生成報告失敗: {e}")
 
+def parse_args():
+    """解析命令列參數"""
+    parser = argparse.ArgumentParser(description='具體食物項目分析')
+    parser.add_argument('--worker', action='store_true',
+                        help='以租約模式認領批次，可在多台主機上同時執行多個程序')
+    parser.add_argument('--worker-id', default=None, help='租約認領者識別碼（預設為主機名稱:程序 ID）')
+    parser.add_argument('--lease-seconds', type=int, default=LEASE_SECONDS, help='每批評論的租約秒數')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help='同時進行中的批次數（預設依 GEMINI_MAX_CONCURRENCY）')
+    parser.add_argument('--token-budget', type=int, default=None,
+                        help='每批估算 token 上限（預設依 BATCH_TOKEN_BUDGET），0 表示固定每批 %d 則' % BATCH_SIZE)
+    parser.add_argument('--max-batch-size', type=int, default=None,
+                        help='每批最多評論數（預設依 BATCH_MAX_ITEMS）')
+    parser.add_argument('--output-format', choices=['json', 'text'], default='json',
+                        help='批次回應格式：json 為以評論 id 為鍵的結構化輸出，text 為逐行 Yes/No')
+    parser.add_argument('--local-model', nargs='?', const=get_model_path('specific_food'), default=None,
+                        help='先以本地分類器判別，只有低信心的評論送交 Gemini（預設模型為 %(const)s）')
+    parser.add_argument('--local-threshold', type=float, default=None,
+                        help='本地分類器信心門檻（預設使用訓練時選擇的門檻）')
+    return parser.parse_args()
+
 if __name__ == "__main__":
     print("=== 具體食物項目分析工具 ===")
     print("分析食物相關評論中是否提到具體的食物項目或店家")
     print()
 
     try:
-        process_specific_food_analysis()
+        args = parse_args()
+        process_specific_food_analysis(args.worker, args.worker_id, args.lease_seconds, args.concurrency,
+                                       args.token_budget, args.max_batch_size, args.output_format == 'json',
+                                       args.local_model, args.local_threshold)
         generate_analysis_report()
     except KeyboardInterrupt:
         print("\n使用者中斷處理")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+reviews → review_analysis 增量同步腳本
+
+以 review_analysis 中最大的 review_id 作為高水位標記，只把之後新增、
+內容非空的評論複製到 review_analysis，取代手動整表複製，並補齊 content_hash。
+--refresh-content 另外比對內容，更新被編輯的評論並重設其分析標記。
+
+使用方式:
+    python sync_review_analysis.py                                   # 同步新評論
+    python sync_review_analysis.py --refresh-content                 # 同步並更新被編輯的評論
+    python sync_review_analysis.py --refresh-content --edited-since 2025-01-01
+    python sync_review_analysis.py --watch 300                       # 每 5 分鐘同步一次
+"""
+
+import argparse
+import sys
+import time
+from utils.database_manager import ReviewAnalysisManager
+
+SYNC_BATCH_SIZE = 1000
+
+def sync_new_reviews(db_manager, batch_size=SYNC_BATCH_SIZE):
+    """
+    同步高水位標記之後的新評論
+
+    Returns:
+        int: 新增的評論數
+    """
+    high_water_mark = db_manager.get_sync_high_water_mark()
+    print(f"高水位標記: reviews.id = {high_water_mark}")
+
+    total_inserted = 0
+    while True:
+        inserted, upper = db_manager.sync_new_reviews(high_water_mark, batch_size)
+        # 已無更多 reviews 可掃描
+        if upper == high_water_mark:
+            break
+
+        high_water_mark = upper
+        total_inserted += inserted
+        if inserted:
+            print(f"  + 新增 {inserted} 則（至 reviews.id = {high_water_mark}）")
+
+    return total_inserted
+
+def refresh_edited_reviews(db_manager, batch_size=SYNC_BATCH_SIZE, edited_since=None):
+    """
+    更新內容與 reviews.snippet 不一致的評論
+
+    Returns:
+        int: 更新的評論數
+    """
+    total_refreshed = 0
+    for changes in db_manager.iter_changed_content(batch_size, edited_since):
+        refreshed = db_manager.refresh_review_content(changes)
+        total_refreshed += refreshed
+        print(f"  ~ 更新 {refreshed} 則被編輯的評論（至 review_analysis.id = {changes[-1][0]}）")
+    return total_refreshed
+
+def run_sync(db_manager, args):
+    """執行一次同步"""
+    start = time.perf_counter()
+
+    inserted = sync_new_reviews(db_manager, args.batch_size)
+    refreshed = 0
+    if args.refresh_content:
+        refreshed = refresh_edited_reviews(db_manager, args.batch_size, args.edited_since)
+
+    # 新同步的評論尚無內容雜湊，補齊後分析腳本才能套用相同內容的標記
+    hashed = db_manager.backfill_content_hashes(args.batch_size)
+
+    elapsed = time.perf_counter() - start
+    summary = f"✓ 同步完成: 新增 {inserted} 則"
+    if args.refresh_content:
+        summary += f"，更新 {refreshed} 則"
+    summary += f"，計算雜湊 {hashed} 則"
+    print(f"{summary}（{elapsed:.1f} 秒）")
+
+def main():
+    """主要執行流程"""
+    parser = argparse.ArgumentParser(description='將新評論增量同步到 review_analysis')
+    parser.add_argument('--batch-size', type=int, default=SYNC_BATCH_SIZE, help='每個交易處理的評論數')
+    parser.add_argument('--refresh-content', action='store_true',
+                        help='更新被編輯的評論內容並重設其分析標記')
+    parser.add_argument('--edited-since', default=None,
+                        help='只檢查 iso_date_of_last_edit 在此時間之後的評論（YYYY-MM-DD）')
+    parser.add_argument('--watch', type=int, default=0, metavar='SECONDS',
+                        help='每隔指定秒數重複同步，0 表示只執行一次')
+    args = parser.parse_args()
+
+    db_manager = ReviewAnalysisManager()
+
+    while True:
+        run_sync(db_manager, args)
+        if args.watch <= 0:
+            return 0
+        time.sleep(args.watch)
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n✗ 使用者中斷")
+        sys.exit(1)
+    except Exception as e:
+        print(f"✗ 執行錯誤: {e}")
+        sys.exit(1)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 腳本以 src/data-clean 為工作目錄執行（from config import ...、from utils... import ...）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,57 @@
+"""
+AsyncDatabaseManager 連線池測試
+
+需要可連線的 MySQL：設定 MYSQL_TEST_DATABASE（以及 config.py 使用的 MYSQL_PORT、
+MYSQL_USER_PASSWORD）後執行，未設定時略過。
+"""
+
+import asyncio
+import os
+import pytest
+
+pytest.importorskip('aiomysql')
+
+from config import DATABASE_CONFIG
+from utils.async_database_manager import AsyncDatabaseManager
+
+TEST_DATABASE = os.getenv('MYSQL_TEST_DATABASE')
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE, reason='未設定 MYSQL_TEST_DATABASE')
+
+def run_with_manager(scenario):
+    """以單一連線的連線池執行測試情境，結束時關閉連線池"""
+    async def main():
+        manager = AsyncDatabaseManager(dict(DATABASE_CONFIG, database=TEST_DATABASE), pool_size=1)
+        try:
+            return await scenario(manager)
+        finally:
+            await manager.close()
+
+    return asyncio.run(main())
+
+def test_reads_reuse_pooled_connection():
+    async def scenario(manager):
+        first = await manager.execute_query("SELECT CONNECTION_ID()", fetch_all=False)
+        second = await manager.execute_query("SELECT CONNECTION_ID()", fetch_all=False)
+        return first, second, manager._pool.freesize
+
+    first, second, freesize = run_with_manager(scenario)
+    assert first == second
+    assert freesize == 1
+
+def test_updates_persist_and_failed_transaction_rolls_back():
+    async def scenario(manager):
+        # 暫存表只存在於建立它的連線，連線被關閉時後續查詢會失敗
+        await manager.execute_update("CREATE TEMPORARY TABLE pool_test (id INT PRIMARY KEY, value INT)")
+        await manager.execute_batch_update("INSERT INTO pool_test VALUES (%s, %s)", [(1, 10), (2, 20)])
+        await manager.execute_update("UPDATE pool_test SET value = 11 WHERE id = 1")
+        await manager.bulk_update_column('pool_test', 'value', [(21, 2)])
+
+        with pytest.raises(RuntimeError):
+            async with manager.transaction() as conn:
+                await manager.execute_update("UPDATE pool_test SET value = 0", connection=conn)
+                raise RuntimeError('rollback')
+
+        return await manager.execute_query("SELECT id, value FROM pool_test ORDER BY id")
+
+    assert [tuple(row) for row in run_with_manager(scenario)] == [(1, 11), (2, 21)]
@@ -0,0 +1,37 @@
+"""Token 預算批次打包測試"""
+
+import pytest
+from utils.batch_packer import TokenBatchPacker
+
+def build_prompt(review_batch):
+    return "判斷以下評論：\n" + "\n".join(f"{review_id}. {content}" for review_id, content in review_batch)
+
+def reviews(contents):
+    return [(i, content) for i, content in enumerate(contents, 1)]
+
+def test_max_items_limits_batches_across_input_pages():
+    packer = TokenBatchPacker(build_prompt, token_budget=0, max_items=4)
+    pages = [reviews(['好吃'] * 3), reviews(['讚'] * 3), reviews(['推'] * 3)]
+
+    batches = list(packer.pack(pages))
+
+    assert [len(batch) for batch in batches] == [4, 4, 1]
+    assert packer.get_stats()['items'] == 9
+
+def test_token_budget_splits_long_reviews_and_keeps_oversized_alone():
+    short = '好吃'
+    long = '夜市的臭豆腐外酥內嫩，' * 40
+    packer = TokenBatchPacker(build_prompt, token_budget=200, max_items=40)
+    budget_for_long = packer.base_tokens + packer.estimate_item_tokens(long)
+    assert budget_for_long > 200
+
+    batches = list(packer.pack([reviews([short, short, long, short])]))
+
+    assert [[content for _, content in batch] for batch in batches] == [[short, short], [long], [short]]
+    stats = packer.get_stats()
+    assert stats['oversized'] == 1
+    assert stats['batches'] == 3
+
+def test_rejects_non_positive_max_items():
+    with pytest.raises(ValueError):
+        TokenBatchPacker(build_prompt, token_budget=100, max_items=0)
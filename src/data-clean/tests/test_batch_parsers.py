@@ -0,0 +1,104 @@
+"""批次回應嚴格解析測試"""
+
+import json
+from prompts.base_prompts import parse_batch_response, parse_json_batch_response, validate_batch_response
+from prompts.extraction_prompts import parse_extraction_batch_response
+from prompts.fused_prompts import parse_fused_batch_response
+
+REVIEW_IDS = [101, 205, 309]
+
+def answers(*pairs):
+    return json.dumps([{'id': review_id, 'answer': answer} for review_id, answer in pairs])
+
+def test_json_batch_maps_answers_to_prompt_order():
+    results, message = parse_json_batch_response(answers((309, False), (101, True), (205, False)), REVIEW_IDS)
+    assert results == [True, False, False]
+    assert message == "格式正確"
+
+def test_json_batch_rejects_duplicate_id():
+    results, message = parse_json_batch_response(
+        answers((101, True), (101, False), (205, True), (309, True)), REVIEW_IDS
+    )
+    assert results is None
+    assert "重複" in message
+
+def test_json_batch_rejects_unknown_id():
+    results, message = parse_json_batch_response(answers((101, True), (205, True), (999, True)), REVIEW_IDS)
+    assert results is None
+    assert "未知" in message
+
+def test_json_batch_rejects_missing_id():
+    results, message = parse_json_batch_response(answers((101, True), (205, True)), REVIEW_IDS)
+    assert results is None
+    assert "缺少 1 則" in message
+
+def test_json_batch_rejects_bool_id_and_non_bool_answer():
+    assert parse_json_batch_response('[{"id": true, "answer": true}]', [1])[0] is None
+    assert parse_json_batch_response('[{"id": 1, "answer": "yes"}]', [1])[0] is None
+
+def test_json_batch_rejects_malformed_json():
+    assert parse_json_batch_response('[{"id": 1, "answer": true}', [1])[0] is None
+    assert parse_json_batch_response('{"id": 1, "answer": true}', [1])[0] is None
+
+def test_text_batch_does_not_match_1_against_10():
+    lines = [f"{i}. {'Yes' if i == 10 else 'No'}" for i in range(10, 0, -1)]
+    results = parse_batch_response("\n".join(lines), 10)
+    assert results == [False] * 9 + [True]
+
+def test_text_batch_reads_answer_after_number_only():
+    results = parse_batch_response("1. Yes，雖然 no 停車位\n評論 2：No\n3) yes", 3)
+    assert results == [True, False, True]
+
+def test_text_batch_missing_number_is_none():
+    assert parse_batch_response("1. Yes\n3. No", 3) == [True, None, False]
+    is_valid, message = validate_batch_response("1. Yes\n3. No", 3)
+    assert not is_valid
+    assert "實際得到 2 行" in message
+
+def test_text_batch_rejects_duplicate_and_out_of_range():
+    assert validate_batch_response("1. Yes\n1. No\n2. No", 2) == (False, "回應編號 1 重複")
+    assert validate_batch_response("1. Yes\n2. No\n3. No", 2) == (False, "回應編號 3 超出範圍")
+
+def test_fused_batch_drops_specific_and_items_for_unrelated_reviews():
+    response = json.dumps([
+        {'id': 101, 'is_food_related': True, 'has_specific_food': True,
+         'items': [{'dish_name': ' 臭豆腐 ', 'rating_sentiment': 'positive'}]},
+        {'id': 205, 'is_food_related': False, 'has_specific_food': True,
+         'items': [{'dish_name': '蚵仔煎'}]},
+        {'id': 309, 'is_food_related': True, 'has_specific_food': False, 'items': [{'dish_name': '雞排'}]}
+    ])
+    results, _ = parse_fused_batch_response(response, REVIEW_IDS)
+
+    assert [(is_food, has_specific) for is_food, has_specific, _ in results] == [
+        (True, True), (False, False), (True, False)
+    ]
+    assert results[0][2][0]['dish_name'] == '臭豆腐'
+    assert results[1][2] == [] and results[2][2] == []
+
+def test_fused_batch_rejects_duplicate_unknown_and_missing_ids():
+    entry = {'is_food_related': True, 'has_specific_food': False, 'items': []}
+    duplicate = json.dumps([dict(entry, id=101), dict(entry, id=101), dict(entry, id=205), dict(entry, id=309)])
+    unknown = json.dumps([dict(entry, id=101), dict(entry, id=205), dict(entry, id=7)])
+    missing = json.dumps([dict(entry, id=101), dict(entry, id=205)])
+
+    assert parse_fused_batch_response(duplicate, REVIEW_IDS)[0] is None
+    assert parse_fused_batch_response(unknown, REVIEW_IDS)[0] is None
+    assert parse_fused_batch_response(missing, REVIEW_IDS)[0] is None
+
+def test_extraction_batch_keeps_empty_item_lists():
+    response = json.dumps([
+        {'id': 205, 'items': []},
+        {'id': 101, 'items': [{'vendor_name': '阿嬤蚵仔煎', 'data_completeness': 'bogus'}, 'not an item']}
+    ])
+    results, _ = parse_extraction_batch_response(response, [101, 205])
+
+    assert results[1] == []
+    assert len(results[0]) == 1
+    assert results[0][0]['vendor_name'] == '阿嬤蚵仔煎'
+    assert results[0][0]['data_completeness'] == 'partial'
+
+def test_extraction_batch_rejects_duplicate_unknown_missing_and_bad_items():
+    assert parse_extraction_batch_response('[{"id": 1, "items": []}, {"id": 1, "items": []}]', [1, 2])[0] is None
+    assert parse_extraction_batch_response('[{"id": 1, "items": []}, {"id": 3, "items": []}]', [1, 2])[0] is None
+    assert parse_extraction_batch_response('[{"id": 1, "items": []}]', [1, 2])[0] is None
+    assert parse_extraction_batch_response('[{"id": 1, "items": {}}]', [1])[0] is None
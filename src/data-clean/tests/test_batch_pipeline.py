@@ -0,0 +1,98 @@
+"""BatchPipeline 批次驅動測試（以同步完成的 Future 取代 Gemini 客戶端）"""
+
+from concurrent.futures import Future
+from utils.batch_pipeline import BatchPipeline, parse_classification_result
+
+class FakeClient:
+    """記錄送出內容與快取寫入的客戶端"""
+
+    max_concurrency = 2
+
+    def __init__(self, cached=None):
+        self.cached = cached or {}
+        self.written = {}
+
+    def get_cached_results(self, prompt_version, content_hashes):
+        return [self.cached.get(digest) for digest in content_hashes]
+
+    def cache_results(self, prompt_version, content_hashes, results):
+        self.written.update((digest, result) for digest, result in zip(content_hashes, results) if result is not None)
+
+def make_pipeline(client, bad_ids=(), **kwargs):
+    """含 bad_ids 的請求整批失敗，其餘評論以內容是否含「吃」判別"""
+    sent = []
+
+    def submit(reviews):
+        sent.append([review_id for review_id, _ in reviews])
+        future = Future()
+        if any(review_id in bad_ids for review_id, _ in reviews):
+            future.set_result(None)
+        else:
+            results = ['吃' in content for _, content in reviews]
+            future.set_result(results[0] if len(reviews) == 1 else results)
+        return future
+
+    return BatchPipeline(client, submit, parse_classification_result, 'test@1.0', log=lambda message: None,
+                         **kwargs), sent
+
+def run(pipeline, batches):
+    done = []
+    pipeline.run(batches, lambda batch_num, batch, results, hashes, sources: done.append((batch_num, results)))
+    return done
+
+def test_results_are_delivered_in_batch_order():
+    pipeline, sent = make_pipeline(FakeClient())
+    batches = [[(1, '好吃'), (2, '停車難')], [(3, '吃飽')], [(4, '人多'), (5, '想吃')]]
+
+    assert run(pipeline, batches) == [(1, [True, False]), (2, [True]), (3, [False, True])]
+    assert sent == [[1, 2], [3], [4, 5]]
+
+def test_failed_batch_is_bisected_down_to_the_bad_review():
+    client = FakeClient()
+    pipeline, sent = make_pipeline(client, bad_ids={3})
+    batch = [(i, f'評論{i} 好吃') for i in range(1, 9)]
+
+    [(_, results)] = run(pipeline, [batch])
+
+    assert results == [True, True, None, True, True, True, True, True]
+    # 8 → 4 + 4 → 2 + 2 → 1 + 1，失敗的單則不再重試
+    assert sent[1:] == [[1, 2, 3, 4], [5, 6, 7, 8], [1, 2], [3, 4], [3], [4]]
+    assert pipeline.stats['batches'] == 1
+    assert pipeline.stats['calls'] == 6
+    assert pipeline.stats['single_calls'] == 2
+    assert len(client.written) == 7
+
+def test_duplicates_cache_hits_and_prefill_are_not_sent():
+    from utils.content_hash import content_hash
+    client = FakeClient(cached={content_hash('快取命中'): False})
+
+    def prefill(reviews, results):
+        for i, (_, content) in enumerate(reviews):
+            if results[i] is None and content == '本地判別':
+                results[i] = True
+
+    pipeline, sent = make_pipeline(client, prefill=prefill)
+    batch = [(1, '好吃'), (2, '好吃 '), (3, '快取命中'), (4, '本地判別')]
+
+    assert run(pipeline, [batch]) == [(1, [True, True, False, True])]
+    assert sent == [[1]]
+    assert pipeline.stats['in_batch'] == 1
+    assert pipeline.stats['sent'] == 1
+
+def test_prefilled_results_are_tagged_with_their_source():
+    from utils.content_hash import content_hash
+    client = FakeClient(cached={content_hash('快取命中'): False})
+
+    def prefill(reviews, results):
+        for i, (_, content) in enumerate(reviews):
+            if results[i] is None and content == '本地判別':
+                results[i] = True
+
+    pipeline, _ = make_pipeline(client, prefill=prefill)
+    batch = [(1, '好吃'), (2, '快取命中'), (3, '本地判別'), (4, '本地判別')]
+    done = []
+    pipeline.run([batch], lambda batch_num, batch, results, hashes, sources: done.append(sources))
+
+    assert done == [['gemini', 'gemini', 'local', 'local']]
+    # 本地判別的結果不寫入回應快取
+    assert content_hash('本地判別') not in client.written
@@ -0,0 +1,79 @@
+"""離線批次流程測試（建立、送出、輪詢與合併，對本地 fake 批次伺服器執行）"""
+
+import pytest
+from batch_job_runner import create_requests, merge_shards, submit_shards
+from utils.batch_jobs import BatchApiClient, BatchJobManifest, wait_for_batches
+from utils.fake_batch_server import FakeBatchServer
+
+REVIEWS = [
+    (1, '牛肉麵很好吃'), (2, '停車位很多'), (3, '甜點好吃'), (4, '服務人員親切'),
+    (5, '早餐店的蛋餅'), (6, '風景漂亮'), (7, '咖啡好喝'), (8, '交通方便'),
+    (9, '滷肉飯好吃'), (10, '環境乾淨'), (11, '辣味炒麵'), (12, '人很多')
+]
+FOOD_IDS = {1, 3, 5, 7, 9, 11}
+
+class StubManager:
+    """只提供批次流程使用的讀取與寫入方法，記錄寫回的標記"""
+
+    def __init__(self, reviews):
+        self.reviews = reviews
+        self.labels = {}
+        self.sources = set()
+
+    def iter_review_batches(self, stage, batch_size=100, start_after=0):
+        pending = [review for review in self.reviews if review[0] > start_after]
+        for start in range(0, len(pending), batch_size):
+            yield pending[start:start + batch_size]
+
+    def bulk_update_labels(self, column, updates, connection=None, source=None):
+        self.sources.add((column, source))
+        self.labels.update((review_id, label) for label, review_id in updates)
+        return len(updates)
+
+    def fan_out_labels(self, stage, content_hashes=None):
+        return 0
+
+def run_job(tmp_path, error_rate):
+    """以 fake 伺服器執行完整的建立 → 送出 → 輪詢 → 合併流程"""
+    manager = StubManager(REVIEWS)
+    manifest = BatchJobManifest.create(
+        'test', base_dir=str(tmp_path), stage='food_relevance', model='gemini-2.5-flash-lite',
+        prompt_version='food_relevance@test', token_budget=4000, max_items=2, requests_per_file=3, limit=None
+    )
+
+    with FakeBatchServer(delay=0, error_rate=error_rate) as server:
+        client = BatchApiClient(base_url=server.base_url, api_key='test')
+        assert create_requests(manager, manifest) == len(REVIEWS)
+        submit_shards(client, manifest)
+        wait_for_batches(client, manifest)
+
+    assert [shard['status'] for shard in manifest.shards] == ['succeeded', 'succeeded']
+    return manager, manifest, merge_shards(manager, manifest)
+
+def test_job_results_are_merged_with_gemini_source(tmp_path):
+    manager, manifest, stats = run_job(tmp_path, error_rate=0.0)
+
+    assert stats['shards'] == 2
+    assert stats['updated'] == len(REVIEWS)
+    assert stats['failed_reviews'] == 0
+    assert manager.labels == {review_id: review_id in FOOD_IDS for review_id, _ in REVIEWS}
+    assert manager.sources == {('is_project_related', 'gemini')}
+
+    # 已合併的分片不會重複寫入
+    assert merge_shards(manager, manifest)['shards'] == 0
+    assert [shard['status'] for shard in manifest.shards] == ['merged', 'merged']
+
+def test_failed_requests_leave_their_reviews_pending(tmp_path):
+    manager, manifest, stats = run_job(tmp_path, error_rate=0.5)
+
+    assert 0 < stats['failed_reviews'] < len(REVIEWS)
+    assert stats['updated'] + stats['failed_reviews'] == len(REVIEWS)
+    assert len(manager.labels) == stats['updated']
+    assert all(label == (review_id in FOOD_IDS) for review_id, label in manager.labels.items())
+    assert sum(shard['failed_requests'] for shard in manifest.shards) * 2 == stats['failed_reviews']
+
+def test_unknown_batch_returns_error():
+    with FakeBatchServer(delay=0) as server:
+        client = BatchApiClient(base_url=server.base_url, api_key='test')
+        with pytest.raises(RuntimeError, match='404'):
+            client.get_batch('batches/missing')
@@ -0,0 +1,55 @@
+"""多 Key / 多模型路由測試（以假的 GenerativeServiceAsyncClient 取代網路呼叫）"""
+
+import asyncio
+import google.ai.generativelanguage as glm
+import pytest
+from utils.gemini_client import STRUCTURED_BATCH_CONFIG
+from utils.gemini_router import KeyedGenerativeModel, RoutedGeminiClient
+
+class FakeAsyncClient:
+    """記錄請求並回傳固定內容的 GenerateContent 客戶端"""
+
+    def __init__(self, text):
+        self.text = text
+        self.requests = []
+
+    async def generate_content(self, request):
+        self.requests.append(request)
+        return glm.GenerateContentResponse(
+            candidates=[glm.Candidate(content=glm.Content(role='model', parts=[glm.Part(text=self.text)]))],
+            usage_metadata=glm.GenerateContentResponse.UsageMetadata(total_token_count=42)
+        )
+
+def make_client(tmp_path, models, **kwargs):
+    return RoutedGeminiClient(api_keys=['key-a', 'key-b'], models=models, auto_load_env=False,
+                              state_path=str(tmp_path / 'quota.json'), **kwargs)
+
+def test_keyed_model_sends_request_to_its_own_model():
+    model = KeyedGenerativeModel('gemini-test', 'key-a')
+    model._async_client = FakeAsyncClient('[{"id": 1, "answer": true}]')
+
+    response = asyncio.run(model.generate_content_async('評論', STRUCTURED_BATCH_CONFIG))
+
+    assert response.text == '[{"id": 1, "answer": true}]'
+    assert response.usage_metadata.total_token_count == 42
+    [request] = model._async_client.requests
+    assert request.model == 'models/gemini-test'
+    assert request.generation_config.response_mime_type == 'application/json'
+
+def test_single_model_routing_caches_under_that_model(tmp_path):
+    client = make_client(tmp_path, ['gemini-test'], use_cache=False)
+    try:
+        assert client.model_name == 'gemini-test'
+        assert {slot.model.api_key for slot in client.slots} == {'key-a', 'key-b'}
+    finally:
+        client.close()
+
+def test_mixed_model_routing_does_not_use_response_cache(tmp_path):
+    client = make_client(tmp_path, ['gemini-a', 'gemini-b'])
+    try:
+        assert client.cache is None
+    finally:
+        client.close()
+
+    with pytest.raises(ValueError):
+        make_client(tmp_path, ['gemini-a', 'gemini-b'], use_cache=True)
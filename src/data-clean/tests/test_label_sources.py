@@ -0,0 +1,93 @@
+"""標記來源測試（遷移腳本回填與缺少來源欄位的錯誤，以 SQLite 與假連線取代 MySQL）"""
+
+import re
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+
+import mysql.connector
+import pymysql
+import pytest
+from utils.database_manager import ReviewAnalysisManager, _label_source_required
+
+MIGRATION = Path(__file__).resolve().parent.parent / 'docs' / 'sql' / '11-add-label-source-columns.sql'
+
+class SqliteManager(ReviewAnalysisManager):
+    """以 SQLite 連線執行查詢（%s 佔位符轉為 ?）"""
+
+    def __init__(self, conn):
+        super().__init__(config={}, maintain_counters=False)
+        self.conn = conn
+
+    @contextmanager
+    def get_connection(self):
+        yield self.conn
+
+    def execute_query(self, query, params=None, fetch_all=True):
+        cursor = self.conn.execute(query.replace('%s', '?'), params or ())
+        return cursor.fetchall() if fetch_all else cursor.fetchone()
+
+def active_backfill_statements():
+    """取出遷移腳本中未註解的 UPDATE 語句"""
+    sql = re.sub(r'/\*.*?\*/', '', MIGRATION.read_text(encoding='utf-8'), flags=re.S)
+    sql = '\n'.join(line for line in sql.splitlines() if not line.lstrip().startswith('--'))
+    return [statement.strip() for statement in sql.split(';') if statement.strip().upper().startswith('UPDATE')]
+
+def test_legacy_labels_are_backfilled_for_training():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("""
+        CREATE TABLE review_analysis (
+            id INTEGER PRIMARY KEY, content TEXT,
+            is_project_related BOOLEAN, is_project_related_source TEXT,
+            has_specific_food_mention BOOLEAN, has_specific_food_mention_source TEXT
+        )
+    """)
+    conn.executemany("INSERT INTO review_analysis VALUES (?, ?, ?, ?, ?, ?)", [
+        (1, '建欄前的食物評論', True, None, True, None),
+        (2, '建欄前的非食物評論', False, None, None, None),
+        (3, '本地分類器判別', True, 'local', False, 'local'),
+        (4, '尚未判別', None, None, None, None),
+    ])
+
+    statements = active_backfill_statements()
+    assert len(statements) == 2
+    for statement in statements:
+        conn.execute(statement)
+
+    manager = SqliteManager(conn)
+    food_relevance = [row for page in manager.iter_labeled_reviews('food_relevance') for row in page]
+    specific_food = [row for page in manager.iter_labeled_reviews('specific_food') for row in page]
+
+    assert [row[0] for row in food_relevance] == [1, 2]
+    assert [row[0] for row in specific_food] == [1]
+
+@pytest.mark.parametrize('error', [
+    mysql.connector.Error(errno=1054, msg="Unknown column 'is_project_related_source' in 'field list'"),
+    pymysql.err.OperationalError(1054, "Unknown column 'has_specific_food_mention_source' in 'field list'"),
+])
+def test_missing_source_columns_point_to_migration(error):
+    with pytest.raises(RuntimeError, match='11-add-label-source-columns.sql'):
+        with _label_source_required():
+            raise error
+
+def test_other_errors_pass_through():
+    error = mysql.connector.Error(errno=1054, msg="Unknown column 'foo' in 'field list'")
+    with pytest.raises(mysql.connector.Error):
+        with _label_source_required():
+            raise error
+
+class FailingCursor:
+    def execute(self, query, params=None):
+        raise mysql.connector.Error(errno=1054, msg="Unknown column 'is_project_related_source' in 'field list'")
+
+    def close(self):
+        pass
+
+class FailingConnection:
+    def cursor(self):
+        return FailingCursor()
+
+def test_label_writers_require_source_columns():
+    manager = ReviewAnalysisManager(config={}, maintain_counters=False)
+    with pytest.raises(RuntimeError, match='11-add-label-source-columns.sql'):
+        manager._update_label_sources(FailingConnection(), 'is_project_related', [(True, 1)], 'gemini')
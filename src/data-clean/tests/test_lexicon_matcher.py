@@ -0,0 +1,30 @@
+"""Aho-Corasick 自動機測試"""
+
+from utils.lexicon_matcher import AhoCorasickAutomaton
+
+def test_finds_overlapping_terms_in_one_pass():
+    automaton = AhoCorasickAutomaton()
+    for term in ('蚵仔煎', '仔煎', '煎餃', '臭豆腐'):
+        automaton.add(term)
+
+    assert sorted(automaton.find('阿嬤蚵仔煎餃子')) == ['仔煎', '煎餃', '蚵仔煎']
+    assert automaton.find('沒有吃東西') == []
+
+def test_terms_added_after_build_are_found():
+    automaton = AhoCorasickAutomaton()
+    automaton.add('abcd')
+    automaton.build()
+    assert automaton.find('xbcdx') == []
+
+    # 新詞彙的節點位於既有詞彙的路徑上，失敗連結需要重新計算
+    assert automaton.add('bc')
+    assert automaton.add('cdx')
+    assert sorted(automaton.find('xbcdx')) == ['bc', 'cdx']
+    assert sorted(automaton.find('abcdx')) == ['abcd', 'bc', 'cdx']
+
+def test_duplicate_term_is_not_counted_twice():
+    automaton = AhoCorasickAutomaton()
+    assert automaton.add('雞排')
+    assert not automaton.add('雞排')
+    assert automaton.term_count == 1
+    assert automaton.find('雞排雞排') == ['雞排', '雞排']
@@ -0,0 +1,37 @@
+"""回應快取 LRU 淘汰測試"""
+
+import itertools
+import pytest
+from utils import response_cache
+from utils.response_cache import ResponseCache
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    # 以遞增時間取代 time.time，同一秒內的寫入與讀取也有確定的先後順序
+    clock = itertools.count(1)
+    monkeypatch.setattr(response_cache.time, 'time', lambda: next(clock))
+    cache = ResponseCache(str(tmp_path / 'cache' / 'responses.sqlite3'), max_entries=3)
+    yield cache
+    cache.close()
+
+def test_evicts_least_recently_used_entries(cache):
+    for digest in ('a', 'b', 'c'):
+        cache.put_many('model', 'v1', [(digest, True)])
+
+    # 讀取 a 後，最久未使用的是 b
+    assert cache.get_many('model', 'v1', ['a']) == [True]
+    cache.put_many('model', 'v1', [('d', False)])
+
+    assert cache.get_many('model', 'v1', ['a', 'b', 'c', 'd']) == [True, None, True, False]
+    assert cache.get_stats()['evictions'] == 1
+
+    cache.put_many('model', 'v1', [('e', True), ('f', True)])
+    assert cache.get_many('model', 'v1', ['a', 'c', 'd', 'e', 'f']) == [None, None, False, True, True]
+    assert cache.get_stats()['entries'] == 3
+
+def test_keys_include_model_and_prompt_version(cache):
+    cache.put_many('model-a', 'v1', [('x', [True, False, []]), ('skipped', None)])
+
+    assert cache.get_many('model-a', 'v1', ['x', 'skipped']) == [[True, False, []], None]
+    assert cache.get_many('model-b', 'v1', ['x']) == [None]
+    assert cache.get_many('model-a', 'v2', ['x']) == [None]
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+本地分類器訓練與評估腳本
+
+以 review_analysis 中既有的 Gemini 判別結果訓練本地分類器，並在保留資料
+（review_id % 10 == 0）上評估，選擇本地判別準確率達到目標的最低信心門檻。
+只讀取標記來源為 gemini 的評論，本地分類器、詞彙比對與相同內容擴散寫入的標記不列入。
+訓練完成後以 --local-model 執行 food_relevance_checker.py /
+specific_food_analyzer.py，只有低信心的評論會送交 Gemini。
+
+需要 scikit-learn（pip install scikit-learn）。
+
+使用方式:
+    python train_local_classifier.py train --stage food_relevance
+    python train_local_classifier.py train --stage specific_food --target-accuracy 0.99
+    python train_local_classifier.py evaluate --stage food_relevance
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from utils.database_manager import ReviewAnalysisManager
+from utils.local_classifier import (
+    LocalReviewClassifier,
+    choose_threshold,
+    evaluate_predictions,
+    get_model_path,
+    is_holdout
+)
+
+STAGES = ('food_relevance', 'specific_food')
+
+def load_labeled_reviews(db_manager, stage):
+    """
+    讀取 Gemini 判別的評論並分為訓練與保留資料
+
+    Returns:
+        tuple: (訓練資料 [(content, label), ...], 保留資料 [(content, label), ...])
+    """
+    training, holdout = [], []
+    for rows in db_manager.iter_labeled_reviews(stage):
+        for review_id, content, label in rows:
+            if not content:
+                continue
+            (holdout if is_holdout(review_id) else training).append((content, bool(label)))
+    return training, holdout
+
+def evaluate_model(classifier, holdout):
+    """
+    在保留資料上評估模型並計算每秒判別評論數
+
+    Returns:
+        dict: evaluate_predictions 的結果，另含 reviews_per_second
+    """
+    texts = [content for content, _ in holdout]
+    start = time.perf_counter()
+    probabilities = classifier.predict_proba(texts)
+    elapsed = time.perf_counter() - start
+
+    report = evaluate_predictions(probabilities, [label for _, label in holdout])
+    report['reviews_per_second'] = len(texts) / elapsed if elapsed else 0.0
+    return report
+
+def print_report(report, threshold):
+    """顯示評估報告"""
+    print(f"\n=== 保留資料評估（{report['size']} 則，其中是 {report['positive']} 則）===")
+    print(f"準確率: {report['accuracy']:.3f}，精確率: {report['precision']:.3f}，"
+          f"召回率: {report['recall']:.3f}，F1: {report['f1']:.3f}")
+    print(f"Brier 分數: {report['brier']:.4f}，判別速度: {report['reviews_per_second']:.0f} 則/秒")
+
+    print(f"\n{'門檻':>6} {'本地判別':>8} {'準確率':>8}")
+    for entry in report['thresholds']:
+        accuracy = f"{entry['accuracy']:.3f}" if entry['accuracy'] is not None else '-'
+        marker = '  ← 使用中' if entry['threshold'] == threshold else ''
+        print(f"{entry['threshold']:>6.2f} {entry['coverage'] * 100:>7.1f}% {accuracy:>8}{marker}")
+
+    print(f"\n校準（預測機率 / 實際比例）:")
+    for entry in report['calibration']:
+        low, high = entry['range']
+        print(f"  {low:.1f}–{high:.1f}: {entry['mean_probability']:.3f} / {entry['positive_rate']:.3f}"
+              f"（{entry['count']} 則）")
+
+def save_report(report, model_path):
+    """將評估報告寫入模型旁的 JSON 檔"""
+    report_path = os.path.splitext(model_path)[0] + '_report.json'
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return report_path
+
+def train(args):
+    """訓練模型、選擇信心門檻並儲存"""
+    db_manager = ReviewAnalysisManager()
+    training, holdout = load_labeled_reviews(db_manager, args.stage)
+    print(f"✓ 讀取已判別評論: 訓練 {len(training)} 則，保留 {len(holdout)} 則")
+    if not holdout:
+        print("✗ 沒有保留資料可供評估")
+        return 1
+
+    start = time.perf_counter()
+    classifier = LocalReviewClassifier(args.stage).fit([content for content, _ in training],
+                                                       [label for _, label in training])
+    print(f"✓ 訓練完成（{time.perf_counter() - start:.1f} 秒）")
+
+    report = evaluate_model(classifier, holdout)
+    threshold = choose_threshold(report, args.target_accuracy)
+    if threshold is None:
+        # 沒有門檻達到目標時使用最嚴格的門檻，只判別模型最有把握的評論
+        threshold = max(entry['threshold'] for entry in report['thresholds'])
+        print(f"✗ 沒有門檻達到目標準確率，改用最嚴格的門檻 {threshold}")
+
+    classifier.threshold = threshold
+    classifier.metadata.update({'holdout_size': report['size'], 'holdout_accuracy': report['accuracy']})
+    print_report(report, threshold)
+
+    model_path = args.model or get_model_path(args.stage)
+    classifier.save(model_path)
+    report['threshold'] = threshold
+    report['metadata'] = classifier.metadata
+    report_path = save_report(report, model_path)
+    print(f"\n✓ 模型已儲存: {model_path}（信心門檻 {threshold}）")
+    print(f"✓ 評估報告: {report_path}")
+    return 0
+
+def evaluate(args):
+    """以目前的保留資料重新評估已儲存的模型"""
+    model_path = args.model or get_model_path(args.stage)
+    classifier = LocalReviewClassifier.load(model_path, args.stage)
+    print(f"✓ 載入模型: {model_path}（訓練於 {classifier.metadata.get('trained_at')}，"
+          f"{classifier.metadata.get('train_size')} 則）")
+
+    _, holdout = load_labeled_reviews(ReviewAnalysisManager(), args.stage)
+    if not holdout:
+        print("✗ 沒有保留資料可供評估")
+        return 1
+
+    report = evaluate_model(classifier, holdout)
+    print_report(report, classifier.threshold)
+
+    suggested = choose_threshold(report, args.target_accuracy)
+    if suggested != classifier.threshold:
+        print(f"\n目前資料建議的門檻為 {suggested}，可重新執行 train 更新模型")
+    return 0
+
+def main():
+    """主要執行流程"""
+    parser = argparse.ArgumentParser(description='以既有 Gemini 標記訓練與評估本地分類器')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for name, help_text in (('train', '訓練（或重新訓練）模型'), ('evaluate', '以保留資料評估已儲存的模型')):
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.add_argument('--stage', choices=STAGES, required=True, help='處理階段')
+        subparser.add_argument('--model', default=None, help='模型檔路徑（預設為 LOCAL_MODEL_DIR/<stage>.pkl）')
+        subparser.add_argument('--target-accuracy', type=float, default=None,
+                               help='本地判別評論的目標準確率（預設依 LOCAL_MODEL_TARGET_ACCURACY）')
+
+    args = parser.parse_args()
+    return train(args) if args.command == 'train' else evaluate(args)
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n✗ 使用者中斷")
+        sys.exit(1)
+    except Exception as e:
+        print(f"✗ 執行錯誤: {e}")
+        sys.exit(1)
@@ -4,6 +4,8 @@ Utils 工具模組 - 提供共用的工具類別和函數
 此模組包含：
 - gemini_client: Gemini API 客戶端管理
 - database_manager: 資料庫操作工具
+- async_database_manager: 非同步資料庫操作工具（aiomysql 連線池）
+- batch_pipeline: LLM 批次送出、收集與二分法重試的共用驅動
 - prompt_loader: Prompt 載入和管理工具
 
 使用範例:
@@ -0,0 +1,619 @@
+"""
+非同步資料庫管理工具
+
+以 aiomysql 連線池提供 DatabaseManager / ReviewAnalysisManager 的 asyncio 版本，
+讓 LLM 管線在等待 Gemini 回應的同時預取下一批評論並寫回上一批結果。
+SQL 與同步版本共用（待處理條件、集合式批次更新、計數器鍵值）。
+
+連線池以 autocommit 模式建立：單一陳述式的查詢與更新立即生效，需要多個
+陳述式一起提交的操作使用 transaction()。aiomysql 會關閉歸還時仍在交易中的
+連線，因此 get_connection 歸還前一律回滾未結束的交易，連線才能重複使用。
+
+使用範例:
+    manager = AsyncReviewAnalysisManager()
+    try:
+        async for batch in manager.iter_review_batches('food_relevance', 15, prefetch=True):
+            results = await classify(batch)
+            await manager.batch_update_food_relevance(results)
+    finally:
+        await manager.close()
+"""
+
+import asyncio
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+import aiomysql
+from config import DATABASE_CONFIG, POOL_CONFIG, COUNTERS_ENABLED
+from utils.database_manager import (
+    BULK_UPDATE_CHUNK_SIZE,
+    LABEL_COLUMNS,
+    LABEL_SOURCE_COLUMNS,
+    LABEL_SOURCE_GEMINI,
+    PENDING_CONDITIONS,
+    _bulk_update_statement,
+    _counter_deltas,
+    _counter_upsert_statement,
+    _label_source_required,
+    _label_source_statement,
+    _latest_updates,
+    _validate_identifiers,
+    _validate_label_source
+)
+
+# 連線閒置超過此秒數後重新建立，避免使用被伺服器關閉的連線
+POOL_RECYCLE_SECONDS = 3600
+
+class AsyncDatabaseManager:
+    """非同步資料庫管理類別"""
+
+    def __init__(self, config=None, pool_size=None):
+        """
+        初始化非同步資料庫管理器
+
+        Args:
+            config (dict): 資料庫配置，預設使用 DATABASE_CONFIG
+            pool_size (int): 連線池大小，預設依 POOL_CONFIG['pool_size']
+        """
+        self.config = config if config is not None else DATABASE_CONFIG
+        self.pool_size = pool_size if pool_size is not None else POOL_CONFIG['pool_size']
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+        self.reset_connection_stats()
+
+    async def _get_pool(self):
+        """
+        取得（必要時建立）連線池
+
+        Returns:
+            aiomysql.Pool: 連線池物件
+        """
+        if self._pool is not None:
+            return self._pool
+
+        async with self._pool_lock:
+            if self._pool is None:
+                try:
+                    self._pool = await aiomysql.create_pool(
+                        host=self.config['host'],
+                        port=self.config['port'],
+                        user=self.config['user'],
+                        password=self.config['password'],
+                        db=self.config['database'],
+                        charset=self.config.get('charset', 'utf8mb4'),
+                        auth_plugin=self.config.get('auth_plugin', ''),
+                        minsize=1,
+                        maxsize=self.pool_size,
+                        pool_recycle=POOL_RECYCLE_SECONDS,
+                        autocommit=True
+                    )
+                except Exception as e:
+                    raise Exception(f"資料庫連線池建立錯誤: {e}")
+            return self._pool
+
+    async def close(self):
+        """關閉連線池並等待所有連線釋放"""
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+
+    @asynccontextmanager
+    async def get_connection(self):
+        """
+        從連線池取得連線的非同步上下文管理器
+
+        Yields:
+            aiomysql.Connection: 資料庫連接物件
+        """
+        pool = await self._get_pool()
+        start = time.perf_counter()
+        try:
+            conn = await asyncio.wait_for(pool.acquire(), POOL_CONFIG['acquire_timeout'])
+        except asyncio.TimeoutError:
+            raise Exception(f"資料庫連線池已耗盡（大小 {self.pool_size}），等待逾時")
+        self._record_acquire((time.perf_counter() - start) * 1000)
+
+        try:
+            yield conn
+        finally:
+            if conn.get_transaction_status():
+                try:
+                    await conn.rollback()
+                except Exception:
+                    pass  # 回滾失敗的連線仍在交易中，release 會直接關閉
+            pool.release(conn)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        在單一交易中執行多個陳述式的非同步上下文管理器
+
+        區塊正常結束時提交，發生例外時回滾。
+
+        Yields:
+            aiomysql.Connection: 已開始交易的資料庫連接物件
+        """
+        async with self.get_connection() as conn:
+            await conn.begin()
+            try:
+                yield conn
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+
+    def _record_acquire(self, elapsed_ms):
+        """記錄單次取得連線的耗時"""
+        stats = self.connection_stats
+        stats['acquired'] += 1
+        stats['total_acquire_ms'] += elapsed_ms
+        stats['max_acquire_ms'] = max(stats['max_acquire_ms'], elapsed_ms)
+
+    def get_connection_stats(self):
+        """
+        取得連線取得耗時統計（格式與 DatabaseManager.get_connection_stats 相同）
+
+        Returns:
+            dict: 連線統計資訊
+        """
+        stats = dict(self.connection_stats)
+        stats['avg_acquire_ms'] = (
+            stats['total_acquire_ms'] / stats['acquired'] if stats['acquired'] else 0.0
+        )
+        stats['pooled'] = True
+        stats['pool_size'] = self.pool_size
+        return stats
+
+    def reset_connection_stats(self):
+        """重置連線統計"""
+        self.connection_stats = {
+            'acquired': 0,
+            'total_acquire_ms': 0.0,
+            'max_acquire_ms': 0.0,
+            'health_check_failures': 0
+        }
+
+    async def execute_query(self, query, params=None, fetch_all=True):
+        """
+        執行查詢並返回結果
+
+        Args:
+            query (str): SQL 查詢語句
+            params (tuple): 查詢參數
+            fetch_all (bool): 是否取得所有結果
+
+        Returns:
+            list or tuple: 查詢結果
+        """
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(query, params)
+                if fetch_all:
+                    return list(await cursor.fetchall())
+                return await cursor.fetchone()
+
+    async def execute_update(self, query, params=None, connection=None):
+        """
+        執行更新操作
+
+        Args:
+            query (str): SQL 更新語句
+            params (tuple): 更新參數
+            connection: 現有的資料庫連接（由呼叫端控制交易），如為 None 則以 autocommit 立即提交
+
+        Returns:
+            int: 受影響的行數
+        """
+        if connection is not None:
+            async with connection.cursor() as cursor:
+                await cursor.execute(query, params)
+                return cursor.rowcount
+
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(query, params)
+                return cursor.rowcount
+
+    async def execute_batch_update(self, query, params_list, connection=None):
+        """
+        執行批次更新操作
+
+        Args:
+            query (str): SQL 更新語句
+            params_list (list): 參數列表
+            connection: 現有的資料庫連接（由呼叫端控制交易），如為 None 則在單一交易中提交
+
+        Returns:
+            int: 受影響的總行數
+        """
+        if connection is not None:
+            async with connection.cursor() as cursor:
+                await cursor.executemany(query, params_list)
+                return cursor.rowcount
+
+        async with self.transaction() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.executemany(query, params_list)
+                return cursor.rowcount
+
+    async def bulk_update_column(self, table, column, updates,
+                                 chunk_size=BULK_UPDATE_CHUNK_SIZE, connection=None):
+        """
+        以多列 VALUES 衍生表 JOIN 執行集合式批次更新（同 DatabaseManager.bulk_update_column）
+
+        Args:
+            table (str): 目標資料表名稱
+            column (str): 要更新的欄位名稱
+            updates (list): 更新列表 [(value, id), ...]
+            chunk_size (int): 每個 UPDATE 陳述式包含的列數
+            connection: 現有的資料庫連接（由呼叫端控制交易），如為 None 則自動建立並提交
+
+        Returns:
+            int: 受影響的行數
+        """
+        _validate_identifiers(table, column)
+
+        if not updates:
+            return 0
+
+        rows = _latest_updates(updates)
+
+        if connection is not None:
+            return await self._bulk_update_with_connection(connection, table, column, rows, chunk_size)
+
+        async with self.transaction() as conn:
+            return await self._bulk_update_with_connection(conn, table, column, rows, chunk_size)
+
+    async def _bulk_update_with_connection(self, conn, table, column, rows, chunk_size):
+        """在指定連線上分段執行 UPDATE ... JOIN (VALUES ...)"""
+        affected = 0
+        async with conn.cursor() as cursor:
+            for start in range(0, len(rows), chunk_size):
+                query, params = _bulk_update_statement(table, column, rows[start:start + chunk_size])
+                await cursor.execute(query, params)
+                affected += cursor.rowcount
+        return affected
+
+class AsyncReviewAnalysisManager(AsyncDatabaseManager):
+    """評論分析表專用的非同步資料庫管理器"""
+
+    def __init__(self, config=None, maintain_counters=None, **kwargs):
+        """
+        初始化非同步評論分析管理器
+
+        Args:
+            config (dict): 資料庫配置，預設使用 DATABASE_CONFIG
+            maintain_counters (bool): 標記更新時是否同步維護 review_analysis_counters，
+                預設依 COUNTERS_ENABLED
+            **kwargs: 傳遞給 AsyncDatabaseManager 的連線池參數
+        """
+        super().__init__(config, **kwargs)
+        self.maintain_counters = COUNTERS_ENABLED if maintain_counters is None else maintain_counters
+
+    async def fetch_review_page(self, stage, after_id=0, limit=100):
+        """
+        以 keyset 分頁取得某處理階段的一頁待處理評論
+
+        Args:
+            stage (str): 處理階段 ('food_relevance', 'specific_food', 'extraction')
+            after_id (int): 只取 id 大於此值的評論
+            limit (int): 每頁數量
+
+        Returns:
+            list: 評論列表 [(id, content), ...]，依 id 遞增排序
+        """
+        if stage not in PENDING_CONDITIONS:
+            raise ValueError(f"不支援的處理階段: {stage}")
+
+        query = f"""
+            SELECT id, content
+            FROM review_analysis
+            WHERE {PENDING_CONDITIONS[stage]}
+                AND id > %s
+            ORDER BY id
+            LIMIT %s
+        """
+        return await self.execute_query(query, (after_id, limit))
+
+    async def iter_review_batches(self, stage, batch_size=100, start_after=0, prefetch=False):
+        """
+        逐批產生待處理評論
+
+        prefetch=True 時，在呼叫端處理目前批次的同時於背景查詢下一批，
+        資料庫延遲與 LLM 請求重疊而不再逐批累加。
+
+        Args:
+            stage (str): 處理階段 ('food_relevance', 'specific_food', 'extraction')
+            batch_size (int): 每批數量
+            start_after (int): 起始 id（不含）
+            prefetch (bool): 是否預取下一批
+
+        Yields:
+            list: 評論批次 [(id, content), ...]
+        """
+        batch = await self.fetch_review_page(stage, start_after, batch_size)
+        while batch:
+            next_page = None
+            if len(batch) == batch_size and prefetch:
+                next_page = asyncio.create_task(
+                    self.fetch_review_page(stage, batch[-1][0], batch_size)
+                )
+
+            try:
+                yield batch
+            except BaseException:
+                if next_page is not None:
+                    next_page.cancel()
+                raise
+
+            if len(batch) < batch_size:
+                return
+
+            if next_page is not None:
+                batch = await next_page
+            else:
+                batch = await self.fetch_review_page(stage, batch[-1][0], batch_size)
+
+    async def count_pending_reviews(self, stage):
+        """
+        計算某處理階段的待處理評論數
+
+        Args:
+            stage (str): 處理階段 ('food_relevance', 'specific_food', 'extraction')
+
+        Returns:
+            int: 待處理評論數
+        """
+        if stage not in PENDING_CONDITIONS:
+            raise ValueError(f"不支援的處理階段: {stage}")
+
+        query = f"SELECT COUNT(*) FROM review_analysis WHERE {PENDING_CONDITIONS[stage]}"
+        return (await self.execute_query(query, fetch_all=False))[0]
+
+    async def claim_review_batch(self, stage, worker_id, batch_size=15, lease_seconds=600, after_id=0):
+        """
+        以 SELECT ... FOR UPDATE SKIP LOCKED 認領一批待處理評論並寫入租約
+
+        Args:
+            stage (str): 處理階段 ('food_relevance', 'specific_food', 'extraction')
+            worker_id (str): 認領者識別碼
+            batch_size (int): 每批數量
+            lease_seconds (int): 租約有效秒數
+            after_id (int): 只認領 id 大於此值的評論
+
+        Returns:
+            list: 已認領的評論列表 [(id, content), ...]
+        """
+        if stage not in PENDING_CONDITIONS:
+            raise ValueError(f"不支援的處理階段: {stage}")
+
+        select_query = f"""
+            SELECT id, content
+            FROM review_analysis
+            WHERE {PENDING_CONDITIONS[stage]}
+                AND id > %s
+                AND (lease_expires_at IS NULL OR lease_expires_at < NOW())
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """
+
+        async with self.transaction() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(select_query, (after_id, batch_size))
+                batch = list(await cursor.fetchall())
+
+                if batch:
+                    placeholders = ", ".join(["%s"] * len(batch))
+                    await cursor.execute(f"""
+                        UPDATE review_analysis
+                        SET lease_owner = %s,
+                            lease_expires_at = NOW() + INTERVAL %s SECOND
+                        WHERE id IN ({placeholders})
+                    """, [worker_id, lease_seconds] + [review_id for review_id, _ in batch])
+
+                return batch
+
+    async def release_leases(self, worker_id, review_ids):
+        """
+        釋放指定評論的租約（只釋放自己持有的租約）
+
+        Args:
+            worker_id (str): 認領者識別碼
+            review_ids (list): 評論 ID 列表
+
+        Returns:
+            int: 受影響的行數
+        """
+        if not review_ids:
+            return 0
+
+        placeholders = ", ".join(["%s"] * len(review_ids))
+        query = f"""
+            UPDATE review_analysis
+            SET lease_owner = NULL, lease_expires_at = NULL
+            WHERE lease_owner = %s AND id IN ({placeholders})
+        """
+        return await self.execute_update(query, [worker_id] + list(review_ids))
+
+    async def batch_update_food_relevance(self, updates, source=None):
+        """
+        批次更新食物相關性
+
+        Args:
+            updates (list): 更新列表 [(is_food_related, review_id), ...]
+            source (str): 標記來源，須為 LABEL_SOURCES 之一
+
+        Returns:
+            int: 受影響的行數
+        """
+        return await self.bulk_update_labels('is_project_related', updates, source=source)
+
+    async def batch_update_specific_food_mention(self, updates, source=None):
+        """
+        批次更新具體食物提及狀況
+
+        Args:
+            updates (list): 更新列表 [(has_specific_mention, review_id), ...]
+            source (str): 標記來源，須為 LABEL_SOURCES 之一
+
+        Returns:
+            int: 受影響的行數
+        """
+        return await self.bulk_update_labels('has_specific_food_mention', updates, source=source)
+
+    async def batch_mark_food_items_extracted(self, review_ids, connection=None):
+        """
+        批次標記評論已完成結構化提取
+
+        Args:
+            review_ids (list): 評論 ID 列表
+            connection: 現有的資料庫連接（與項目寫入共用交易時傳入）
+
+        Returns:
+            int: 受影響的行數
+        """
+        updates = [(True, review_id) for review_id in review_ids]
+        return await self.bulk_update_labels('is_food_items_extracted', updates, connection=connection)
+
+    async def insert_extracted_food_items(self, rows, connection=None):
+        """
+        批次寫入提取的食物項目（同 ReviewAnalysisManager.insert_extracted_food_items）
+
+        Args:
+            rows (list): [(review_id, item), ...]，item 為提取結果字典
+            connection: 現有的資料庫連接（與標記更新共用交易時傳入）
+
+        Returns:
+            int: 寫入的項目數
+        """
+        params_list = [
+            (
+                review_id,
+                item.get('dish_name'),
+                item.get('vendor_name'),
+                item.get('description'),
+                item.get('price'),
+                item.get('rating_sentiment'),
+                item.get('data_completeness') or 'partial'
+            )
+            for review_id, item in rows
+        ]
+        if not params_list:
+            return 0
+
+        query = """
+            INSERT INTO extracted_food_items
+            (review_id, dish_name, vendor_name, description, price, rating_sentiment, data_completeness)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """
+        await self.execute_batch_update(query, params_list, connection=connection)
+        return len(params_list)
+
+    async def save_fused_results(self, results):
+        """
+        在單一交易中寫入融合判別的三個階段結果（同 ReviewAnalysisManager.save_fused_results）
+
+        Args:
+            results (list): [(review_id, is_food_related, has_specific_food, items), ...]
+
+        Returns:
+            dict: {'reviews': 寫入的評論數, 'food_related': 食物相關評論數,
+                'specific_food': 具體提及食物的評論數, 'items': 寫入的項目數}
+        """
+        relevance = [(is_food, review_id) for review_id, is_food, _, _ in results]
+        specific = [(has_specific, review_id) for review_id, is_food, has_specific, _ in results if is_food]
+        extracted = [review_id for review_id, is_food, has_specific, _ in results if is_food and has_specific]
+        item_rows = [(review_id, item) for review_id, is_food, has_specific, items in results
+                     if is_food and has_specific for item in items]
+
+        async with self.transaction() as conn:
+            if relevance:
+                await self.bulk_update_labels('is_project_related', relevance, connection=conn,
+                                              source=LABEL_SOURCE_GEMINI)
+            if specific:
+                await self.bulk_update_labels('has_specific_food_mention', specific, connection=conn,
+                                              source=LABEL_SOURCE_GEMINI)
+            items_written = await self.insert_extracted_food_items(item_rows, connection=conn)
+            if extracted:
+                await self.batch_mark_food_items_extracted(extracted, connection=conn)
+
+        return {
+            'reviews': len(relevance),
+            'food_related': len(specific),
+            'specific_food': len(extracted),
+            'items': items_written
+        }
+
+    async def bulk_update_labels(self, column, updates, connection=None, source=None):
+        """
+        以集合式批次更新寫入 review_analysis 的標記欄位，並在同一交易中寫入標記來源
+
+        Args:
+            column (str): 標記欄位，須為 LABEL_COLUMNS 之一
+            updates (list): 更新列表 [(label, review_id), ...]
+            connection: 現有的資料庫連接，如為 None 則自動建立並提交
+            source (str): 標記來源，須為 LABEL_SOURCES 之一；None 表示來源未知
+
+        Returns:
+            int: 受影響的行數
+        """
+        if column not in LABEL_COLUMNS:
+            raise ValueError(f"不支援的標記欄位: {column}")
+        _validate_label_source(source)
+
+        if not updates:
+            return 0
+
+        if connection is None:
+            async with self.transaction() as conn:
+                return await self.bulk_update_labels(column, updates, connection=conn, source=source)
+
+        if self.maintain_counters:
+            affected = await self._update_labels_with_counters(connection, column, updates)
+        else:
+            affected = await self.bulk_update_column('review_analysis', column, updates, connection=connection)
+        await self._update_label_sources(connection, column, updates, source)
+        return affected
+
+    async def _update_label_sources(self, conn, column, updates, source):
+        """在同一交易中寫入標記來源（沒有來源欄位的標記略過）"""
+        if column not in LABEL_SOURCE_COLUMNS:
+            return
+
+        review_ids = list(dict.fromkeys(review_id for _, review_id in updates))
+        with _label_source_required():
+            async with conn.cursor() as cursor:
+                for start in range(0, len(review_ids), BULK_UPDATE_CHUNK_SIZE):
+                    await cursor.execute(*_label_source_statement(
+                        column, source, review_ids[start:start + BULK_UPDATE_CHUNK_SIZE]
+                    ))
+
+    async def _update_labels_with_counters(self, conn, column, updates):
+        """在同一交易中更新標記並依舊值與新值調整計數器"""
+        latest = dict(_latest_updates(updates))
+        if not latest:
+            return 0
+
+        deltas = Counter()
+        review_ids = list(latest)
+        async with conn.cursor() as cursor:
+            for start in range(0, len(review_ids), BULK_UPDATE_CHUNK_SIZE):
+                chunk = review_ids[start:start + BULK_UPDATE_CHUNK_SIZE]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                await cursor.execute(
+                    f"SELECT id, {column} FROM review_analysis WHERE id IN ({placeholders}) FOR UPDATE",
+                    chunk
+                )
+                deltas.update(_counter_deltas(column, await cursor.fetchall(), latest))
+
+            affected = await self._bulk_update_with_connection(
+                conn, 'review_analysis', column, list(latest.items()), BULK_UPDATE_CHUNK_SIZE
+            )
+
+            statement = _counter_upsert_statement(deltas)
+            if statement is not None:
+                await cursor.execute(*statement)
+
+        return affected
@@ -0,0 +1,338 @@
+"""
+非同步 Gemini API 客戶端
+
+RateLimitedGeminiClient 以固定間隔逐一送出請求並等待回應，回應時間超過
+間隔時實際吞吐量遠低於配額。AsyncGeminiClient 在背景事件迴圈中同時保留多個
+進行中的請求，並以每分鐘請求數 (RPM) 與每分鐘 token 數 (TPM) 的滑動視窗限制送出速度。
+
+同步腳本可直接使用與 GeminiClient 相同的阻塞方法，或以 submit_batch / submit_single
+取得 Future，一次送出多個批次後再依序取得結果。
+
+使用範例:
+    client = create_async_gemini_client()
+    futures = [client.submit_batch(prompt, len(batch)) for prompt, batch in requests]
+    results = [future.result() for future in futures]
+    client.close()
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from google.api_core import exceptions as google_exceptions
+from config import GEMINI_RATE_LIMITS
+from utils.gemini_client import (
+    STRUCTURED_BATCH_CONFIG,
+    GeminiClient,
+    parse_batch_result,
+    parse_single_result,
+    parse_structured_batch_result
+)
+from utils.token_estimator import estimate_tokens
+
+# 配額錯誤 (429) 的重試次數與初始退避秒數
+MAX_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 5
+
+# 回應 token 的估算值（實際用量在回應後校正）
+OUTPUT_TOKENS_PER_ITEM = 4
+STRUCTURED_OUTPUT_TOKENS_PER_ITEM = 12  # {"id": 123456, "answer": true},
+
+class AsyncRateLimiter:
+    """每分鐘請求數與 token 數的滑動視窗限制器（只在單一事件迴圈中使用）"""
+
+    def __init__(self, requests_per_minute, tokens_per_minute=None, window_seconds=60.0):
+        """
+        初始化限制器
+
+        Args:
+            requests_per_minute (int): 每分鐘最大請求數
+            tokens_per_minute (int): 每分鐘最大 token 數，None 表示不限制
+            window_seconds (float): 滑動視窗長度
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window_seconds = window_seconds
+        self._events = deque()  # [送出時間, token 數]
+        self._lock = None
+        self.stats = {'requests': 0, 'tokens': 0, 'throttled': 0, 'wait_seconds': 0.0}
+
+    def _prune(self, now):
+        """移除視窗外的紀錄"""
+        while self._events and self._events[0][0] <= now - self.window_seconds:
+            self._events.popleft()
+
+    def _wait_time(self, now, tokens):
+        """計算送出 tokens 前需等待的秒數，0 表示可立即送出"""
+        wait = 0.0
+        if len(self._events) >= self.requests_per_minute:
+            oldest = self._events[len(self._events) - self.requests_per_minute][0]
+            wait = max(wait, oldest + self.window_seconds - now)
+
+        if self.tokens_per_minute is not None and self._events:
+            used = sum(event[1] for event in self._events)
+            # 單一請求超過整個配額時，只要視窗清空就放行，避免永久等待
+            excess = used + min(tokens, self.tokens_per_minute) - self.tokens_per_minute
+            if excess > 0:
+                freed = 0
+                for timestamp, event_tokens in self._events:
+                    freed += event_tokens
+                    if freed >= excess:
+                        wait = max(wait, timestamp + self.window_seconds - now)
+                        break
+
+        return wait
+
+    def wait_time(self, tokens):
+        """目前送出 tokens 需等待的秒數（不佔用配額）"""
+        now = time.monotonic()
+        self._prune(now)
+        return self._wait_time(now, tokens)
+
+    def get_headroom(self):
+        """
+        計算視窗內剩餘的配額比例
+
+        Returns:
+            float: 剩餘請求數與剩餘 token 數比例中較小者（0–1）
+        """
+        self._prune(time.monotonic())
+        headroom = 1 - len(self._events) / self.requests_per_minute
+        if self.tokens_per_minute is not None:
+            used = sum(event[1] for event in self._events)
+            headroom = min(headroom, 1 - used / self.tokens_per_minute)
+        return max(headroom, 0.0)
+
+    def get_recent_usage(self):
+        """
+        取得視窗內的請求紀錄（供跨程序保存）
+
+        Returns:
+            list: [[距今秒數, token 數], ...]
+        """
+        now = time.monotonic()
+        self._prune(now)
+        return [[now - timestamp, tokens] for timestamp, tokens in self._events]
+
+    def preload(self, recent_usage):
+        """
+        載入先前程序保存的視窗內請求紀錄，重新啟動後不會立即超出配額
+
+        Args:
+            recent_usage (list): get_recent_usage 格式的紀錄
+        """
+        now = time.monotonic()
+        for age, tokens in sorted(recent_usage, reverse=True):
+            if age < self.window_seconds:
+                self._events.append([now - age, tokens])
+
+    async def acquire(self, tokens):
+        """
+        等待直到可送出一個使用 tokens 的請求
+
+        Args:
+            tokens (int): 估算的 token 數
+
+        Returns:
+            list: 本次請求的紀錄，可傳給 record_usage 以實際用量校正
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        # 以鎖保持先到先送，避免大請求被小請求持續插隊
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._prune(now)
+                wait = self._wait_time(now, tokens)
+                if wait <= 0:
+                    break
+                self.stats['throttled'] += 1
+                self.stats['wait_seconds'] += wait
+                await asyncio.sleep(wait)
+
+            entry = [now, tokens]
+            self._events.append(entry)
+            self.stats['requests'] += 1
+            self.stats['tokens'] += tokens
+            return entry
+
+    def record_usage(self, entry, actual_tokens):
+        """
+        以 API 回報的實際 token 數校正請求紀錄
+
+        Args:
+            entry (list): acquire 返回的紀錄
+            actual_tokens (int): 實際 token 數
+        """
+        self.stats['tokens'] += actual_tokens - entry[1]
+        entry[1] = actual_tokens
+
+class AsyncGeminiClient(GeminiClient):
+    """可同時保留多個請求的 Gemini 客戶端"""
+
+    def __init__(self, model_name='gemini-2.5-flash-lite', requests_per_minute=None,
+                 tokens_per_minute=None, max_concurrency=None, auto_load_env=True, use_cache=None):
+        """
+        初始化非同步客戶端
+
+        Args:
+            model_name (str): 使用的 Gemini 模型名稱
+            requests_per_minute (int): 每分鐘最大請求數，預設依 GEMINI_RATE_LIMITS
+            tokens_per_minute (int): 每分鐘最大 token 數，預設依 GEMINI_RATE_LIMITS
+            max_concurrency (int): 同時進行中的最大請求數，預設依 GEMINI_RATE_LIMITS
+            auto_load_env (bool): 是否自動載入環境變數
+            use_cache (bool): 是否使用持久化回應快取
+        """
+        super().__init__(model_name, auto_load_env, use_cache)
+        self.requests_per_minute = requests_per_minute or GEMINI_RATE_LIMITS['requests_per_minute']
+        self.tokens_per_minute = tokens_per_minute or GEMINI_RATE_LIMITS['tokens_per_minute']
+        self.max_concurrency = max_concurrency or GEMINI_RATE_LIMITS['max_concurrency']
+
+        self.limiter = AsyncRateLimiter(self.requests_per_minute, self.tokens_per_minute)
+        self._semaphore = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='gemini-async-loop', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """停止背景事件迴圈"""
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    def submit(self, coroutine):
+        """
+        在背景事件迴圈中執行協程
+
+        Returns:
+            concurrent.futures.Future: 協程結果
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    async def generate_content_async(self, prompt, expected_output_tokens=OUTPUT_TOKENS_PER_ITEM,
+                                     generation_config=None):
+        """
+        受 RPM/TPM 與並行數限制的非同步內容生成
+
+        Args:
+            prompt (str): 輸入的 prompt
+            expected_output_tokens (int): 預估的回應 token 數
+            generation_config (dict): 生成設定，例如 STRUCTURED_BATCH_CONFIG
+
+        Returns:
+            str: API 回應的文字內容
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        estimated = estimate_tokens(prompt) + expected_output_tokens
+        for attempt in range(MAX_RETRIES + 1):
+            entry = await self.limiter.acquire(estimated)
+            response = None
+            async with self._semaphore:
+                try:
+                    response = await self.model.generate_content_async(prompt, generation_config=generation_config)
+                except google_exceptions.ResourceExhausted as e:
+                    if attempt == MAX_RETRIES:
+                        raise Exception(f"Gemini API 配額不足: {e}")
+                except Exception as e:
+                    raise Exception(f"Gemini API 呼叫錯誤: {e}")
+
+            if response is None:
+                # 伺服器端配額計算與本地視窗不同步時，釋放並行名額後退避重試
+                await asyncio.sleep(RETRY_BACKOFF_SECONDS * (2 ** attempt))
+                continue
+
+            usage = getattr(response, 'usage_metadata', None)
+            if usage is not None and getattr(usage, 'total_token_count', 0):
+                self.limiter.record_usage(entry, usage.total_token_count)
+            return response.text.strip()
+
+    async def analyze_single_async(self, prompt):
+        """非同步分析單則內容，返回 True/False 或 None"""
+        try:
+            result = await self.generate_content_async(prompt)
+            return parse_single_result(result)
+        except Exception as e:
+            print(f"單則分析錯誤: {e}")
+            return None
+
+    async def analyze_batch_async(self, prompt, expected_count):
+        """非同步批次分析內容，返回布林值列表或 None"""
+        try:
+            result = await self.generate_content_async(prompt, expected_count * OUTPUT_TOKENS_PER_ITEM)
+            return parse_batch_result(result, expected_count)
+        except Exception as e:
+            print(f"批次分析錯誤: {e}")
+            return None
+
+    async def analyze_structured_batch_async(self, prompt, review_ids):
+        """非同步結構化批次分析，返回與 review_ids 對應的布林值列表或 None"""
+        try:
+            result = await self.generate_content_async(
+                prompt, len(review_ids) * STRUCTURED_OUTPUT_TOKENS_PER_ITEM, STRUCTURED_BATCH_CONFIG
+            )
+            return parse_structured_batch_result(result, review_ids)
+        except Exception as e:
+            print(f"結構化批次分析錯誤: {e}")
+            return None
+
+    def submit_single(self, prompt):
+        """送出單則分析，返回 Future"""
+        return self.submit(self.analyze_single_async(prompt))
+
+    def submit_batch(self, prompt, expected_count):
+        """送出批次分析，返回 Future"""
+        return self.submit(self.analyze_batch_async(prompt, expected_count))
+
+    def submit_structured_batch(self, prompt, review_ids):
+        """送出結構化批次分析，返回 Future"""
+        return self.submit(self.analyze_structured_batch_async(prompt, review_ids))
+
+    def submit_content(self, prompt, expected_output_tokens=OUTPUT_TOKENS_PER_ITEM, generation_config=None):
+        """送出內容生成，返回 Future（失敗時 Future 會帶有例外）"""
+        return self.submit(self.generate_content_async(prompt, expected_output_tokens, generation_config))
+
+    def generate_content(self, prompt, generation_config=None):
+        """阻塞式內容生成（與其他進行中的請求共用限制器）"""
+        return self.submit(self.generate_content_async(prompt, generation_config=generation_config)).result()
+
+    def get_rate_stats(self):
+        """
+        取得限制器統計
+
+        Returns:
+            dict: 請求數、token 數、被限速次數與等待秒數，以及設定值
+        """
+        stats = dict(self.limiter.stats)
+        stats.update({
+            'requests_per_minute': self.requests_per_minute,
+            'tokens_per_minute': self.tokens_per_minute,
+            'max_concurrency': self.max_concurrency
+        })
+        return stats
+
+    def get_model_info(self):
+        """取得模型資訊"""
+        info = super().get_model_info()
+        info.update(self.get_rate_stats())
+        return info
+
+def create_async_gemini_client(**kwargs):
+    """
+    建立非同步 Gemini 客戶端
+
+    GEMINI_API_KEYS 或 GEMINI_MODELS 設定多個值時，改用依配額分散請求的
+    RoutedGeminiClient（只接受 model_name、max_concurrency 等共用參數）。
+
+    Args:
+        **kwargs: 傳遞給 AsyncGeminiClient 的參數
+
+    Returns:
+        AsyncGeminiClient: 非同步客戶端實例
+    """
+    from utils.gemini_router import RoutedGeminiClient, is_routing_configured
+    if is_routing_configured():
+        return RoutedGeminiClient(**kwargs)
+    return AsyncGeminiClient(**kwargs)
@@ -0,0 +1,361 @@
+"""
+Gemini 批次作業工具
+
+離線批次模式將批次 prompt 寫成 JSONL 請求檔，上傳後建立 Gemini Batch API
+作業，輪詢到完成後下載結果檔再合併回資料庫。作業狀態記錄在 manifest.json，
+每個步驟完成後立即寫回，程序中斷後重新執行會從未完成的步驟繼續。
+
+BatchApiClient 只使用標準函式庫的 urllib；base_url 指向 utils.fake_batch_server
+時可以完全離線測試整個流程。
+"""
+
+import json
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+from config import BATCH_JOBS
+
+GEMINI_API_URL = 'https://generativelanguage.googleapis.com'
+
+# 分片狀態：written → submitted → succeeded → merged，作業失敗時為 failed（可重新送出）
+SHARD_STATUSES = ('written', 'submitted', 'succeeded', 'failed', 'merged')
+
+# Batch API 作業狀態的結尾字，例如 BATCH_STATE_SUCCEEDED
+_FAILED_STATES = ('FAILED', 'CANCELLED', 'EXPIRED')
+
+def to_rest_schema(schema):
+    """
+    將 response_schema 轉為 REST API 格式（type 為大寫列舉值）
+
+    Args:
+        schema (dict): SDK 格式的 schema，例如 BATCH_RESPONSE_SCHEMA
+
+    Returns:
+        dict: REST 格式的 schema
+    """
+    if isinstance(schema, dict):
+        return {key: value.upper() if key == 'type' and isinstance(value, str) else to_rest_schema(value)
+                for key, value in schema.items()}
+    if isinstance(schema, list):
+        return [to_rest_schema(value) for value in schema]
+    return schema
+
+def build_request_line(key, prompt, generation_config=None):
+    """
+    建立 JSONL 請求檔中的一行
+
+    Args:
+        key (str): 請求鍵值，結果檔以相同鍵值對應
+        prompt (str): prompt 內容
+        generation_config (dict): 生成設定（SDK 格式）
+
+    Returns:
+        dict: {"key": ..., "request": GenerateContentRequest}
+    """
+    request = {'contents': [{'role': 'user', 'parts': [{'text': prompt}]}]}
+    if generation_config:
+        request['generation_config'] = to_rest_schema(generation_config)
+    return {'key': key, 'request': request}
+
+def parse_result_line(line):
+    """
+    解析結果檔中的一行
+
+    Returns:
+        tuple: (key, 回應文字或 None, 錯誤訊息或 None)
+    """
+    try:
+        entry = json.loads(line)
+    except ValueError as e:
+        return None, None, f"結果行 JSON 解析錯誤: {e}"
+
+    key = entry.get('key')
+    if 'error' in entry:
+        return key, None, f"請求失敗: {entry['error']}"
+
+    try:
+        parts = entry['response']['candidates'][0]['content']['parts']
+        return key, ''.join(part.get('text', '') for part in parts), None
+    except (KeyError, IndexError, TypeError):
+        return key, None, "回應缺少 candidates 內容"
+
+class BatchJobManifest:
+    """批次作業狀態檔（batch_jobs/<作業名稱>/manifest.json）"""
+
+    def __init__(self, job_dir, data):
+        """
+        初始化狀態檔
+
+        Args:
+            job_dir (str): 作業目錄
+            data (dict): 狀態內容
+        """
+        self.job_dir = job_dir
+        self.path = os.path.join(job_dir, 'manifest.json')
+        self.data = data
+
+    @staticmethod
+    def job_dir_for(job_name, base_dir=None):
+        """取得作業目錄"""
+        return os.path.join(base_dir or BATCH_JOBS['dir'], job_name)
+
+    @classmethod
+    def exists(cls, job_name, base_dir=None):
+        """作業是否已建立"""
+        return os.path.exists(os.path.join(cls.job_dir_for(job_name, base_dir), 'manifest.json'))
+
+    @classmethod
+    def create(cls, job_name, base_dir=None, **settings):
+        """
+        建立新作業
+
+        Args:
+            job_name (str): 作業名稱
+            base_dir (str): 作業根目錄，預設依 BATCH_JOBS
+            **settings: 作業設定（處理階段、模型、prompt 版本等）
+
+        Returns:
+            BatchJobManifest: 狀態檔
+        """
+        job_dir = cls.job_dir_for(job_name, base_dir)
+        os.makedirs(job_dir, exist_ok=True)
+        manifest = cls(job_dir, {
+            'job_name': job_name,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'settings': settings,
+            'last_review_id': 0,
+            'creation_complete': False,
+            'shards': []
+        })
+        manifest.save()
+        return manifest
+
+    @classmethod
+    def load(cls, job_name, base_dir=None):
+        """載入既有作業"""
+        job_dir = cls.job_dir_for(job_name, base_dir)
+        with open(os.path.join(job_dir, 'manifest.json'), encoding='utf-8') as f:
+            return cls(job_dir, json.load(f))
+
+    def save(self):
+        """寫回狀態檔（先寫暫存檔再取代，中斷時不會留下不完整的檔案）"""
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    @property
+    def settings(self):
+        """作業設定"""
+        return self.data['settings']
+
+    @property
+    def shards(self):
+        """分片列表"""
+        return self.data['shards']
+
+    def shard_path(self, shard, kind):
+        """
+        取得分片檔案路徑
+
+        Args:
+            shard (dict): 分片
+            kind (str): 'requests'（請求檔）、'keys'（鍵值對應的評論 id）或 'results'（結果檔）
+        """
+        return os.path.join(self.job_dir, f"{kind}-{shard['index']:04d}.jsonl")
+
+    def add_shard(self, request_count, review_count, last_review_id):
+        """記錄已寫入的分片並更新續傳位置"""
+        shard = {
+            'index': len(self.shards) + 1,
+            'status': 'written',
+            'requests': request_count,
+            'reviews': review_count,
+            'attempts': 0
+        }
+        self.shards.append(shard)
+        self.data['last_review_id'] = last_review_id
+        self.save()
+        return shard
+
+    def next_shard_index(self):
+        """下一個分片的編號"""
+        return len(self.shards) + 1
+
+    def shards_with_status(self, *statuses):
+        """取得指定狀態的分片"""
+        return [shard for shard in self.shards if shard['status'] in statuses]
+
+    def update_shard(self, shard, **fields):
+        """更新分片欄位並寫回"""
+        shard.update(fields)
+        shard['updated_at'] = datetime.now().isoformat(timespec='seconds')
+        self.save()
+
+    def get_summary(self):
+        """
+        取得各狀態的分片數與評論數
+
+        Returns:
+            dict: {status: {'shards': n, 'reviews': n}}
+        """
+        summary = {status: {'shards': 0, 'reviews': 0} for status in SHARD_STATUSES}
+        for shard in self.shards:
+            summary[shard['status']]['shards'] += 1
+            summary[shard['status']]['reviews'] += shard['reviews']
+        return summary
+
+class BatchApiClient:
+    """Gemini Batch API 的 REST 客戶端（上傳檔案、建立作業、查詢狀態、下載結果）"""
+
+    def __init__(self, base_url=None, api_key=None, timeout=120):
+        """
+        初始化客戶端
+
+        Args:
+            base_url (str): API 位址，預設依 GEMINI_BATCH_BASE_URL（未設定時為 Gemini API）
+            api_key (str): API Key，預設依 GEMINI_API_KEY
+            timeout (int): 每次請求的逾時秒數
+        """
+        self.base_url = (base_url or BATCH_JOBS['base_url'] or GEMINI_API_URL).rstrip('/')
+        self.api_key = api_key or os.getenv('GEMINI_API_KEY')
+        self.timeout = timeout
+        if not self.api_key and self.base_url == GEMINI_API_URL:
+            raise ValueError("請在 .env 檔案中設定 GEMINI_API_KEY")
+
+    def _url(self, path, **query):
+        """組合請求 URL（附上 API Key）"""
+        if self.api_key:
+            query['key'] = self.api_key
+        url = path if path.startswith('http') else f"{self.base_url}/{path.lstrip('/')}"
+        if query:
+            url += ('&' if '?' in url else '?') + urllib.parse.urlencode(query)
+        return url
+
+    def _request(self, method, url, body=None, headers=None):
+        """
+        送出 HTTP 請求
+
+        Returns:
+            tuple: (回應標頭, 回應內容 bytes)
+        """
+        if isinstance(body, dict):
+            body = json.dumps(body).encode('utf-8')
+            headers = dict(headers or {}, **{'Content-Type': 'application/json'})
+        request = urllib.request.Request(url, data=body, headers=headers or {}, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            detail = e.read().decode('utf-8', errors='replace')[:500]
+            raise RuntimeError(f"Batch API 錯誤 {e.code}: {detail}") from e
+
+    def upload_file(self, path, display_name):
+        """
+        以可續傳上傳協定上傳 JSONL 請求檔
+
+        Returns:
+            str: 檔案名稱，例如 'files/abc123'
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        headers, _ = self._request('POST', self._url('upload/v1beta/files'), body={
+            'file': {'display_name': display_name}
+        }, headers={
+            'X-Goog-Upload-Protocol': 'resumable',
+            'X-Goog-Upload-Command': 'start',
+            'X-Goog-Upload-Header-Content-Length': str(len(data)),
+            'X-Goog-Upload-Header-Content-Type': 'application/jsonl'
+        })
+        upload_url = headers.get('X-Goog-Upload-URL')
+        if not upload_url:
+            raise RuntimeError("上傳回應缺少 X-Goog-Upload-URL")
+
+        _, body = self._request('POST', upload_url, body=data, headers={
+            'Content-Length': str(len(data)),
+            'X-Goog-Upload-Offset': '0',
+            'X-Goog-Upload-Command': 'upload, finalize'
+        })
+        return json.loads(body)['file']['name']
+
+    def create_batch(self, model_name, file_name, display_name):
+        """
+        以已上傳的請求檔建立批次作業
+
+        Returns:
+            str: 作業名稱，例如 'batches/xyz'
+        """
+        _, body = self._request('POST', self._url(f"v1beta/models/{model_name}:batchGenerateContent"), body={
+            'batch': {
+                'display_name': display_name,
+                'input_config': {'file_name': file_name}
+            }
+        })
+        return json.loads(body)['name']
+
+    def get_batch(self, batch_name):
+        """
+        查詢作業狀態
+
+        Returns:
+            tuple: ('running' | 'succeeded' | 'failed', 結果檔名稱或 None, 遠端狀態)
+        """
+        _, body = self._request('GET', self._url(f"v1beta/{batch_name}"))
+        batch = json.loads(body)
+        metadata = batch.get('metadata', {})
+        remote_state = metadata.get('state') or batch.get('state', '')
+
+        if remote_state.endswith('SUCCEEDED'):
+            output = batch.get('response') or metadata.get('output') or {}
+            return 'succeeded', output.get('responsesFile'), remote_state
+        if remote_state.endswith(_FAILED_STATES):
+            return 'failed', None, remote_state
+        return 'running', None, remote_state
+
+    def download_file(self, file_name, dest_path):
+        """下載結果檔（先寫暫存檔，完成後才取代目的檔）"""
+        _, body = self._request('GET', self._url(f"download/v1beta/{file_name}:download", alt='media'))
+        temp_path = dest_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(body)
+        os.replace(temp_path, dest_path)
+        return len(body)
+
+def wait_for_batches(client, manifest, poll_interval=None, on_update=None):
+    """
+    輪詢所有已送出的分片直到完成或失敗，完成的分片立即下載結果
+
+    Args:
+        client (BatchApiClient): Batch API 客戶端
+        manifest (BatchJobManifest): 作業狀態檔
+        poll_interval (int): 輪詢間隔秒數，None 表示只查詢一次
+        on_update (callable): 分片狀態改變時呼叫 on_update(shard)
+    """
+    while True:
+        for shard in manifest.shards_with_status('submitted'):
+            state, responses_file, remote_state = client.get_batch(shard['batch_name'])
+            if state == 'succeeded':
+                if not responses_file:
+                    manifest.update_shard(shard, status='failed', error='作業完成但沒有結果檔')
+                else:
+                    client.download_file(responses_file, manifest.shard_path(shard, 'results'))
+                    manifest.update_shard(shard, status='succeeded', remote_state=remote_state)
+            elif state == 'failed':
+                manifest.update_shard(shard, status='failed', remote_state=remote_state)
+            else:
+                if shard.get('remote_state') != remote_state:
+                    manifest.update_shard(shard, remote_state=remote_state)
+                continue
+
+            if on_update:
+                on_update(shard)
+
+        if poll_interval is None or not manifest.shards_with_status('submitted'):
+            return
+        time.sleep(poll_interval)
@@ -0,0 +1,103 @@
+"""
+Token 預算批次打包工具
+
+固定每批 15 則時，短評論批次浪費每次呼叫的固定開銷，長評論批次則容易
+回應不完整而觸發逐則回退。TokenBatchPacker 依 prompt 模板與每則評論的
+估算 token 數重新分批，每批填到 token 預算或數量上限為止。
+
+使用範例:
+    packer = TokenBatchPacker(get_food_relevance_batch_prompt, token_budget=3000, max_items=40)
+    for batch in packer.pack(db_manager.iter_unprocessed_reviews(40)):
+        ...
+    print(packer.get_stats())
+"""
+
+from utils.token_estimator import estimate_tokens
+
+class TokenBatchPacker:
+    """依 token 預算與數量上限將評論串流重新分批"""
+
+    def __init__(self, prompt_builder, token_budget, max_items, output_tokens_per_item=4):
+        """
+        初始化打包器
+
+        Args:
+            prompt_builder (callable): 批次 prompt 建構函數，接受 [(id, content), ...]
+            token_budget (int): 每批 prompt 與回應的估算 token 上限，0 或 None 表示只依數量分批
+            max_items (int): 每批最多評論數
+            output_tokens_per_item (int): 每則評論的回應 token 估算值
+        """
+        if max_items <= 0:
+            raise ValueError("max_items 必須大於 0")
+
+        self.token_budget = token_budget or None
+        self.max_items = max_items
+        self.output_tokens_per_item = output_tokens_per_item
+
+        # 模板固定開銷，以及每則評論在清單與回答格式中的額外開銷
+        self.base_tokens = estimate_tokens(prompt_builder([]))
+        self.item_overhead = estimate_tokens(prompt_builder([(0, '')])) - self.base_tokens
+
+        self.stats = {'batches': 0, 'items': 0, 'tokens': 0, 'max_items': 0, 'oversized': 0}
+
+    def estimate_item_tokens(self, content):
+        """估算單則評論加入批次後增加的 token 數"""
+        return estimate_tokens(content) + self.item_overhead + self.output_tokens_per_item
+
+    def pack(self, batches):
+        """
+        將評論批次串流重新分批
+
+        Args:
+            batches (iterable): 評論批次串流 [[(id, content), ...], ...]
+
+        Yields:
+            list: 重新分批後的評論 [(id, content), ...]
+        """
+        current = []
+        current_tokens = self.base_tokens
+
+        for batch in batches:
+            for review in batch:
+                item_tokens = self.estimate_item_tokens(review[1])
+                over_budget = (self.token_budget is not None
+                               and current_tokens + item_tokens > self.token_budget)
+
+                if current and (len(current) >= self.max_items or over_budget):
+                    yield self._emit(current, current_tokens)
+                    current = []
+                    current_tokens = self.base_tokens
+
+                current.append(review)
+                current_tokens += item_tokens
+
+                # 單則評論超過預算時獨立成批，不拆分內容
+                if (len(current) == 1 and self.token_budget is not None
+                        and current_tokens > self.token_budget):
+                    self.stats['oversized'] += 1
+
+        if current:
+            yield self._emit(current, current_tokens)
+
+    def _emit(self, batch, tokens):
+        """記錄批次統計並返回批次"""
+        self.stats['batches'] += 1
+        self.stats['items'] += len(batch)
+        self.stats['tokens'] += tokens
+        self.stats['max_items'] = max(self.stats['max_items'], len(batch))
+        return batch
+
+    def get_stats(self):
+        """
+        取得打包統計
+
+        Returns:
+            dict: 批次數、評論數、平均每批評論數與估算 token 數
+        """
+        stats = dict(self.stats)
+        batches = stats['batches']
+        stats['avg_items'] = stats['items'] / batches if batches else 0.0
+        stats['avg_tokens'] = stats['tokens'] / batches if batches else 0.0
+        stats['token_budget'] = self.token_budget
+        stats['max_items_limit'] = self.max_items
+        return stats
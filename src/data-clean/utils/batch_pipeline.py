@@ -0,0 +1,217 @@
+"""
+LLM 批次處理驅動工具
+
+判別與提取腳本共用的批次流程：
+
+1. 批次內相同內容只保留一則代表評論，逐則查詢回應快取
+2. 未命中的代表評論送交 LLM，同時保留 max_concurrency 個進行中的批次
+3. 依送出順序收集回應；整批失敗時切半重送（二分法），直到單則
+4. 新結果寫入回應快取，展開回整個批次後連同每則結果的來源交給呼叫端寫入資料庫
+
+各腳本只需提供送出與解析函數，prompt、回應格式與資料庫寫入方式由腳本決定。
+
+使用範例:
+    pipeline = BatchPipeline(client, submit, parse, 'food_relevance@1.0')
+    pipeline.run(packer.pack(batches), on_results)
+    print(pipeline.stats)
+"""
+
+from collections import deque
+from utils.content_hash import expand_results, group_by_content_hash
+from utils.database_manager import LABEL_SOURCE_GEMINI, LABEL_SOURCE_LOCAL
+from utils.prompt_loader import validate_prompt_input
+
+class BatchPipeline:
+    """以固定數量的進行中批次驅動 LLM 判別，失敗的批次以二分法重試"""
+
+    def __init__(self, client, submit, parse, prompt_version, prefill=None, prefill_source=LABEL_SOURCE_LOCAL,
+                 log=print):
+        """
+        初始化批次驅動
+
+        Args:
+            client (AsyncGeminiClient): 提供 max_concurrency 與回應快取的客戶端
+            submit (callable): submit(reviews) 送出評論並返回 Future，輸入無效時返回 None
+            parse (callable): parse(response, reviews) 將 Future 結果轉為
+                (與 reviews 對應的結果列表或 None, 錯誤訊息)
+            prompt_version (str): 回應快取的 prompt 版本，例如 'food_relevance@1.0'
+            prefill (callable): prefill(reviews, results) 在查詢快取後、送出前填入其他來源的結果
+                （例如本地分類器），未填入的項目維持 None
+            prefill_source (str): prefill 填入結果的標記來源，其餘結果（LLM 與回應快取）為 LABEL_SOURCE_GEMINI
+            log (callable): 輸出訊息的函數
+        """
+        self.client = client
+        self.submit = submit
+        self.parse = parse
+        self.prompt_version = prompt_version
+        self.prefill = prefill
+        self.prefill_source = prefill_source
+        self.log = log
+        self.stats = {'in_batch': 0, 'sent': 0, 'batches': 0, 'fallback_reviews': 0, 'calls': 0, 'single_calls': 0}
+
+    def collect(self, future, reviews, batch_num):
+        """
+        等待回應並解析
+
+        Returns:
+            list or None: 與 reviews 對應的結果，失敗時為 None
+        """
+        if future is None:
+            return None
+
+        try:
+            response = future.result()
+        except Exception as e:
+            self.log(f"批次 {batch_num} 處理錯誤: {e}")
+            return None
+
+        results, message = self.parse(response, reviews)
+        if results is None:
+            self.log(f"批次 {batch_num} 回應錯誤: {message}")
+        return results
+
+    def bisect_fallback(self, reviews, batch_num):
+        """
+        二分法回退方案
+
+        批次失敗時切成兩半同時重送，失敗的一半再繼續二分直到單則，
+        一則有問題的評論只需多約 log2(n) 次呼叫，不必逐則重送整個批次。
+
+        Returns:
+            list: 與 reviews 對應的結果，無法判別的評論為 None
+        """
+        self.log(f"批次 {batch_num} 以二分法重試 ({len(reviews)} 則評論)")
+
+        def bisect(part):
+            if len(part) == 1:
+                halves = [part]
+            else:
+                middle = len(part) // 2
+                halves = [part[:middle], part[middle:]]
+
+            futures = []
+            for half in halves:
+                self.stats['calls'] += 1
+                if len(half) == 1:
+                    self.stats['single_calls'] += 1
+                futures.append(self.submit(half))
+
+            results = []
+            for half, future in zip(halves, futures):
+                half_results = self.collect(future, half, batch_num)
+                if half_results is None:
+                    if len(half) == 1:
+                        self.log(f"  評論 ID {half[0][0]} 處理失敗")
+                        half_results = [None]
+                    else:
+                        half_results = bisect(half)
+                results.extend(half_results)
+
+            return results
+
+        return bisect(reviews)
+
+    def run(self, batches, on_results, total_batches=None):
+        """
+        處理評論批次串流
+
+        Args:
+            batches (iterable): 評論批次串流 [[(id, content), ...], ...]
+            on_results (callable): on_results(batch_num, batch, results, content_hashes, sources) 依批次順序呼叫，
+                results、content_hashes 與 sources（每則結果的標記來源）與 batch 等長，無法判別的評論結果為 None
+            total_batches (int): 預估批次數（只用於顯示進度）
+        """
+        in_flight = deque()
+        for batch_num, batch in enumerate(batches, 1):
+            total_batches = max(total_batches or 0, batch_num)
+
+            # 相同內容只送一則代表評論，再逐則查詢回應快取
+            representatives, assignment, content_hashes = group_by_content_hash(batch)
+            self.stats['in_batch'] += len(batch) - len(representatives)
+            results = self.client.get_cached_results(self.prompt_version, content_hashes)
+            sources = [LABEL_SOURCE_GEMINI] * len(representatives)
+            if self.prefill:
+                missing = [i for i, result in enumerate(results) if result is None]
+                self.prefill(representatives, results)
+                for i in missing:
+                    if results[i] is not None:
+                        sources[i] = self.prefill_source
+
+            pending = [i for i, result in enumerate(results) if result is None]
+            self.stats['sent'] += len(pending)
+            future = None
+            if pending:
+                self.log(f"送出第 {batch_num}/{total_batches} 批次 ({len(pending)} 則評論)")
+                future = self.submit([representatives[i] for i in pending])
+            else:
+                self.log(f"第 {batch_num}/{total_batches} 批次 ({len(batch)} 則評論) 不需送交 LLM")
+            in_flight.append((batch_num, batch, representatives, assignment, content_hashes, results, sources,
+                              pending, future))
+
+            # 同時保留 max_concurrency 個進行中的批次，速率由客戶端的 RPM/TPM 限制器控制
+            if len(in_flight) >= self.client.max_concurrency:
+                self._finish(on_results, *in_flight.popleft())
+
+        while in_flight:
+            self._finish(on_results, *in_flight.popleft())
+
+    def _finish(self, on_results, batch_num, batch, representatives, assignment, content_hashes, results, sources,
+                pending, future):
+        """等待批次回應，必要時二分重試，寫入快取後交給呼叫端"""
+        if pending:
+            pending_reviews = [representatives[i] for i in pending]
+            pending_results = self.collect(future, pending_reviews, batch_num)
+
+            if pending_results is None:
+                self.stats['batches'] += 1
+                self.stats['fallback_reviews'] += len(pending_reviews)
+                pending_results = self.bisect_fallback(pending_reviews, batch_num)
+
+            for i, result in zip(pending, pending_results):
+                results[i] = result
+            self.client.cache_results(self.prompt_version, [content_hashes[i] for i in pending], pending_results)
+
+        on_results(batch_num, batch, expand_results(assignment, results), expand_results(assignment, content_hashes),
+                   expand_results(assignment, sources))
+
+def submit_classification(client, get_prompt, reviews, structured=True):
+    """
+    送出是非判別，不等待回應：單則使用單則 prompt，多則使用批次 prompt
+
+    Args:
+        client (AsyncGeminiClient): Gemini 客戶端
+        get_prompt (callable): PromptLoader 的 prompt 取得方法，例如 get_food_relevance_prompt
+        reviews (list): 評論列表 [(id, content), ...]
+        structured (bool): 多則時是否要求以評論 id 為鍵的 JSON 陣列回應（否則為逐行 Yes/No 文字）
+
+    Returns:
+        concurrent.futures.Future or None: 判別結果（單則為 True/False/None，多則為列表或 None），
+            輸入驗證或 prompt 建立失敗時為 None
+    """
+    is_valid, message = validate_prompt_input(review_batch=reviews)
+    if not is_valid:
+        print(f"批次輸入驗證失敗: {message}")
+        return None
+
+    try:
+        if len(reviews) == 1:
+            return client.submit_single(get_prompt(content=reviews[0][1]))
+
+        prompt = get_prompt(review_batch=reviews, structured=structured)
+        if structured:
+            return client.submit_structured_batch(prompt, [review_id for review_id, _ in reviews])
+        return client.submit_batch(prompt, len(reviews))
+    except Exception as e:
+        print(f"prompt 建立錯誤: {e}")
+        return None
+
+def parse_classification_result(result, reviews):
+    """
+    將 submit_classification 的結果轉為與 reviews 對應的列表
+
+    Returns:
+        tuple: (布林值列表或 None, 錯誤訊息)
+    """
+    if len(reviews) == 1:
+        result = None if result is None else [result]
+    return result, "API 分析失敗"
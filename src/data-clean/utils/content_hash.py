@@ -0,0 +1,80 @@
+"""
+評論內容雜湊工具
+
+正規化評論文字後計算 SHA-256，讓內容相同的評論（例如「好吃」、「讚」或
+複製貼上的文字）只需送交 LLM 判別一次，結果再套用到相同雜湊的其他評論。
+正規化只處理不影響語意的差異：Unicode 相容字元 (NFKC)、大小寫與空白。
+"""
+
+import hashlib
+import re
+import unicodedata
+
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def normalize_content(text):
+    """
+    正規化評論內容
+
+    Args:
+        text (str): 評論內容
+
+    Returns:
+        str: 正規化後的內容
+    """
+    normalized = unicodedata.normalize('NFKC', text).casefold()
+    return _WHITESPACE_PATTERN.sub(' ', normalized).strip()
+
+def content_hash(text):
+    """
+    計算正規化內容的雜湊值（與 review_analysis.content_hash 相同）
+
+    Args:
+        text (str): 評論內容
+
+    Returns:
+        str: 64 字元的 SHA-256 十六進位字串，內容為 None 時返回 None
+    """
+    if text is None:
+        return None
+    return hashlib.sha256(normalize_content(text).encode('utf-8')).hexdigest()
+
+def group_by_content_hash(batch):
+    """
+    將批次評論依內容雜湊分組，每組保留第一則作為代表
+
+    Args:
+        batch (list): 評論列表 [(id, content), ...]
+
+    Returns:
+        tuple: (代表評論列表 [(id, content), ...],
+                每則評論對應的代表索引 [int, ...],
+                代表評論的雜湊列表 [str, ...])
+    """
+    representatives = []
+    hashes = []
+    assignment = []
+    index_by_hash = {}
+
+    for review_id, content in batch:
+        digest = content_hash(content)
+        if digest not in index_by_hash:
+            index_by_hash[digest] = len(representatives)
+            representatives.append((review_id, content))
+            hashes.append(digest)
+        assignment.append(index_by_hash[digest])
+
+    return representatives, assignment, hashes
+
+def expand_results(assignment, representative_results):
+    """
+    將代表評論的結果展開回原批次順序
+
+    Args:
+        assignment (list): group_by_content_hash 返回的代表索引
+        representative_results (list): 代表評論的結果
+
+    Returns:
+        list: 與原批次等長的結果列表
+    """
+    return [representative_results[index] for index in assignment]
@@ -0,0 +1,214 @@
+"""
+資料完整性與品質檢查工具
+
+以 id 範圍分段執行反向關聯 (anti-join) 與聚合檢查，
+並透過連線池平行執行，資料量成長到數百萬筆時仍可在合理時間內完成。
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from utils.database_manager import DatabaseManager
+
+# 每個檢查以 id 範圍分段，{range} 會替換成分段條件
+QUALITY_CHECKS = [
+    {
+        'name': 'orphan_review_analysis',
+        'description': 'review_analysis.review_id 找不到對應的 reviews 記錄',
+        'severity': 'error',
+        'table': 'review_analysis',
+        'id_column': 'ra.id',
+        'from_where': """
+            FROM review_analysis ra
+            LEFT JOIN reviews r ON ra.review_id = r.id
+            WHERE r.id IS NULL AND {range}
+        """
+    },
+    {
+        'name': 'orphan_extracted_food_items',
+        'description': 'extracted_food_items.review_id 找不到對應的 review_analysis 記錄',
+        'severity': 'error',
+        'table': 'extracted_food_items',
+        'id_column': 'e.id',
+        'from_where': """
+            FROM extracted_food_items e
+            LEFT JOIN review_analysis ra ON e.review_id = ra.id
+            WHERE ra.id IS NULL AND {range}
+        """
+    },
+    {
+        'name': 'duplicate_review_id',
+        'description': 'reviews.review_id 重複（計算同一 review_id 較晚匯入的多餘記錄）',
+        'severity': 'error',
+        'table': 'reviews',
+        'id_column': 'r.id',
+        'from_where': """
+            FROM reviews r
+            WHERE r.review_id IS NOT NULL AND {range}
+                AND EXISTS (
+                    SELECT 1 FROM reviews r2
+                    WHERE r2.review_id = r.review_id AND r2.id < r.id
+                )
+        """
+    },
+    {
+        'name': 'null_rating',
+        'description': 'reviews.rating 為 NULL',
+        'severity': 'warning',
+        'table': 'reviews',
+        'id_column': 'r.id',
+        'from_where': """
+            FROM reviews r
+            WHERE r.rating IS NULL AND {range}
+        """
+    },
+    {
+        'name': 'inconsistent_labels',
+        'description': '具體食物或提取標記存在，但前一階段標記不成立',
+        'severity': 'error',
+        'table': 'review_analysis',
+        'id_column': 'ra.id',
+        'from_where': """
+            FROM review_analysis ra
+            WHERE {range}
+                AND (
+                    (ra.has_specific_food_mention IS NOT NULL
+                        AND (ra.is_project_related IS NULL OR ra.is_project_related = FALSE))
+                    OR (ra.is_food_items_extracted = TRUE
+                        AND (ra.has_specific_food_mention IS NULL OR ra.has_specific_food_mention = FALSE))
+                )
+        """
+    },
+]
+
+class DataQualityChecker:
+    """平行資料品質檢查器"""
+
+    def __init__(self, max_workers=4, chunk_size=50000, sample_size=5):
+        """
+        初始化檢查器
+
+        Args:
+            max_workers (int): 平行執行的查詢數（同時也是連線池大小）
+            chunk_size (int): 每段 id 範圍的大小
+            sample_size (int): 每個檢查保留的違規樣本 id 數量
+        """
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.sample_size = sample_size
+        self.db_manager = DatabaseManager(
+            use_pool=True, pool_size=max_workers, pool_name='data_quality_pool'
+        )
+
+    def _get_id_bounds(self, table):
+        """取得資料表的 id 範圍"""
+        min_id, max_id = self.db_manager.execute_query(
+            f"SELECT MIN(id), MAX(id) FROM {table}", fetch_all=False
+        )
+        return min_id, max_id
+
+    def _build_tasks(self):
+        """將每個檢查依 id 範圍切成多個分段任務"""
+        bounds = {}
+        tasks = []
+        for check in QUALITY_CHECKS:
+            table = check['table']
+            if table not in bounds:
+                bounds[table] = self._get_id_bounds(table)
+
+            min_id, max_id = bounds[table]
+            if min_id is None:
+                continue
+
+            for start in range(min_id, max_id + 1, self.chunk_size):
+                tasks.append((check, start, min(start + self.chunk_size - 1, max_id)))
+        return tasks, bounds
+
+    def _run_chunk(self, check, start_id, end_id):
+        """
+        執行單一分段的檢查
+
+        Returns:
+            tuple: (違規數, 樣本 id 列表)
+        """
+        range_condition = f"{check['id_column']} BETWEEN %s AND %s"
+        from_where = check['from_where'].format(range=range_condition)
+        count = self.db_manager.execute_query(
+            f"SELECT COUNT(*) {from_where}", (start_id, end_id), fetch_all=False
+        )[0]
+
+        samples = []
+        if count:
+            rows = self.db_manager.execute_query(
+                f"SELECT {check['id_column']} {from_where} ORDER BY {check['id_column']} LIMIT %s",
+                (start_id, end_id, self.sample_size)
+            )
+            samples = [row[0] for row in rows]
+        return count, samples
+
+    def run(self):
+        """
+        執行所有檢查
+
+        Returns:
+            dict: 機器可讀的檢查報告
+        """
+        started_at = datetime.now()
+        tasks, bounds = self._build_tasks()
+
+        results = {
+            check['name']: {
+                'description': check['description'],
+                'severity': check['severity'],
+                'violations': 0,
+                'samples': [],
+                'chunks': 0
+            }
+            for check in QUALITY_CHECKS
+        }
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._run_chunk, check, start_id, end_id): check['name']
+                for check, start_id, end_id in tasks
+            }
+            for future in as_completed(futures):
+                result = results[futures[future]]
+                count, samples = future.result()
+                result['violations'] += count
+                result['chunks'] += 1
+                result['samples'] = sorted(result['samples'] + samples)[:self.sample_size]
+
+        errors = [name for name, r in results.items() if r['severity'] == 'error' and r['violations']]
+        warnings = [name for name, r in results.items() if r['severity'] == 'warning' and r['violations']]
+
+        return {
+            'report_type': 'data_quality_report',
+            'generated_at': started_at.isoformat(),
+            'duration_seconds': round((datetime.now() - started_at).total_seconds(), 3),
+            'settings': {
+                'max_workers': self.max_workers,
+                'chunk_size': self.chunk_size
+            },
+            'id_ranges': {table: {'min_id': b[0], 'max_id': b[1]} for table, b in bounds.items()},
+            'checks': results,
+            'errors': errors,
+            'warnings': warnings,
+            'passed': not errors
+        }
+
+    def close(self):
+        """關閉檢查器使用的連線池"""
+        DatabaseManager.close_pools(self.db_manager.pool_name)
+
+# 便利函數
+def save_report(report, filename):
+    """
+    將檢查報告寫入 JSON 檔案
+
+    Args:
+        report (dict): 檢查報告
+        filename (str): 輸出檔案路徑
+    """
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
@@ -4,35 +4,262 @@
 提供資料庫連接和操作的封裝功能
 """
 
+import os
+import random
+import re
+import socket
+import threading
+import time
 import mysql.connector
+from mysql.connector import errorcode, pooling
+from collections import Counter
 from contextlib import contextmanager
-from config import DATABASE_CONFIG
+from config import DATABASE_CONFIG, POOL_CONFIG, COUNTERS_ENABLED
+from utils.content_hash import content_hash
+
+# 集合式批次更新時每個 UPDATE 陳述式包含的列數
+BULK_UPDATE_CHUNK_SIZE = 1000
+
+_IDENTIFIER_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+def _validate_identifiers(*names):
+    """確認資料表與欄位名稱只包含合法字元（識別字無法以參數綁定）"""
+    for name in names:
+        if not _IDENTIFIER_PATTERN.match(name):
+            raise ValueError(f"不合法的識別字: {name}")
+
+def _latest_updates(updates):
+    """
+    合併重複 id 的更新，同一 id 以最後一筆為準（與逐列更新的結果一致）
+
+    Returns:
+        list: [(id, value), ...]
+    """
+    latest = {}
+    for value, row_id in updates:
+        latest[row_id] = value
+    return list(latest.items())
+
+def _bulk_update_statement(table, column, chunk):
+    """
+    產生單一 UPDATE ... JOIN (VALUES ...) 陳述式
+
+    Args:
+        chunk (list): [(id, value), ...]
+
+    Returns:
+        tuple: (SQL, 參數列表)
+    """
+    values_list = ", ".join(["ROW(%s, %s)"] * len(chunk))
+    params = [item for row in chunk for item in row]
+    query = f"""
+                    UPDATE {table} t
+                    JOIN (VALUES {values_list}) AS s (id, value) ON t.id = s.id
+                    SET t.{column} = s.value
+                """
+    return query, params
+
+def default_worker_id():
+    """
+    產生預設的租約認領者識別碼
+
+    Returns:
+        str: 主機名稱與程序 ID 組成的識別碼
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"[:64]
+
+def print_connection_stats(stats):
+    """
+    顯示連線取得耗時統計
+
+    Args:
+        stats (dict): get_connection_stats 返回的統計
+    """
+    mode = f"連線池 (大小 {stats['pool_size']})" if stats['pooled'] else '每次新建'
+    print(f"\n=== 資料庫連線統計 ===")
+    print(f"連線模式: {mode}")
+    print(f"取得連線: {stats['acquired']} 次")
+    print(f"平均耗時: {stats['avg_acquire_ms']:.2f} ms，最大: {stats['max_acquire_ms']:.2f} ms")
 
 class DatabaseManager:
     """資料庫管理類別"""
 
-    def __init__(self, config=None):
+    # 依 (pool_name, 連線目標) 共用的連線池，讓同一程序內的多個管理器實例重用連線
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, config=None, use_pool=None, pool_size=None, pool_name=None):
         """
         初始化資料庫管理器
 
         Args:
             config (dict): 資料庫配置，預設使用 DATABASE_CONFIG
+            use_pool (bool): 是否使用連線池，預設依 POOL_CONFIG['enabled']
+            pool_size (int): 連線池大小，預設依 POOL_CONFIG['pool_size']
+            pool_name (str): 連線池名稱，相同名稱且連線到同一資料庫的管理器共用同一個連線池
         """
         self.config = config if config is not None else DATABASE_CONFIG
+        self.use_pool = POOL_CONFIG['enabled'] if use_pool is None else use_pool
+        self.pool_size = pool_size if pool_size is not None else POOL_CONFIG['pool_size']
+        self.pool_name = pool_name if pool_name is not None else POOL_CONFIG['pool_name']
+        self._stats_lock = threading.Lock()
+        self.reset_connection_stats()
+
+    def _pool_key(self):
+        """
+        連線池的識別鍵值：名稱相同但連到不同伺服器或資料庫的管理器不共用連線池
+
+        Returns:
+            tuple: (pool_name, host, port, user, database)
+        """
+        return (
+            self.pool_name,
+            self.config.get('host'),
+            self.config.get('port'),
+            self.config.get('user'),
+            self.config.get('database')
+        )
+
+    def _get_pool(self):
+        """
+        取得（必要時建立）共用連線池
+
+        Returns:
+            mysql.connector.pooling.MySQLConnectionPool: 連線池物件
+        """
+        key = self._pool_key()
+        pool = DatabaseManager._pools.get(key)
+        if pool is None:
+            with DatabaseManager._pools_lock:
+                pool = DatabaseManager._pools.get(key)
+                if pool is None:
+                    try:
+                        pool = pooling.MySQLConnectionPool(
+                            pool_name=self.pool_name,
+                            pool_size=self.pool_size,
+                            pool_reset_session=True,
+                            **self.config
+                        )
+                    except mysql.connector.Error as e:
+                        raise Exception(f"資料庫連線池建立錯誤: {e}")
+                    DatabaseManager._pools[key] = pool
+
+        if pool.pool_size != self.pool_size:
+            raise ValueError(
+                f"連線池 {self.pool_name} 已以大小 {pool.pool_size} 建立，"
+                f"無法改為 {self.pool_size}（請使用不同的 pool_name）"
+            )
+        return pool
+
+    def _acquire_pooled_connection(self):
+        """
+        從連線池取出連線，連線池耗盡時等待至 acquire_timeout
+
+        Returns:
+            mysql.connector.pooling.PooledMySQLConnection: 連線池連線
+        """
+        pool = self._get_pool()
+        deadline = time.monotonic() + POOL_CONFIG['acquire_timeout']
+
+        while True:
+            try:
+                conn = pool.get_connection()
+                break
+            except mysql.connector.errors.PoolError:
+                if time.monotonic() >= deadline:
+                    raise Exception(f"資料庫連線池已耗盡（大小 {self.pool_size}），等待逾時")
+                time.sleep(0.05)
+
+        if POOL_CONFIG['health_check']:
+            try:
+                conn.ping(reconnect=True, attempts=2, delay=0)
+            except mysql.connector.Error:
+                with self._stats_lock:
+                    self.connection_stats['health_check_failures'] += 1
+                conn.close()
+                raise
+
+        return conn
 
     def connect(self):
         """
-        建立資料庫連接
+        建立資料庫連接（連線池模式下從連線池取出）
 
         Returns:
             mysql.connector.connection: 資料庫連接物件
         """
+        start = time.perf_counter()
         try:
-            conn = mysql.connector.connect(**self.config)
-            return conn
+            if self.use_pool:
+                conn = self._acquire_pooled_connection()
+            else:
+                conn = mysql.connector.connect(**self.config)
         except mysql.connector.Error as e:
             raise Exception(f"資料庫連接錯誤: {e}")
 
+        self._record_acquire((time.perf_counter() - start) * 1000)
+        return conn
+
+    def _record_acquire(self, elapsed_ms):
+        """記錄單次取得連線的耗時"""
+        with self._stats_lock:
+            stats = self.connection_stats
+            stats['acquired'] += 1
+            stats['total_acquire_ms'] += elapsed_ms
+            stats['max_acquire_ms'] = max(stats['max_acquire_ms'], elapsed_ms)
+
+    def get_connection_stats(self):
+        """
+        取得連線取得耗時統計
+
+        Returns:
+            dict: 連線統計資訊（次數、平均/最大耗時毫秒、是否使用連線池）
+        """
+        with self._stats_lock:
+            stats = dict(self.connection_stats)
+
+        stats['avg_acquire_ms'] = (
+            stats['total_acquire_ms'] / stats['acquired'] if stats['acquired'] else 0.0
+        )
+        stats['pooled'] = self.use_pool
+        stats['pool_size'] = self.pool_size if self.use_pool else None
+        return stats
+
+    def reset_connection_stats(self):
+        """重置連線統計"""
+        self.connection_stats = {
+            'acquired': 0,
+            'total_acquire_ms': 0.0,
+            'max_acquire_ms': 0.0,
+            'health_check_failures': 0
+        }
+
+    @classmethod
+    def close_pools(cls, pool_name=None):
+        """
+        捨棄共用連線池並關閉其中的閒置連線
+
+        仍被取出使用中的連線不受影響，歸還時隨被捨棄的連線池一起回收。
+
+        Args:
+            pool_name (str): 只捨棄指定名稱的連線池，None 表示全部
+        """
+        with cls._pools_lock:
+            keys = [key for key in cls._pools if pool_name is None or key[0] == pool_name]
+            pools = [cls._pools.pop(key) for key in keys]
+
+        for pool in pools:
+            # 取出所有閒置連線後直接中斷，不歸還連線池
+            while True:
+                try:
+                    conn = pool.get_connection()
+                except mysql.connector.Error:
+                    break
+                try:
+                    conn.disconnect()
+                except mysql.connector.Error:
+                    pass
+
     @contextmanager
     def get_connection(self):
         """
@@ -132,9 +359,529 @@ class DatabaseManager:
                     conn.commit()
                 return cursor.rowcount
 
+    def iter_keyset_pages(self, select_clause, from_clause, id_column, where_clause=None,
+                          params=(), batch_size=1000, start_after=0):
+        """
+        以 keyset 分頁逐頁產生查詢結果
+
+        產生 SELECT {select_clause} FROM {from_clause} WHERE ({where_clause})
+        AND {id_column} > last_id ORDER BY {id_column} LIMIT n，
+        每次只在記憶體中保留一頁。select_clause 的第一個欄位必須是 id_column。
+
+        Args:
+            select_clause (str): SELECT 欄位
+            from_clause (str): FROM 子句（可含 JOIN）
+            id_column (str): 分頁依據的遞增唯一欄位，例如 'ra.id'
+            where_clause (str): 額外篩選條件，可含 %s 佔位符
+            params (tuple): where_clause 的參數
+            batch_size (int): 每頁數量
+            start_after (int): 起始 id（不含）
+
+        Yields:
+            list: 每頁的查詢結果
+        """
+        conditions = f"({where_clause}) AND " if where_clause else ""
+        query = f"""
+            SELECT {select_clause}
+            FROM {from_clause}
+            WHERE {conditions}{id_column} > %s
+            ORDER BY {id_column}
+            LIMIT %s
+        """
+
+        last_id = start_after
+        while True:
+            rows = self.execute_query(query, tuple(params) + (last_id, batch_size))
+            if not rows:
+                return
+
+            yield rows
+
+            last_id = rows[-1][0]
+            if len(rows) < batch_size:
+                return
+
+    def bulk_update_column(self, table, column, updates,
+                           chunk_size=BULK_UPDATE_CHUNK_SIZE, connection=None):
+        """
+        以多列 VALUES 衍生表 JOIN 執行集合式批次更新
+
+        每 chunk_size 筆 (value, id) 組成一個 VALUES ROW(...) 衍生表，
+        以單一 UPDATE ... JOIN 套用到目標表，取代逐列的 executemany。
+        不需要 CREATE TEMPORARY TABLES 權限（需 MySQL 8.0.19 以上）。
+
+        Args:
+            table (str): 目標資料表名稱
+            column (str): 要更新的欄位名稱
+            updates (list): 更新列表 [(value, id), ...]，與 execute_batch_update 相同格式
+            chunk_size (int): 每個 UPDATE 陳述式包含的列數
+            connection: 現有的資料庫連接（由呼叫端控制交易），如為 None 則自動建立並提交
+
+        Returns:
+            int: 受影響的行數
+        """
+        _validate_identifiers(table, column)
+
+        if not updates:
+            return 0
+
+        rows = _latest_updates(updates)
+
+        if connection is not None:
+            return self._bulk_update_with_connection(connection, table, column, rows, chunk_size)
+
+        with self.get_connection() as conn:
+            try:
+                affected = self._bulk_update_with_connection(conn, table, column, rows, chunk_size)
+                conn.commit()
+                return affected
+            except Exception:
+                conn.rollback()
+                raise
+
+    def _bulk_update_with_connection(self, conn, table, column, rows, chunk_size):
+        """在指定連線上分段執行 UPDATE ... JOIN (VALUES ...)"""
+        affected = 0
+        with self.get_cursor(conn) as cursor:
+            for start in range(0, len(rows), chunk_size):
+                query, params = _bulk_update_statement(table, column, rows[start:start + chunk_size])
+                cursor.execute(query, params)
+                affected += cursor.rowcount
+        return affected
+
+# 各處理階段的待處理條件（供分頁查詢與統計共用）
+PENDING_CONDITIONS = {
+    'food_relevance': "is_project_related IS NULL",
+    'specific_food': "is_project_related = TRUE AND has_specific_food_mention IS NULL",
+    'extraction': (
+        "has_specific_food_mention = TRUE "
+        "AND (is_food_items_extracted = FALSE OR is_food_items_extracted IS NULL)"
+    )
+}
+
+# 各處理階段已有判別結果的條件（供本地分類器讀取訓練資料）
+LABELED_CONDITIONS = {
+    'food_relevance': "is_project_related IS NOT NULL",
+    'specific_food': "is_project_related = TRUE AND has_specific_food_mention IS NOT NULL"
+}
+
+# 可透過集合式批次更新寫入的標記欄位
+LABEL_COLUMNS = ('is_project_related', 'has_specific_food_mention', 'is_food_items_extracted')
+
+# 判別標記的來源欄位：本地分類器只以 Gemini 判別的標記訓練，不學習自己或詞彙比對的輸出
+LABEL_SOURCE_COLUMNS = {
+    'is_project_related': 'is_project_related_source',
+    'has_specific_food_mention': 'has_specific_food_mention_source'
+}
+
+# 標記來源：Gemini（含回應快取與批次作業）、本地分類器、詞彙比對、相同內容擴散
+LABEL_SOURCE_GEMINI = 'gemini'
+LABEL_SOURCE_LOCAL = 'local'
+LABEL_SOURCE_LEXICON = 'lexicon'
+LABEL_SOURCE_FAN_OUT = 'fan_out'
+LABEL_SOURCES = (LABEL_SOURCE_GEMINI, LABEL_SOURCE_LOCAL, LABEL_SOURCE_LEXICON, LABEL_SOURCE_FAN_OUT)
+
+# 建立標記來源欄位的遷移腳本（尚未執行時，寫入標記會提示執行此腳本）
+LABEL_SOURCE_MIGRATION = 'docs/sql/11-add-label-source-columns.sql'
+
+# 計數器分片數：每次更新隨機寫入一個分片，並行的標記更新不會爭用同一列，讀取時加總
+COUNTER_SHARDS = 16
+
+# 各處理階段寫入的標記欄位
+STAGE_LABEL_COLUMNS = {
+    'food_relevance': 'is_project_related',
+    'specific_food': 'has_specific_food_mention',
+    'extraction': 'is_food_items_extracted'
+}
+
+def _label_source_statement(column, source, review_ids):
+    """
+    產生寫入標記來源的 UPDATE 陳述式
+
+    Args:
+        column (str): 標記欄位，須為 LABEL_SOURCE_COLUMNS 之一
+        source (str): 標記來源，None 表示清除（例如重設標記時）
+        review_ids (list): 評論 ID 列表
+
+    Returns:
+        tuple: (SQL, 參數列表)
+    """
+    placeholders = ", ".join(["%s"] * len(review_ids))
+    query = f"""
+                UPDATE review_analysis
+                SET {LABEL_SOURCE_COLUMNS[column]} = %s
+                WHERE id IN ({placeholders})
+            """
+    return query, [source] + list(review_ids)
+
+@contextmanager
+def _label_source_required():
+    """
+    將缺少標記來源欄位的錯誤（Unknown column）轉為提示執行遷移腳本的錯誤
+
+    mysql.connector 的錯誤以 errno 表示錯誤碼，aiomysql（PyMySQL）的錯誤以 args[0] 表示。
+    """
+    try:
+        yield
+    except Exception as e:
+        code = getattr(e, 'errno', None) or (e.args[0] if e.args else None)
+        if code == errorcode.ER_BAD_FIELD_ERROR and any(
+            source_column in str(e) for source_column in LABEL_SOURCE_COLUMNS.values()
+        ):
+            raise RuntimeError(f"review_analysis 缺少標記來源欄位，請先執行 {LABEL_SOURCE_MIGRATION}（{e}）") from e
+        raise
+
+def _require_label_source_pages(pages):
+    """逐頁產生查詢結果，缺少標記來源欄位時提示執行遷移腳本"""
+    with _label_source_required():
+        yield from pages
+
+def _validate_label_source(source):
+    """確認標記來源為 LABEL_SOURCES 之一或 None"""
+    if source is not None and source not in LABEL_SOURCES:
+        raise ValueError(f"不支援的標記來源: {source}")
+
+def _counter_key(column, value):
+    """
+    產生計數器鍵值
+
+    Returns:
+        str: 例如 'is_project_related:null'、'is_project_related:true'
+    """
+    if value is None:
+        return f"{column}:null"
+    return f"{column}:{'true' if value else 'false'}"
+
+def _counter_deltas(column, old_rows, latest):
+    """
+    依舊值與新值計算計數器增減量
+
+    Args:
+        column (str): 標記欄位
+        old_rows (list): [(review_id, 舊值), ...]
+        latest (dict): {review_id: 新值}
+
+    Returns:
+        Counter: {counter_key: 增減量}
+    """
+    deltas = Counter()
+    for review_id, old_value in old_rows:
+        old_key = _counter_key(column, old_value)
+        new_key = _counter_key(column, latest[review_id])
+        if old_key != new_key:
+            deltas[old_key] -= 1
+            deltas[new_key] += 1
+    return deltas
+
+def _counter_upsert_statement(deltas):
+    """
+    產生將計數器增減量寫入隨機分片的 INSERT ... ON DUPLICATE KEY UPDATE 陳述式
+
+    Args:
+        deltas (Counter): {counter_key: 增減量}
+
+    Returns:
+        tuple or None: (SQL, 參數列表)，沒有變化時為 None
+    """
+    # 依鍵值排序，並行交易以相同順序鎖定分片列
+    changes = sorted((key, delta) for key, delta in deltas.items() if delta)
+    if not changes:
+        return None
+
+    shard = random.randrange(COUNTER_SHARDS)
+    placeholders = ", ".join(["(%s, %s, %s)"] * len(changes))
+    params = [item for key, delta in changes for item in (key, shard, delta)]
+    query = f"""
+                INSERT INTO review_analysis_counters (counter_key, shard, count)
+                VALUES {placeholders}
+                ON DUPLICATE KEY UPDATE count = count + VALUES(count)
+            """
+    return query, params
+
 class ReviewAnalysisManager(DatabaseManager):
     """評論分析表專用的資料庫管理器"""
 
+    def __init__(self, config=None, maintain_counters=None, **kwargs):
+        """
+        初始化評論分析管理器
+
+        Args:
+            config (dict): 資料庫配置，預設使用 DATABASE_CONFIG
+            maintain_counters (bool): 標記更新時是否同步維護 review_analysis_counters，
+                預設依 COUNTERS_ENABLED
+            **kwargs: 傳遞給 DatabaseManager 的連線池參數
+        """
+        super().__init__(config, **kwargs)
+        self.maintain_counters = COUNTERS_ENABLED if maintain_counters is None else maintain_counters
+
+    def fetch_review_page(self, stage, after_id=0, limit=100):
+        """
+        以 keyset 分頁取得某處理階段的一頁待處理評論
+
+        Args:
+            stage (str): 處理階段 ('food_relevance', 'specific_food', 'extraction')
+            after_id (int): 只取 id 大於此值的評論
+            limit (int): 每頁數量
+
+        Returns:
+            list: 評論列表 [(id, content), ...]，依 id 遞增排序
+        """
+        if stage not in PENDING_CONDITIONS:
+            raise ValueError(f"不支援的處理階段: {stage}")
+
+        query = f"""
+            SELECT id, content
+            FROM review_analysis
+            WHERE {PENDING_CONDITIONS[stage]}
+                AND id > %s
+            ORDER BY id
+            LIMIT %s
+        """
+        return self.execute_query(query, (after_id, limit))
+
+    def iter_review_batches(self, stage, batch_size=100, start_after=0):
+        """
+        以 WHERE id > last_id ORDER BY id LIMIT n 逐批產生待處理評論
+
+        每次只在記憶體中保留一批資料；迭代期間被更新而不再符合條件的
+        評論不會重複出現，處理失敗的評論會留待下次執行。
+
+        Args:
+            stage (str): 處理階段 ('food_relevance', 'specific_food', 'extraction')
+            batch_size (int): 每批數量
+            start_after (int): 起始 id（不含）
+
+        Yields:
+            list: 評論批次 [(id, content), ...]
+        """
+        last_id = start_after
+        while True:
+            batch = self.fetch_review_page(stage, last_id, batch_size)
+            if not batch:
+                return
+
+            yield batch
+
+            last_id = batch[-1][0]
+            if len(batch) < batch_size:
+                return
+
+    def iter_unprocessed_reviews(self, batch_size=100):
+        """逐批產生尚未判別食物相關性的評論"""
+        return self.iter_review_batches('food_relevance', batch_size)
+
+    def iter_food_related_reviews(self, batch_size=100):
+        """逐批產生尚未判別具體食物提及的食物相關評論"""
+        return self.iter_review_batches('specific_food', batch_size)
+
+    def iter_pending_extraction_reviews(self, batch_size=100):
+        """逐批產生尚未提取結構化食物項目的評論"""
+        return self.iter_review_batches('extraction', batch_size)
+
+    def iter_labeled_reviews(self, stage, batch_size=5000):
+        """
+        逐頁產生某處理階段由 Gemini 判別的評論（供本地分類器訓練）
+
+        本地分類器、詞彙比對與相同內容擴散寫入的標記不列入，避免模型學習自己的輸出。
+
+        Args:
+            stage (str): 處理階段 ('food_relevance', 'specific_food')
+            batch_size (int): 每頁數量
+
+        Yields:
+            list: [(id, content, label), ...]
+        """
+        if stage not in LABELED_CONDITIONS:
+            raise ValueError(f"不支援的處理階段: {stage}")
+
+        pages = self.iter_keyset_pages(
+            select_clause=f"id, content, {STAGE_LABEL_COLUMNS[stage]}",
+            from_clause="review_analysis",
+            id_column="id",
+            where_clause=f"{LABELED_CONDITIONS[stage]} AND {LABEL_SOURCE_COLUMNS[STAGE_LABEL_COLUMNS[stage]]} = %s",
+            params=[LABEL_SOURCE_GEMINI],
+            batch_size=batch_size
+        )
+        return _require_label_source_pages(pages)
+
+    def count_pending_reviews(self, stage):
+        """
+        計算某處理階段的待處理評論數
+
+        Args:
+            stage (str): 處理階段 ('food_relevance', 'specific_food', 'extraction')
+
+        Returns:
+            int: 待處理評論數
+        """
+        if stage not in PENDING_CONDITIONS:
+            raise ValueError(f"不支援的處理階段: {stage}")
+
+        query = f"SELECT COUNT(*) FROM review_analysis WHERE {PENDING_CONDITIONS[stage]}"
+        return self.execute_query(query, fetch_all=False)[0]
+
+    def claim_review_batch(self, stage, worker_id, batch_size=15, lease_seconds=600, after_id=0):
+        """
+        以 SELECT ... FOR UPDATE SKIP LOCKED 認領一批待處理評論並寫入租約
+
+        同時執行的多個程序會取得互不重疊的批次；租約到期仍未完成的評論
+        會被視為可認領，由其他程序接手。
+
+        Args:
+            stage (str): 處理階段 ('food_relevance', 'specific_food', 'extraction')
+            worker_id (str): 認領者識別碼
+            batch_size (int): 每批數量
+            lease_seconds (int): 租約有效秒數
+            after_id (int): 只認領 id 大於此值的評論
+
+        Returns:
+            list: 已認領的評論列表 [(id, content), ...]
+        """
+        if stage not in PENDING_CONDITIONS:
+            raise ValueError(f"不支援的處理階段: {stage}")
+
+        select_query = f"""
+            SELECT id, content
+            FROM review_analysis
+            WHERE {PENDING_CONDITIONS[stage]}
+                AND id > %s
+                AND (lease_expires_at IS NULL OR lease_expires_at < NOW())
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """
+
+        with self.get_connection() as conn:
+            with self.get_cursor(conn) as cursor:
+                try:
+                    cursor.execute(select_query, (after_id, batch_size))
+                    batch = cursor.fetchall()
+
+                    if batch:
+                        placeholders = ", ".join(["%s"] * len(batch))
+                        cursor.execute(f"""
+                            UPDATE review_analysis
+                            SET lease_owner = %s,
+                                lease_expires_at = NOW() + INTERVAL %s SECOND
+                            WHERE id IN ({placeholders})
+                        """, [worker_id, lease_seconds] + [review_id for review_id, _ in batch])
+
+                    conn.commit()
+                    return batch
+                except Exception:
+                    conn.rollback()
+                    raise
+
+    def iter_claimed_batches(self, stage, worker_id, batch_size=15, lease_seconds=600):
+        """
+        逐批認領待處理評論，直到沒有可認領的評論
+
+        依 id 遞增認領；後段沒有可認領的評論時會從頭再認領一次，
+        長時間執行的程序也能接手其他程序留下的過期租約。
+
+        Args:
+            stage (str): 處理階段 ('food_relevance', 'specific_food', 'extraction')
+            worker_id (str): 認領者識別碼
+            batch_size (int): 每批數量
+            lease_seconds (int): 租約有效秒數
+
+        Yields:
+            list: 已認領的評論批次 [(id, content), ...]
+        """
+        last_id = 0
+        while True:
+            batch = self.claim_review_batch(stage, worker_id, batch_size, lease_seconds, last_id)
+            if not batch and last_id:
+                # 從頭再認領一次，接手 id 較小、在本程序執行期間租約到期的評論
+                last_id = 0
+                batch = self.claim_review_batch(stage, worker_id, batch_size, lease_seconds, last_id)
+            if not batch:
+                return
+
+            yield batch
+            last_id = batch[-1][0]
+
+    def release_leases(self, worker_id, review_ids):
+        """
+        釋放指定評論的租約（只釋放自己持有的租約）
+
+        Args:
+            worker_id (str): 認領者識別碼
+            review_ids (list): 評論 ID 列表
+
+        Returns:
+            int: 受影響的行數
+        """
+        if not review_ids:
+            return 0
+
+        placeholders = ", ".join(["%s"] * len(review_ids))
+        query = f"""
+            UPDATE review_analysis
+            SET lease_owner = NULL, lease_expires_at = NULL
+            WHERE lease_owner = %s AND id IN ({placeholders})
+        """
+        return self.execute_update(query, [worker_id] + list(review_ids))
+
+    def save_leased_labels(self, column, updates, worker_id, source=None):
+        """
+        只寫入仍由 worker_id 持有租約的評論標記，並在同一交易中釋放租約
+
+        租約到期後已被其他程序重新認領的評論不寫入，避免覆蓋新持有者的結果。
+
+        Args:
+            column (str): 標記欄位，須為 LABEL_COLUMNS 之一
+            updates (list): 更新列表 [(label, review_id), ...]
+            worker_id (str): 認領者識別碼
+            source (str): 標記來源，須為 LABEL_SOURCES 之一
+
+        Returns:
+            tuple: (寫入的評論數, 租約已被接手而未寫入的評論 ID 列表)
+        """
+        if column not in LABEL_COLUMNS:
+            raise ValueError(f"不支援的標記欄位: {column}")
+
+        latest = dict(_latest_updates(updates))
+        if not latest:
+            return 0, []
+
+        review_ids = list(latest)
+        owned = set()
+        with self.get_connection() as conn:
+            try:
+                with self.get_cursor(conn) as cursor:
+                    # 鎖定仍由自己持有租約的評論，確認後才寫入
+                    for start in range(0, len(review_ids), BULK_UPDATE_CHUNK_SIZE):
+                        chunk = review_ids[start:start + BULK_UPDATE_CHUNK_SIZE]
+                        placeholders = ", ".join(["%s"] * len(chunk))
+                        cursor.execute(f"""
+                            SELECT id FROM review_analysis
+                            WHERE lease_owner = %s AND id IN ({placeholders})
+                            FOR UPDATE
+                        """, [worker_id] + chunk)
+                        owned.update(row[0] for row in cursor.fetchall())
+
+                    owned_ids = [review_id for review_id in review_ids if review_id in owned]
+                    if owned_ids:
+                        self.bulk_update_labels(
+                            column, [(latest[review_id], review_id) for review_id in owned_ids], connection=conn,
+                            source=source
+                        )
+                        placeholders = ", ".join(["%s"] * len(owned_ids))
+                        cursor.execute(f"""
+                            UPDATE review_analysis
+                            SET lease_owner = NULL, lease_expires_at = NULL
+                            WHERE id IN ({placeholders})
+                        """, owned_ids)
+
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        lost_ids = [review_id for review_id in review_ids if review_id not in owned]
+        return len(owned_ids), lost_ids
+
     def get_food_related_reviews(self, limit=None):
         """
         取得食物相關的評論
@@ -145,16 +892,16 @@ class ReviewAnalysisManager(DatabaseManager):
         Returns:
             list: 評論列表 [(id, content), ...]
         """
-        query = """
+        query = f"""
             SELECT id, content
             FROM review_analysis
-            WHERE is_project_related = TRUE
-                AND has_specific_food_mention IS NULL
+            WHERE {PENDING_CONDITIONS['specific_food']}
             ORDER BY id
         """
 
         if limit:
-            query += f" LIMIT {limit}"
+            query += " LIMIT %s"
+            return self.execute_query(query, (int(limit),))
 
         return self.execute_query(query)
 
@@ -168,125 +915,665 @@ class ReviewAnalysisManager(DatabaseManager):
         Returns:
             list: 評論列表 [(id, content), ...]
         """
-        query = """
+        query = f"""
             SELECT id, content
             FROM review_analysis
-            WHERE is_project_related IS NULL
+            WHERE {PENDING_CONDITIONS['food_relevance']}
             ORDER BY id
         """
 
         if limit:
-            query += f" LIMIT {limit}"
+            query += " LIMIT %s"
+            return self.execute_query(query, (int(limit),))
 
         return self.execute_query(query)
 
-    def update_food_relevance(self, review_id, is_food_related):
+    def update_food_relevance(self, review_id, is_food_related, source=None):
         """
         更新食物相關性
 
         Args:
             review_id (int): 評論 ID
             is_food_related (bool): 是否與食物相關
+            source (str): 標記來源，須為 LABEL_SOURCES 之一
 
         Returns:
             int: 受影響的行數
         """
-        query = """
-            UPDATE review_analysis
-            SET is_project_related = %s
-            WHERE id = %s
-        """
-        return self.execute_update(query, (is_food_related, review_id))
+        return self.bulk_update_labels('is_project_related', [(is_food_related, review_id)], source=source)
 
-    def update_specific_food_mention(self, review_id, has_specific_mention):
+    def update_specific_food_mention(self, review_id, has_specific_mention, source=None):
         """
         更新具體食物提及狀況
 
         Args:
             review_id (int): 評論 ID
             has_specific_mention (bool): 是否提到具體食物
+            source (str): 標記來源，須為 LABEL_SOURCES 之一
 
         Returns:
             int: 受影響的行數
         """
-        query = """
-            UPDATE review_analysis
-            SET has_specific_food_mention = %s
-            WHERE id = %s
-        """
-        return self.execute_update(query, (has_specific_mention, review_id))
+        return self.bulk_update_labels('has_specific_food_mention', [(has_specific_mention, review_id)], source=source)
 
-    def batch_update_food_relevance(self, updates):
+    def batch_update_food_relevance(self, updates, source=None):
         """
         批次更新食物相關性
 
         Args:
             updates (list): 更新列表 [(is_food_related, review_id), ...]
+            source (str): 標記來源，須為 LABEL_SOURCES 之一
 
         Returns:
             int: 受影響的行數
         """
-        query = """
-            UPDATE review_analysis
-            SET is_project_related = %s
-            WHERE id = %s
-        """
-        return self.execute_batch_update(query, updates)
+        return self.bulk_update_labels('is_project_related', updates, source=source)
 
-    def batch_update_specific_food_mention(self, updates):
+    def batch_update_specific_food_mention(self, updates, source=None):
         """
         批次更新具體食物提及狀況
 
         Args:
             updates (list): 更新列表 [(has_specific_mention, review_id), ...]
+            source (str): 標記來源，須為 LABEL_SOURCES 之一
+
+        Returns:
+            int: 受影響的行數
+        """
+        return self.bulk_update_labels('has_specific_food_mention', updates, source=source)
+
+    def batch_mark_food_items_extracted(self, review_ids, connection=None):
+        """
+        批次標記評論已完成結構化提取
+
+        Args:
+            review_ids (list): 評論 ID 列表
+            connection: 現有的資料庫連接（與項目寫入共用交易時傳入）
 
         Returns:
             int: 受影響的行數
         """
+        updates = [(True, review_id) for review_id in review_ids]
+        return self.bulk_update_labels('is_food_items_extracted', updates, connection=connection)
+
+    def insert_extracted_food_items(self, rows, connection=None):
+        """
+        批次寫入提取的食物項目
+
+        Args:
+            rows (list): [(review_id, item), ...]，item 為提取結果字典
+            connection: 現有的資料庫連接（與標記更新共用交易時傳入）
+
+        Returns:
+            int: 寫入的項目數
+        """
+        params_list = [
+            (
+                review_id,
+                item.get('dish_name'),
+                item.get('vendor_name'),
+                item.get('description'),
+                item.get('price'),
+                item.get('rating_sentiment'),
+                item.get('data_completeness') or 'partial'
+            )
+            for review_id, item in rows
+        ]
+        if not params_list:
+            return 0
+
         query = """
-            UPDATE review_analysis
-            SET has_specific_food_mention = %s
-            WHERE id = %s
+            INSERT INTO extracted_food_items
+            (review_id, dish_name, vendor_name, description, price, rating_sentiment, data_completeness)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
         """
-        return self.execute_batch_update(query, updates)
+        if connection is not None:
+            with self.get_cursor(connection) as cursor:
+                cursor.executemany(query, params_list)
+            return len(params_list)
 
-    def get_analysis_statistics(self):
+        return self.execute_batch_update(query, params_list)
+
+    def save_extraction_batch(self, results):
         """
-        取得分析統計資訊
+        在單一交易中寫入一批評論的提取項目並標記已提取
+
+        Args:
+            results (list): [(review_id, items), ...]，沒有項目的評論 items 為空列表
 
         Returns:
-            dict: 統計資訊
+            dict: 標記的評論數與寫入的項目數
         """
-        # 基礎統計
-        total_query = "SELECT COUNT(*) FROM review_analysis"
-        total_count = self.execute_query(total_query, fetch_all=False)[0]
+        review_ids = [review_id for review_id, _ in results]
+        item_rows = [(review_id, item) for review_id, items in results for item in items]
+        if not review_ids:
+            return {'reviews': 0, 'items': 0}
 
-        # 食物相關性統計
-        food_stats_query = """
-            SELECT
-                is_project_related,
-                COUNT(*) as count
+        with self.get_connection() as conn:
+            try:
+                items_written = self.insert_extracted_food_items(item_rows, connection=conn)
+                self.batch_mark_food_items_extracted(review_ids, connection=conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        return {'reviews': len(review_ids), 'items': items_written}
+
+    def apply_lexicon_labels(self, review_ids):
+        """
+        將詞彙比對命中的評論標記為食物相關且具體提及（單一交易）
+
+        Args:
+            review_ids (list): 評論 ID 列表
+
+        Returns:
+            int: 標記的評論數
+        """
+        if not review_ids:
+            return 0
+
+        with self.get_connection() as conn:
+            try:
+                self.bulk_update_labels('is_project_related', [(True, rid) for rid in review_ids], connection=conn,
+                                        source=LABEL_SOURCE_LEXICON)
+                self.bulk_update_labels('has_specific_food_mention', [(True, rid) for rid in review_ids],
+                                        connection=conn, source=LABEL_SOURCE_LEXICON)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        return len(review_ids)
+
+    def save_fused_results(self, results):
+        """
+        在單一交易中寫入融合判別的三個階段結果
+
+        食物相關性一律寫入；具體提及只寫入食物相關的評論；具體提及的評論
+        寫入提取項目並標記已提取。任何一步失敗時整批回滾。
+
+        Args:
+            results (list): [(review_id, is_food_related, has_specific_food, items), ...]
+
+        Returns:
+            dict: {'reviews': 寫入的評論數, 'food_related': 食物相關評論數,
+                'specific_food': 具體提及食物的評論數, 'items': 寫入的項目數}
+        """
+        relevance = [(is_food, review_id) for review_id, is_food, _, _ in results]
+        specific = [(has_specific, review_id) for review_id, is_food, has_specific, _ in results if is_food]
+        extracted = [review_id for review_id, is_food, has_specific, _ in results if is_food and has_specific]
+        item_rows = [(review_id, item) for review_id, is_food, has_specific, items in results
+                     if is_food and has_specific for item in items]
+
+        with self.get_connection() as conn:
+            try:
+                if relevance:
+                    self.bulk_update_labels('is_project_related', relevance, connection=conn,
+                                            source=LABEL_SOURCE_GEMINI)
+                if specific:
+                    self.bulk_update_labels('has_specific_food_mention', specific, connection=conn,
+                                            source=LABEL_SOURCE_GEMINI)
+                items_written = self.insert_extracted_food_items(item_rows, connection=conn)
+                if extracted:
+                    self.batch_mark_food_items_extracted(extracted, connection=conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        return {
+            'reviews': len(relevance),
+            'food_related': len(specific),
+            'specific_food': len(extracted),
+            'items': items_written
+        }
+
+    def bulk_update_labels(self, column, updates, connection=None, source=None):
+        """
+        以 VALUES ROW(...) 衍生表 JOIN 集合式批次更新 review_analysis 的標記欄位（見 bulk_update_column）
+
+        有來源欄位的標記（LABEL_SOURCE_COLUMNS）在同一交易中寫入 source。
+
+        Args:
+            column (str): 標記欄位，須為 LABEL_COLUMNS 之一
+            updates (list): 更新列表 [(label, review_id), ...]
+            connection: 現有的資料庫連接，如為 None 則自動建立並提交
+            source (str): 標記來源，須為 LABEL_SOURCES 之一；None 表示來源未知（不列入本地分類器訓練）
+
+        Returns:
+            int: 受影響的行數
+        """
+        if column not in LABEL_COLUMNS:
+            raise ValueError(f"不支援的標記欄位: {column}")
+        _validate_label_source(source)
+
+        if not updates:
+            return 0
+
+        if connection is None:
+            with self.get_connection() as conn:
+                try:
+                    affected = self.bulk_update_labels(column, updates, connection=conn, source=source)
+                    conn.commit()
+                    return affected
+                except Exception:
+                    conn.rollback()
+                    raise
+
+        if self.maintain_counters:
+            affected = self._update_labels_with_counters(connection, column, updates)
+        else:
+            affected = self.bulk_update_column('review_analysis', column, updates, connection=connection)
+        self._update_label_sources(connection, column, updates, source)
+        return affected
+
+    def _update_label_sources(self, conn, column, updates, source):
+        """在同一交易中寫入標記來源（沒有來源欄位的標記略過）"""
+        if column not in LABEL_SOURCE_COLUMNS:
+            return
+
+        review_ids = list(dict.fromkeys(review_id for _, review_id in updates))
+        with _label_source_required(), self.get_cursor(conn) as cursor:
+            for start in range(0, len(review_ids), BULK_UPDATE_CHUNK_SIZE):
+                cursor.execute(*_label_source_statement(
+                    column, source, review_ids[start:start + BULK_UPDATE_CHUNK_SIZE]
+                ))
+
+    def _update_labels_with_counters(self, conn, column, updates):
+        """在同一交易中更新標記並依舊值與新值調整計數器"""
+        latest = {}
+        for label, review_id in updates:
+            latest[review_id] = label
+        if not latest:
+            return 0
+
+        deltas = Counter()
+        review_ids = list(latest)
+        with self.get_cursor(conn) as cursor:
+            # 鎖定目標列並讀取舊值，計算每個標記值的增減量
+            for start in range(0, len(review_ids), BULK_UPDATE_CHUNK_SIZE):
+                chunk = review_ids[start:start + BULK_UPDATE_CHUNK_SIZE]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(
+                    f"SELECT id, {column} FROM review_analysis WHERE id IN ({placeholders}) FOR UPDATE",
+                    chunk
+                )
+                deltas.update(_counter_deltas(column, cursor.fetchall(), latest))
+
+        affected = self.bulk_update_column(
+            'review_analysis', column, [(label, review_id) for review_id, label in latest.items()],
+            connection=conn
+        )
+        self._apply_counter_deltas(conn, deltas)
+        return affected
+
+    def _apply_counter_deltas(self, conn, deltas):
+        """將計數器增減量寫入 review_analysis_counters 的一個隨機分片"""
+        statement = _counter_upsert_statement(deltas)
+        if statement is None:
+            return
+
+        with self.get_cursor(conn) as cursor:
+            cursor.execute(*statement)
+
+    def get_sync_high_water_mark(self):
+        """
+        取得已同步到 review_analysis 的最大 reviews.id
+
+        Returns:
+            int: 高水位標記，尚未同步任何評論時為 0
+        """
+        row = self.execute_query(
+            "SELECT COALESCE(MAX(review_id), 0) FROM review_analysis",
+            fetch_all=False
+        )
+        return int(row[0] or 0)
+
+    def sync_new_reviews(self, after_review_id, batch_size=1000):
+        """
+        將 reviews.id 大於高水位標記的一段非空評論複製到 review_analysis
+
+        以 reviews.id 範圍分段，每段一個交易；已存在的 review_id 會略過，
+        重複執行或同時執行不會產生重複資料。
+
+        Args:
+            after_review_id (int): 高水位標記（不含）
+            batch_size (int): 每段掃描的 reviews 筆數
+
+        Returns:
+            tuple: (新增筆數, 本段最大 reviews.id)，沒有新評論時為 (0, after_review_id)
+        """
+        with self.get_connection() as conn:
+            with self.get_cursor(conn) as cursor:
+                try:
+                    cursor.execute("""
+                        SELECT MAX(id)
+                        FROM (
+                            SELECT id FROM reviews WHERE id > %s ORDER BY id LIMIT %s
+                        ) AS page
+                    """, (after_review_id, batch_size))
+                    upper = cursor.fetchone()[0]
+                    if upper is None:
+                        conn.rollback()
+                        return 0, after_review_id
+
+                    cursor.execute("""
+                        INSERT INTO review_analysis (review_id, content)
+                        SELECT r.id, r.snippet
+                        FROM reviews r
+                        WHERE r.id > %s AND r.id <= %s
+                            AND r.snippet IS NOT NULL
+                            AND TRIM(r.snippet) != ''
+                            AND NOT EXISTS (
+                                SELECT 1 FROM review_analysis ra WHERE ra.review_id = r.id
+                            )
+                        ORDER BY r.id
+                    """, (after_review_id, upper))
+                    inserted = cursor.rowcount
+
+                    if self.maintain_counters and inserted > 0:
+                        deltas = Counter({'total': inserted})
+                        for column in LABEL_COLUMNS:
+                            deltas[_counter_key(column, None)] += inserted
+                        self._apply_counter_deltas(conn, deltas)
+
+                    conn.commit()
+                    return inserted, upper
+                except Exception:
+                    conn.rollback()
+                    raise
+
+    def iter_changed_content(self, batch_size=1000, edited_since=None):
+        """
+        逐頁產生內容與 reviews.snippet 不一致的評論
+
+        Args:
+            batch_size (int): 每頁數量
+            edited_since (str): 只檢查 iso_date_of_last_edit 在此時間之後的評論，None 表示全部
+
+        Yields:
+            list: [(review_analysis.id, 新內容), ...]
+        """
+        conditions = [
+            "r.snippet IS NOT NULL",
+            "TRIM(r.snippet) != ''",
+            "NOT (ra.content <=> r.snippet)"
+        ]
+        params = []
+        if edited_since is not None:
+            conditions.append("r.iso_date_of_last_edit >= %s")
+            params.append(edited_since)
+
+        return self.iter_keyset_pages(
+            select_clause="ra.id, r.snippet",
+            from_clause="review_analysis ra JOIN reviews r ON r.id = ra.review_id",
+            id_column="ra.id",
+            where_clause=" AND ".join(conditions),
+            params=params,
+            batch_size=batch_size
+        )
+
+    def refresh_review_content(self, changes):
+        """
+        更新被編輯評論的內容，並重設標記與已提取項目讓其重新進入管線
+
+        Args:
+            changes (list): [(review_analysis.id, 新內容), ...]
+
+        Returns:
+            int: 更新的評論數
+        """
+        if not changes:
+            return 0
+
+        review_ids = [review_id for review_id, _ in changes]
+        with self.get_connection() as conn:
+            try:
+                affected = self.bulk_update_column(
+                    'review_analysis', 'content',
+                    [(content, review_id) for review_id, content in changes],
+                    connection=conn
+                )
+                self.bulk_update_column(
+                    'review_analysis', 'content_hash',
+                    [(content_hash(content), review_id) for review_id, content in changes],
+                    connection=conn
+                )
+                for column in LABEL_COLUMNS:
+                    self.bulk_update_labels(
+                        column, [(None, review_id) for review_id in review_ids], connection=conn
+                    )
+
+                placeholders = ", ".join(["%s"] * len(review_ids))
+                with self.get_cursor(conn) as cursor:
+                    cursor.execute(
+                        f"DELETE FROM extracted_food_items WHERE review_id IN ({placeholders})",
+                        review_ids
+                    )
+
+                conn.commit()
+                return affected
+            except Exception:
+                conn.rollback()
+                raise
+
+    def backfill_content_hashes(self, batch_size=1000):
+        """
+        為 content_hash 為 NULL 的評論計算並寫入內容雜湊
+
+        Args:
+            batch_size (int): 每頁數量
+
+        Returns:
+            int: 寫入雜湊的評論數
+        """
+        total = 0
+        pages = self.iter_keyset_pages(
+            select_clause="id, content",
+            from_clause="review_analysis",
+            id_column="id",
+            where_clause="content_hash IS NULL AND content IS NOT NULL",
+            batch_size=batch_size
+        )
+        for rows in pages:
+            updates = [(content_hash(content), review_id) for review_id, content in rows]
+            self.bulk_update_column('review_analysis', 'content_hash', updates)
+            total += len(updates)
+        return total
+
+    def fan_out_labels(self, stage, content_hashes=None):
+        """
+        將已判別評論的標記以單一集合式 UPDATE 套用到相同內容雜湊的待處理評論
+
+        同一雜湊下已判別的標記不一致時不套用，交由 LLM 個別判別。
+
+        Args:
+            stage (str): 處理階段 ('food_relevance', 'specific_food')
+            content_hashes (list): 只處理這些雜湊（通常是剛判別的代表評論），None 表示全部
+
+        擴散的標記來源記為 LABEL_SOURCE_FAN_OUT，不重複列入本地分類器訓練。
+
+        Returns:
+            int: 套用標記的評論數（省下的 LLM 判別次數）
+        """
+        if stage not in ('food_relevance', 'specific_food'):
+            raise ValueError(f"不支援標記擴散的處理階段: {stage}")
+
+        column = STAGE_LABEL_COLUMNS[stage]
+        hash_filter = ""
+        params = []
+        if content_hashes is not None:
+            content_hashes = sorted({digest for digest in content_hashes if digest})
+            if not content_hashes:
+                return 0
+            hash_filter = f"AND content_hash IN ({', '.join(['%s'] * len(content_hashes))})"
+            params = content_hashes
+
+        source = f"""
+            SELECT content_hash, MIN({column}) AS label
             FROM review_analysis
-            GROUP BY is_project_related
+            WHERE content_hash IS NOT NULL
+                AND {column} IS NOT NULL
+                {hash_filter}
+            GROUP BY content_hash
+            HAVING MIN({column}) = MAX({column})
         """
-        food_stats = self.execute_query(food_stats_query)
 
-        # 具體食物提及統計
-        specific_stats_query = """
+        if not self.maintain_counters:
+            with _label_source_required():
+                return self.execute_update(f"""
+                    UPDATE review_analysis t
+                    JOIN ({source}) AS s ON t.content_hash = s.content_hash
+                    SET t.{column} = s.label,
+                        t.{LABEL_SOURCE_COLUMNS[column]} = %s
+                    WHERE {PENDING_CONDITIONS[stage]}
+                """, params + [LABEL_SOURCE_FAN_OUT])
+
+        # 計數器模式：先找出目標列，再經由 bulk_update_labels 同步調整計數
+        rows = self.execute_query(f"""
+            SELECT t.id, s.label
+            FROM review_analysis t
+            JOIN ({source}) AS s ON t.content_hash = s.content_hash
+            WHERE {PENDING_CONDITIONS[stage]}
+        """, params)
+        self.bulk_update_labels(column, [(label, review_id) for review_id, label in rows], source=LABEL_SOURCE_FAN_OUT)
+        return len(rows)
+
+    def get_pipeline_statistics(self):
+        """
+        以單次條件聚合掃描取得所有處理階段的統計
+
+        Returns:
+            dict: {
+                'total_reviews': int,
+                '<標記欄位>': {'null': int, 'true': int, 'false': int},
+                'food_related_specific': {'null': int, 'true': int, 'false': int},
+                'pending': {'food_relevance': int, 'specific_food': int, 'extraction': int}
+            }
+        """
+        query = f"""
             SELECT
-                has_specific_food_mention,
-                COUNT(*) as count
+                COUNT(*),
+                SUM(is_project_related IS NULL),
+                SUM(is_project_related = TRUE),
+                SUM(is_project_related = FALSE),
+                SUM(has_specific_food_mention IS NULL),
+                SUM(has_specific_food_mention = TRUE),
+                SUM(has_specific_food_mention = FALSE),
+                SUM(is_food_items_extracted IS NULL),
+                SUM(is_food_items_extracted = TRUE),
+                SUM(is_food_items_extracted = FALSE),
+                SUM(is_project_related = TRUE AND has_specific_food_mention IS NULL),
+                SUM(is_project_related = TRUE AND has_specific_food_mention = TRUE),
+                SUM(is_project_related = TRUE AND has_specific_food_mention = FALSE),
+                SUM({PENDING_CONDITIONS['extraction']})
             FROM review_analysis
-            WHERE is_project_related = TRUE
-            GROUP BY has_specific_food_mention
         """
-        specific_stats = self.execute_query(specific_stats_query)
+        row = [int(value or 0) for value in self.execute_query(query, fetch_all=False)]
+
+        stats = {'total_reviews': row[0]}
+        for offset, column in enumerate(LABEL_COLUMNS):
+            base = 1 + offset * 3
+            stats[column] = {'null': row[base], 'true': row[base + 1], 'false': row[base + 2]}
+
+        stats['food_related_specific'] = {'null': row[10], 'true': row[11], 'false': row[12]}
+        stats['pending'] = {
+            'food_relevance': stats['is_project_related']['null'],
+            'specific_food': row[10],
+            'extraction': row[13]
+        }
+        return stats
+
+    def get_analysis_statistics(self):
+        """
+        取得分析統計資訊（由單次掃描的 get_pipeline_statistics 轉換）
+
+        Returns:
+            dict: 統計資訊
+        """
+        stats = self.get_pipeline_statistics()
+
+        def as_rows(counts):
+            # 維持原 GROUP BY 的 [(值, 數量), ...] 格式，省略數量為 0 的值
+            rows = [(None, counts['null']), (1, counts['true']), (0, counts['false'])]
+            return [(value, count) for value, count in rows if count]
 
         return {
-            'total_reviews': total_count,
-            'food_relevance_stats': food_stats,
-            'specific_food_stats': specific_stats
+            'total_reviews': stats['total_reviews'],
+            'food_relevance_stats': as_rows(stats['is_project_related']),
+            'specific_food_stats': as_rows(stats['food_related_specific'])
+        }
+
+    def refresh_counters(self):
+        """
+        以一次全表掃描重建 review_analysis_counters
+
+        Returns:
+            dict: 重建後的計數器 {counter_key: count}
+        """
+        stats = self.get_pipeline_statistics()
+        counters = {'total': stats['total_reviews']}
+        for column in LABEL_COLUMNS:
+            for state, count in stats[column].items():
+                counters[f"{column}:{state}"] = count
+
+        # 清除所有分片後以分片 0 寫入掃描結果
+        placeholders = ", ".join(["(%s, 0, %s)"] * len(counters))
+        params = [item for pair in counters.items() for item in pair]
+        with self.get_connection() as conn:
+            with self.get_cursor(conn) as cursor:
+                try:
+                    cursor.execute("DELETE FROM review_analysis_counters")
+                    cursor.execute(f"""
+                        INSERT INTO review_analysis_counters (counter_key, shard, count)
+                        VALUES {placeholders}
+                    """, params)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+        return counters
+
+    def get_counter_statistics(self):
+        """
+        從 review_analysis_counters 讀取進度，不掃描 review_analysis
+
+        待處理數量由各欄位計數推算（假設標記依管線順序寫入）。
+
+        Returns:
+            dict: 與 get_pipeline_statistics 相同的 total_reviews、標記欄位與 pending 結構
+        """
+        keys = ['total'] + [
+            f"{column}:{state}" for column in LABEL_COLUMNS for state in ('null', 'true', 'false')
+        ]
+        placeholders = ", ".join(["%s"] * len(keys))
+        rows = self.execute_query(
+            f"""
+                SELECT counter_key, SUM(count)
+                FROM review_analysis_counters
+                WHERE counter_key IN ({placeholders})
+                GROUP BY counter_key
+            """,
+            keys
+        )
+        counters = {key: int(count) for key, count in rows}
+
+        stats = {'total_reviews': counters.get('total', 0)}
+        for column in LABEL_COLUMNS:
+            stats[column] = {
+                state: counters.get(f"{column}:{state}", 0) for state in ('null', 'true', 'false')
+            }
+
+        relevance = stats['is_project_related']
+        specific = stats['has_specific_food_mention']
+        extracted = stats['is_food_items_extracted']
+        stats['pending'] = {
+            'food_relevance': relevance['null'],
+            'specific_food': max(relevance['true'] - specific['true'] - specific['false'], 0),
+            'extraction': max(specific['true'] - extracted['true'], 0)
         }
+        return stats
 
     def get_sample_reviews(self, category='all', limit=5):
         """
@@ -0,0 +1,233 @@
+"""
+本地 fake Gemini 批次伺服器
+
+實作 BatchApiClient 使用的 Batch API 端點（可續傳上傳、batchGenerateContent、
+作業查詢、結果下載），作業建立 delay 秒後才會完成，用於不連網、不消耗配額
+測試離線批次流程（建立、送出、輪詢、合併與中斷續傳）。
+
+回應由 responder(prompt, generation_config) 產生；預設依人工詞彙檔與簡單關鍵字
+回答結構化批次格式 [{"id": 評論 id, "answer": true/false}]，不代表實際判別品質。
+"""
+
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.lexicon_matcher import FoodLexicon
+
+_REVIEW_PATTERN = re.compile(r'評論 id=(\d+)：「(.*?)」', re.S)
+_FOOD_KEYWORDS = ('吃', '食', '味', '餐', '飲', '喝', '甜', '辣', '鹹')
+
+def create_default_responder():
+    """
+    建立預設的回應產生器
+
+    Returns:
+        callable: responder(prompt, generation_config) -> 回應文字
+    """
+    lexicon = FoodLexicon()
+    lexicon.load_curated()
+
+    def responder(prompt, generation_config):
+        answers = []
+        for review_id, content in _REVIEW_PATTERN.findall(prompt):
+            answer = bool(lexicon.match(content)) or any(keyword in content for keyword in _FOOD_KEYWORDS)
+            answers.append({'id': int(review_id), 'answer': answer})
+        return json.dumps(answers, ensure_ascii=False)
+
+    return responder
+
+class FakeBatchServer:
+    """在背景執行緒中執行的 fake 批次伺服器"""
+
+    def __init__(self, host='127.0.0.1', port=0, delay=2.0, error_rate=0.0, responder=None, seed=0):
+        """
+        初始化伺服器
+
+        Args:
+            host (str): 監聽位址
+            port (int): 監聽埠號，0 表示自動選擇
+            delay (float): 作業建立後幾秒才完成
+            error_rate (float): 每個請求回傳錯誤的機率（測試部分失敗的合併）
+            responder (callable): 回應產生器，預設為 create_default_responder()
+            seed (int): 錯誤注入的亂數種子
+        """
+        self.delay = delay
+        self.error_rate = error_rate
+        self.responder = responder or create_default_responder()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._files = {}
+        self._uploads = {}
+        self._batches = {}
+        self._counter = 0
+        self._thread = None
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                server._handle(self, 'POST')
+
+            def do_GET(self):
+                server._handle(self, 'GET')
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+
+    @property
+    def base_url(self):
+        """伺服器位址，例如 http://127.0.0.1:8765"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """在背景執行緒啟動伺服器"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def serve_forever(self):
+        """在目前執行緒執行伺服器（Ctrl+C 結束）"""
+        self.httpd.serve_forever()
+
+    def stop(self):
+        """停止伺服器"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _next_id(self, prefix):
+        """產生資源名稱"""
+        with self._lock:
+            self._counter += 1
+            return f"{prefix}{self._counter}"
+
+    def _handle(self, handler, method):
+        """依路徑分派請求"""
+        path = urllib.parse.urlparse(handler.path).path
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length) if length else b''
+
+        try:
+            if method == 'POST' and path == '/upload/v1beta/files':
+                self._start_upload(handler)
+            elif method == 'POST' and path.startswith('/upload/v1beta/files/sessions/'):
+                self._finish_upload(handler, path.rsplit('/', 1)[-1], body)
+            elif method == 'POST' and path.startswith('/v1beta/models/') and path.endswith(':batchGenerateContent'):
+                self._create_batch(handler, path[len('/v1beta/models/'):-len(':batchGenerateContent')], body)
+            elif method == 'GET' and path.startswith('/v1beta/batches/'):
+                self._get_batch(handler, path[len('/v1beta/'):])
+            elif method == 'GET' and path.startswith('/download/v1beta/files/') and path.endswith(':download'):
+                self._download(handler, path[len('/download/v1beta/'):-len(':download')])
+            else:
+                self._send_json(handler, 404, {'error': {'code': 404, 'message': f"未知的路徑: {path}"}})
+        except KeyError as e:
+            self._send_json(handler, 404, {'error': {'code': 404, 'message': f"找不到資源: {e}"}})
+        except ValueError as e:
+            self._send_json(handler, 400, {'error': {'code': 400, 'message': str(e)}})
+
+    def _send_json(self, handler, status, payload, headers=None):
+        """回傳 JSON 回應"""
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _start_upload(self, handler):
+        """可續傳上傳：建立上傳工作階段"""
+        if handler.headers.get('X-Goog-Upload-Command') != 'start':
+            raise ValueError("缺少 X-Goog-Upload-Command: start")
+        session_id = self._next_id('session-')
+        self._uploads[session_id] = True
+        self._send_json(handler, 200, {}, {
+            'X-Goog-Upload-URL': f"{self.base_url}/upload/v1beta/files/sessions/{session_id}"
+        })
+
+    def _finish_upload(self, handler, session_id, body):
+        """可續傳上傳：接收檔案內容"""
+        self._uploads.pop(session_id)
+        name = self._next_id('files/input-')
+        self._files[name] = body
+        self._send_json(handler, 200, {'file': {'name': name, 'sizeBytes': str(len(body)), 'state': 'ACTIVE'}})
+
+    def _create_batch(self, handler, model_name, body):
+        """建立批次作業"""
+        batch = json.loads(body)['batch']
+        file_name = batch['input_config']['file_name']
+        if file_name not in self._files:
+            raise KeyError(file_name)
+
+        name = self._next_id('batches/')
+        self._batches[name] = {
+            'model': model_name,
+            'input': file_name,
+            'display_name': batch.get('display_name'),
+            'ready_at': time.time() + self.delay,
+            'output': None
+        }
+        self._send_json(handler, 200, {'name': name, 'metadata': {'state': 'BATCH_STATE_PENDING'}})
+
+    def _get_batch(self, handler, name):
+        """查詢作業狀態，到期時產生結果檔"""
+        batch = self._batches[name]
+        if time.time() < batch['ready_at']:
+            self._send_json(handler, 200, {'name': name, 'metadata': {'state': 'BATCH_STATE_RUNNING'}})
+            return
+
+        with self._lock:
+            if batch['output'] is None:
+                batch['output'] = self._run_batch(self._files[batch['input']])
+        output = {'responsesFile': batch['output']}
+        self._send_json(handler, 200, {
+            'name': name,
+            'done': True,
+            'metadata': {'state': 'BATCH_STATE_SUCCEEDED', 'output': output},
+            'response': output
+        })
+
+    def _run_batch(self, data):
+        """逐行產生回應並存成結果檔"""
+        lines = []
+        for line in data.decode('utf-8').splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if self._random.random() < self.error_rate:
+                lines.append({'key': entry['key'], 'error': {'code': 500, 'message': 'fake error'}})
+                continue
+
+            request = entry['request']
+            prompt = ''.join(part.get('text', '') for part in request['contents'][0]['parts'])
+            text = self.responder(prompt, request.get('generation_config'))
+            lines.append({'key': entry['key'], 'response': {
+                'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}}]
+            }})
+
+        name = f"files/output-{len(self._files) + 1}"
+        self._files[name] = ''.join(json.dumps(line, ensure_ascii=False) + '\n' for line in lines).encode('utf-8')
+        return name
+
+    def _download(self, handler, name):
+        """下載檔案內容"""
+        data = self._files[name]
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'application/jsonl')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
@@ -8,18 +8,95 @@ import google.generativeai as genai
 import os
 import time
 from dotenv import load_dotenv
-from prompts.base_prompts import parse_batch_response, validate_batch_response
+from config import LLM_CACHE
+from utils.response_cache import ResponseCache
+from prompts.base_prompts import (
+    BATCH_RESPONSE_SCHEMA,
+    parse_batch_response,
+    parse_json_batch_response,
+    validate_batch_response
+)
+
+# 結構化批次輸出：要求以評論 id 為鍵的 JSON 陣列
+STRUCTURED_BATCH_CONFIG = {
+    'response_mime_type': 'application/json',
+    'response_schema': BATCH_RESPONSE_SCHEMA
+}
+
+def parse_single_result(result):
+    """
+    解析單則 Yes/No 回應
+
+    Args:
+        result (str): API 回應文字
+
+    Returns:
+        bool or None: True/False 的分析結果，或 None 表示解析失敗
+    """
+    if 'Yes' in result or 'yes' in result or 'YES' in result:
+        return True
+    elif 'No' in result or 'no' in result or 'NO' in result:
+        return False
+    else:
+        print(f"無法解析的單則回應: {result}")
+        return None
+
+def parse_batch_result(result, expected_count):
+    """
+    驗證並解析批次回應
+
+    Args:
+        result (str): API 回應文字
+        expected_count (int): 預期的回應數量
+
+    Returns:
+        list or None: 布林值列表，或 None 表示批次回應無法使用
+    """
+    # 驗證回應格式
+    is_valid, message = validate_batch_response(result, expected_count)
+    if not is_valid:
+        print(f"批次回應格式錯誤: {message}")
+        print(f"原始回應: {result}")
+        return None
+
+    # 解析批次回應
+    results = parse_batch_response(result, expected_count)
+
+    # 檢查結果數量
+    if len(results) != expected_count:
+        print(f"批次結果數量不符: 預期 {expected_count}，得到 {len(results)}")
+        return None
+
+    return results
+
+def parse_structured_batch_result(result, review_ids):
+    """
+    解析結構化批次回應
+
+    Args:
+        result (str): API 回應文字（JSON 陣列）
+        review_ids (list): 批次中的評論 id
+
+    Returns:
+        list or None: 與 review_ids 對應的布林值列表，或 None 表示批次回應無法使用
+    """
+    results, message = parse_json_batch_response(result, review_ids)
+    if results is None:
+        print(f"結構化批次回應錯誤: {message}")
+        print(f"原始回應: {result}")
+    return results
 
 class GeminiClient:
     """Gemini API 客戶端管理類別"""
 
-    def __init__(self, model_name='gemini-2.5-flash-lite', auto_load_env=True):
+    def __init__(self, model_name='gemini-2.5-flash-lite', auto_load_env=True, use_cache=None):
         """
         初始化 Gemini 客戶端
 
         Args:
             model_name (str): 使用的 Gemini 模型名稱
             auto_load_env (bool): 是否自動載入環境變數
+            use_cache (bool): 是否使用持久化回應快取，預設依 LLM_CACHE_ENABLED
         """
         if auto_load_env:
             load_dotenv()
@@ -28,6 +105,10 @@ class GeminiClient:
         self.model = None
         self._setup_api()
 
+        if use_cache is None:
+            use_cache = LLM_CACHE['enabled']
+        self.cache = ResponseCache(LLM_CACHE['path'], LLM_CACHE['max_entries']) if use_cache else None
+
     def _setup_api(self):
         """設定 Gemini API"""
         api_key = os.getenv('GEMINI_API_KEY')
@@ -37,18 +118,19 @@ class GeminiClient:
         genai.configure(api_key=api_key)
         self.model = genai.GenerativeModel(self.model_name)
 
-    def generate_content(self, prompt):
+    def generate_content(self, prompt, generation_config=None):
         """
         生成內容
 
         Args:
             prompt (str): 輸入的 prompt
+            generation_config (dict): 生成設定，例如 STRUCTURED_BATCH_CONFIG
 
         Returns:
             str: API 回應的文字內容
         """
         try:
-            response = self.model.generate_content(prompt)
+            response = self.model.generate_content(prompt, generation_config=generation_config)
             return response.text.strip()
         except Exception as e:
             raise Exception(f"Gemini API 呼叫錯誤: {e}")
@@ -65,15 +147,7 @@ class GeminiClient:
         """
         try:
             result = self.generate_content(prompt)
-
-            # 解析單則回應
-            if 'Yes' in result or 'yes' in result or 'YES' in result:
-                return True
-            elif 'No' in result or 'no' in result or 'NO' in result:
-                return False
-            else:
-                print(f"無法解析的單則回應: {result}")
-                return None
+            return parse_single_result(result)
 
         except Exception as e:
             print(f"單則分析錯誤: {e}")
@@ -92,40 +166,85 @@ class GeminiClient:
         """
         try:
             result = self.generate_content(prompt)
+            return parse_batch_result(result, expected_count)
 
-            # 驗證回應格式
-            is_valid, message = validate_batch_response(result, expected_count)
-            if not is_valid:
-                print(f"批次回應格式錯誤: {message}")
-                print(f"原始回應: {result}")
-                return None
+        except Exception as e:
+            print(f"批次分析錯誤: {e}")
+            return None
 
-            # 解析批次回應
-            results = parse_batch_response(result, expected_count)
+    def analyze_structured_batch(self, prompt, review_ids):
+        """
+        以結構化輸出批次分析內容
 
-            # 檢查結果數量
-            if len(results) != expected_count:
-                print(f"批次結果數量不符: 預期 {expected_count}，得到 {len(results)}")
-                return None
+        Args:
+            prompt (str): 結構化批次 prompt（structured=True 建立）
+            review_ids (list): 批次中的評論 id
 
-            return results
+        Returns:
+            list or None: 與 review_ids 對應的布林值列表，或 None 表示批次分析失敗
+        """
+        try:
+            result = self.generate_content(prompt, STRUCTURED_BATCH_CONFIG)
+            return parse_structured_batch_result(result, review_ids)
 
         except Exception as e:
-            print(f"批次分析錯誤: {e}")
+            print(f"結構化批次分析錯誤: {e}")
             return None
 
+    def get_cached_results(self, prompt_version, content_hashes):
+        """
+        逐則查詢快取的判別結果
+
+        Args:
+            prompt_version (str): prompt 版本，例如 'food_relevance@1.0'
+            content_hashes (list): 正規化內容雜湊列表
+
+        Returns:
+            list: 與 content_hashes 對應的結果，未命中（或未啟用快取）為 None
+        """
+        if self.cache is None:
+            return [None] * len(content_hashes)
+        return self.cache.get_many(self.model_name, prompt_version, content_hashes)
+
+    def cache_results(self, prompt_version, content_hashes, results):
+        """
+        寫入逐則判別結果，結果為 None 的項目不寫入
+
+        Args:
+            prompt_version (str): prompt 版本
+            content_hashes (list): 正規化內容雜湊列表
+            results (list): 與 content_hashes 對應的結果
+        """
+        if self.cache is None:
+            return
+        try:
+            self.cache.put_many(self.model_name, prompt_version, list(zip(content_hashes, results)))
+        except Exception as e:
+            # 快取只是節省呼叫次數，寫入失敗不影響處理流程
+            print(f"回應快取寫入失敗: {e}")
+
+    def get_cache_stats(self):
+        """
+        取得回應快取統計
+
+        Returns:
+            dict or None: 快取統計，未啟用快取時為 None
+        """
+        return self.cache.get_stats() if self.cache is not None else None
+
     def get_model_info(self):
         """取得模型資訊"""
         return {
             'model_name': self.model_name,
-            'api_configured': self.model is not None
+            'api_configured': self.model is not None,
+            'cache_enabled': self.cache is not None
         }
 
 class RateLimitedGeminiClient(GeminiClient):
     """帶有速率限制的 Gemini 客戶端"""
 
     def __init__(self, model_name='gemini-2.5-flash-lite',
-                 requests_per_minute=15, auto_load_env=True):
+                 requests_per_minute=15, auto_load_env=True, use_cache=None):
         """
         初始化帶速率限制的客戶端
 
@@ -133,8 +252,9 @@ class RateLimitedGeminiClient(GeminiClient):
             model_name (str): 使用的 Gemini 模型名稱
             requests_per_minute (int): 每分鐘最大請求數
             auto_load_env (bool): 是否自動載入環境變數
+            use_cache (bool): 是否使用持久化回應快取
         """
-        super().__init__(model_name, auto_load_env)
+        super().__init__(model_name, auto_load_env, use_cache)
         self.requests_per_minute = requests_per_minute
         self.min_interval = 60.0 / requests_per_minute
         self.last_request_time = 0
@@ -150,20 +270,10 @@ class RateLimitedGeminiClient(GeminiClient):
 
         self.last_request_time = time.time()
 
-    def generate_content(self, prompt):
-        """帶速率限制的內容生成"""
-        self._wait_if_needed()
-        return super().generate_content(prompt)
-
-    def analyze_single(self, prompt):
-        """帶速率限制的單則分析"""
-        self._wait_if_needed()
-        return super().analyze_single(prompt)
-
-    def analyze_batch(self, prompt, expected_count):
-        """帶速率限制的批次分析"""
+    def generate_content(self, prompt, generation_config=None):
+        """帶速率限制的內容生成（analyze_single / analyze_batch 也經由此方法，每次呼叫只等待一次）"""
         self._wait_if_needed()
-        return super().analyze_batch(prompt, expected_count)
+        return super().generate_content(prompt, generation_config)
 
 # 工廠函數
 def create_gemini_client(use_rate_limit=True, **kwargs):
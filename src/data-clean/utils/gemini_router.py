@@ -0,0 +1,459 @@
+"""
+多 API Key / 多模型 Gemini 路由
+
+GeminiClient 以 genai.configure 設定單一 GEMINI_API_KEY 與單一模型，一個 Key
+的免費配額就是整個管線的上限。RoutedGeminiClient 為每組 (API Key, 模型) 建立
+獨立的配額狀態（每分鐘請求數、每分鐘 token 數與每日請求數），每個請求送往
+目前剩餘配額最多的一組；收到 429 配額錯誤時暫停該組並立即改送其他組，每日
+配額用完的組合到隔天（太平洋時間）才會再使用。
+
+每日用量與最近一分鐘的請求紀錄保存在 GEMINI_QUOTA_STATE_PATH，重新執行時
+延續先前的用量，不會在配額已用完的 Key 上重複觸發 429。狀態檔以 Key 的雜湊
+識別，不保存 API Key 本身。
+
+GEMINI_API_KEYS 或 GEMINI_MODELS 設定多個值時，create_async_gemini_client
+會自動改用此客戶端，腳本不需修改。
+
+回應快取的鍵值為 (模型名稱, prompt 版本, 內容雜湊)，快取結果時無法得知每則結果
+由哪個模型回答，因此只路由到單一模型時使用快取；設定多個模型時停用回應快取。
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import google.ai.generativelanguage as glm
+from google.api_core import exceptions as google_exceptions
+from google.generativeai.types import content_types, generation_types
+from config import GEMINI_RATE_LIMITS, GEMINI_ROUTER
+from utils.async_gemini_client import (
+    MAX_RETRIES,
+    OUTPUT_TOKENS_PER_ITEM,
+    RETRY_BACKOFF_SECONDS,
+    AsyncGeminiClient,
+    AsyncRateLimiter
+)
+from utils.token_estimator import estimate_tokens
+
+# Gemini 每日配額於太平洋時間午夜重置
+QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')
+
+# 每分鐘配額錯誤後的最長暫停秒數，以及每幾個請求寫回一次狀態檔
+MAX_COOLDOWN_SECONDS = 60
+SAVE_EVERY_REQUESTS = 20
+
+STATE_FORMAT_VERSION = 1
+
+def parse_model_limits(spec):
+    """
+    解析個別模型的配額設定
+
+    Args:
+        spec (str): 例如 'gemini-2.5-flash=10/250000/250,gemini-2.0-flash=15/1000000/200'
+
+    Returns:
+        dict: {模型名稱: (RPM, TPM, RPD)}
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        try:
+            model_name, values = item.split('=', 1)
+            rpm, tpm, rpd = (int(value) for value in values.split('/'))
+        except ValueError:
+            raise ValueError(f"GEMINI_MODEL_LIMITS 格式錯誤: {item}（應為 模型=RPM/TPM/RPD）")
+        limits[model_name.strip()] = (rpm, tpm, rpd)
+    return limits
+
+def current_quota_day():
+    """目前的配額日（太平洋時間日期）"""
+    return datetime.now(QUOTA_TIMEZONE).date().isoformat()
+
+def is_daily_quota_error(error):
+    """429 錯誤是否為每日配額用完（例如 GenerateRequestsPerDayPerProjectPerModel）"""
+    message = str(error)
+    return 'PerDay' in message or 'per day' in message.lower()
+
+class KeyedGenerativeModel:
+    """
+    以指定 API Key 呼叫 GenerateContent 的模型
+
+    genai.GenerativeModel 只使用 genai.configure 的全域 API Key，此類別自行持有
+    GenerativeServiceAsyncClient，每組 (API Key, 模型) 使用獨立的連線與憑證。
+    """
+
+    def __init__(self, model_name, api_key):
+        """
+        初始化模型
+
+        Args:
+            model_name (str): 模型名稱，例如 'gemini-2.5-flash-lite'
+            api_key (str): API Key
+        """
+        self.model_name = model_name
+        self.api_key = api_key
+        self._async_client = None
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        """
+        生成內容（非同步客戶端在第一次呼叫時於目前的事件迴圈中建立）
+
+        Args:
+            prompt (str): 輸入的 prompt
+            generation_config (dict): 生成設定，例如 STRUCTURED_BATCH_CONFIG
+
+        Returns:
+            AsyncGenerateContentResponse: 與 genai.GenerativeModel 相同的回應物件（text、usage_metadata）
+        """
+        if self._async_client is None:
+            self._async_client = glm.GenerativeServiceAsyncClient(client_options={'api_key': self.api_key})
+
+        request = glm.GenerateContentRequest(
+            model=f"models/{self.model_name}",
+            contents=content_types.to_contents(prompt),
+            generation_config=generation_types.to_generation_config_dict(generation_config)
+        )
+        response = await self._async_client.generate_content(request)
+        return generation_types.AsyncGenerateContentResponse.from_response(response)
+
+class QuotaSlot:
+    """一組 (API Key, 模型) 的配額狀態"""
+
+    def __init__(self, api_key, model_name, requests_per_minute, tokens_per_minute, requests_per_day):
+        """
+        初始化配額狀態
+
+        Args:
+            api_key (str): API Key
+            model_name (str): 模型名稱
+            requests_per_minute (int): 每分鐘最大請求數
+            tokens_per_minute (int): 每分鐘最大 token 數
+            requests_per_day (int): 每日最大請求數
+        """
+        self.api_key = api_key
+        self.model_name = model_name
+        self.key_id = hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:8]
+        self.slot_id = f"{self.key_id}:{model_name}"
+        self.requests_per_day = requests_per_day
+        self.limiter = AsyncRateLimiter(requests_per_minute, tokens_per_minute)
+
+        self.day = current_quota_day()
+        self.requests_today = 0
+        self.tokens_today = 0
+        self.daily_exhausted = False
+        self.cooldown_until = 0.0
+        self.consecutive_errors = 0
+        self.stats = {'requests': 0, 'quota_errors': 0}
+
+        # 每組使用獨立的 API 客戶端，不經過 genai.configure 的全域設定
+        self.model = KeyedGenerativeModel(model_name, api_key)
+
+    def _roll_day(self):
+        """配額日改變時重置每日用量"""
+        today = current_quota_day()
+        if today != self.day:
+            self.day = today
+            self.requests_today = 0
+            self.tokens_today = 0
+            self.daily_exhausted = False
+
+    def is_available(self):
+        """今日是否仍有配額"""
+        self._roll_day()
+        return not self.daily_exhausted and self.requests_today < self.requests_per_day
+
+    def get_headroom(self):
+        """剩餘配額比例（每分鐘請求、每分鐘 token 與每日請求中較小者）"""
+        self._roll_day()
+        daily = 1 - self.requests_today / self.requests_per_day
+        return max(min(self.limiter.get_headroom(), daily), 0.0)
+
+    def record_request(self, tokens):
+        """記錄送出的請求"""
+        self._roll_day()
+        self.requests_today += 1
+        self.tokens_today += tokens
+        self.stats['requests'] += 1
+
+    def record_success(self, token_delta=0):
+        """記錄成功回應（以實際 token 數校正當日用量）"""
+        self.tokens_today += token_delta
+        self.consecutive_errors = 0
+
+    def record_quota_error(self, error):
+        """
+        記錄 429 配額錯誤：每日配額用完時停用到隔天，否則依連續錯誤次數暫停
+        """
+        self.stats['quota_errors'] += 1
+        if is_daily_quota_error(error):
+            self.daily_exhausted = True
+            return
+
+        cooldown = min(RETRY_BACKOFF_SECONDS * (2 ** self.consecutive_errors), MAX_COOLDOWN_SECONDS)
+        self.consecutive_errors += 1
+        self.cooldown_until = time.monotonic() + cooldown
+
+    def to_state(self):
+        """轉為可保存的狀態"""
+        return {
+            'day': self.day,
+            'requests': self.requests_today,
+            'tokens': self.tokens_today,
+            'exhausted': self.daily_exhausted,
+            'recent': self.limiter.get_recent_usage(),
+            'saved_at': time.time()
+        }
+
+    def load_state(self, state):
+        """載入先前保存的狀態（不同配額日的用量不載入）"""
+        if state.get('day') != current_quota_day():
+            return
+        self.day = state['day']
+        self.requests_today = state.get('requests', 0)
+        self.tokens_today = state.get('tokens', 0)
+        self.daily_exhausted = state.get('exhausted', False)
+
+        # 以牆上時間換算保存後經過的秒數，延續最近一分鐘的請求紀錄
+        elapsed = max(time.time() - state.get('saved_at', 0), 0)
+        self.limiter.preload([[age + elapsed, tokens] for age, tokens in state.get('recent', [])])
+
+class RoutedGeminiClient(AsyncGeminiClient):
+    """將請求分散到多組 API Key 與模型的非同步客戶端"""
+
+    def __init__(self, api_keys=None, models=None, model_name='gemini-2.5-flash-lite', max_concurrency=None,
+                 state_path=None, auto_load_env=True, use_cache=None):
+        """
+        初始化路由客戶端
+
+        Args:
+            api_keys (list): API Key 列表，預設依 GEMINI_API_KEYS（未設定時使用 GEMINI_API_KEY）
+            models (list): 模型列表，預設依 GEMINI_MODELS（未設定時使用 model_name）
+            model_name (str): 未設定模型列表時使用的模型
+            max_concurrency (int): 同時進行中的最大請求數，預設為 GEMINI_MAX_CONCURRENCY 乘以 Key 數
+            state_path (str): 配額狀態檔路徑，預設依 GEMINI_QUOTA_STATE_PATH
+            auto_load_env (bool): 是否自動載入環境變數
+            use_cache (bool): 是否使用持久化回應快取（只能用於單一模型，設定多個模型時預設停用）
+        """
+        self.api_keys = api_keys or GEMINI_ROUTER['api_keys'] or [os.getenv('GEMINI_API_KEY')]
+        self.models = models or GEMINI_ROUTER['models'] or [model_name]
+        self.state_path = state_path or GEMINI_ROUTER['state_path']
+        if not all(self.api_keys):
+            raise ValueError("請在 .env 檔案中設定 GEMINI_API_KEYS 或 GEMINI_API_KEY")
+
+        # 回應快取以實際回答的模型區分：多個模型時無法得知每則結果的模型，不使用快取
+        if len(self.models) > 1:
+            if use_cache:
+                raise ValueError("多模型路由無法依回答的模型快取結果，請設定單一模型或停用回應快取")
+            use_cache = False
+
+        super().__init__(
+            model_name=self.models[0],
+            max_concurrency=max_concurrency or GEMINI_RATE_LIMITS['max_concurrency'] * len(self.api_keys),
+            auto_load_env=auto_load_env,
+            use_cache=use_cache
+        )
+        self.requests_per_minute = sum(slot.limiter.requests_per_minute for slot in self.slots)
+        self.tokens_per_minute = sum(slot.limiter.tokens_per_minute for slot in self.slots)
+        self.router_stats = {'failovers': 0, 'quota_waits': 0, 'quota_wait_seconds': 0.0}
+        self._unsaved_requests = 0
+        self._load_state()
+
+    def _setup_api(self):
+        """為每組 (API Key, 模型) 建立獨立的客戶端與配額狀態"""
+        model_limits = parse_model_limits(GEMINI_ROUTER['model_limits'])
+        default_limits = (GEMINI_RATE_LIMITS['requests_per_minute'], GEMINI_RATE_LIMITS['tokens_per_minute'],
+                          GEMINI_ROUTER['requests_per_day'])
+
+        self.slots = []
+        for model_name in self.models:
+            for api_key in self.api_keys:
+                self.slots.append(QuotaSlot(api_key, model_name, *model_limits.get(model_name, default_limits)))
+        self.model = self.slots[0].model
+
+    def _load_state(self):
+        """載入配額狀態檔"""
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"配額狀態檔讀取失敗，從零開始計算: {e}")
+            return
+
+        if state.get('format') != STATE_FORMAT_VERSION:
+            return
+        for slot in self.slots:
+            if slot.slot_id in state.get('slots', {}):
+                slot.load_state(state['slots'][slot.slot_id])
+
+    def save_state(self):
+        """
+        寫回配額狀態檔（保留檔案中其他 Key 與模型的狀態）
+
+        同一台主機上的多個程序共用狀態檔時以最後寫入者為準。
+        """
+        state = {'format': STATE_FORMAT_VERSION, 'slots': {}}
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, encoding='utf-8') as f:
+                    previous = json.load(f)
+                if previous.get('format') == STATE_FORMAT_VERSION:
+                    state['slots'].update(previous.get('slots', {}))
+            except (OSError, ValueError):
+                pass
+
+        for slot in self.slots:
+            state['slots'][slot.slot_id] = slot.to_state()
+
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(temp_path, self.state_path)
+        self._unsaved_requests = 0
+
+    def close(self):
+        """停止背景事件迴圈並寫回配額狀態"""
+        super().close()
+        try:
+            self.save_state()
+        except OSError as e:
+            print(f"配額狀態檔寫入失敗: {e}")
+
+    def _select_slot(self, tokens):
+        """
+        選擇可最快送出且剩餘配額最多的一組
+
+        Returns:
+            tuple: (QuotaSlot, 需等待秒數)，所有組合的每日配額都用完時為 (None, None)
+        """
+        now = time.monotonic()
+        best = None
+        for slot in self.slots:
+            if not slot.is_available():
+                continue
+            wait = max(slot.cooldown_until - now, slot.limiter.wait_time(tokens), 0.0)
+            score = (wait, -slot.get_headroom())
+            if best is None or score < best[0]:
+                best = (score, slot)
+
+        if best is None:
+            return None, None
+        return best[1], best[0][0]
+
+    async def _acquire_slot(self, tokens):
+        """
+        取得一組配額並登記請求
+
+        Returns:
+            tuple: (QuotaSlot, 限制器紀錄)
+        """
+        while True:
+            slot, wait = self._select_slot(tokens)
+            if slot is None:
+                raise Exception("所有 API Key 與模型的每日配額都已用完")
+
+            # 全部組合都在暫停中時等待最早恢復的一組，期間其他組恢復也會重新選擇
+            cooldown = slot.cooldown_until - time.monotonic()
+            if cooldown > 0:
+                self.router_stats['quota_waits'] += 1
+                self.router_stats['quota_wait_seconds'] += cooldown
+                await asyncio.sleep(cooldown)
+                continue
+
+            entry = await slot.limiter.acquire(tokens)
+            slot.record_request(tokens)
+            return slot, entry
+
+    async def generate_content_async(self, prompt, expected_output_tokens=OUTPUT_TOKENS_PER_ITEM,
+                                     generation_config=None):
+        """
+        送往剩餘配額最多的一組 (API Key, 模型)，429 時改送其他組
+
+        Args:
+            prompt (str): 輸入的 prompt
+            expected_output_tokens (int): 預估的回應 token 數
+            generation_config (dict): 生成設定，例如 STRUCTURED_BATCH_CONFIG
+
+        Returns:
+            str: API 回應的文字內容
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        estimated = estimate_tokens(prompt) + expected_output_tokens
+        max_attempts = MAX_RETRIES + len(self.slots)
+        for attempt in range(max_attempts):
+            slot, entry = await self._acquire_slot(estimated)
+            response = None
+            async with self._semaphore:
+                try:
+                    response = await slot.model.generate_content_async(
+                        prompt, generation_config=generation_config
+                    )
+                except google_exceptions.ResourceExhausted as e:
+                    slot.record_quota_error(e)
+                    if attempt == max_attempts - 1:
+                        raise Exception(f"Gemini API 配額不足: {e}")
+                except Exception as e:
+                    raise Exception(f"Gemini API 呼叫錯誤 ({slot.slot_id}): {e}")
+
+            if response is None:
+                self.router_stats['failovers'] += 1
+                continue
+
+            token_delta = 0
+            usage = getattr(response, 'usage_metadata', None)
+            if usage is not None and getattr(usage, 'total_token_count', 0):
+                token_delta = usage.total_token_count - entry[1]
+                slot.limiter.record_usage(entry, usage.total_token_count)
+            slot.record_success(token_delta)
+
+            self._unsaved_requests += 1
+            if self._unsaved_requests >= SAVE_EVERY_REQUESTS:
+                try:
+                    self.save_state()
+                except OSError as e:
+                    print(f"配額狀態檔寫入失敗: {e}")
+            return response.text.strip()
+
+    def get_rate_stats(self):
+        """
+        取得所有組合的合計統計與各組用量
+
+        Returns:
+            dict: 與 AsyncGeminiClient.get_rate_stats 相同的欄位，另含 failovers 與 slots
+        """
+        stats = {'requests': 0, 'tokens': 0, 'throttled': 0, 'wait_seconds': 0.0}
+        slots = []
+        for slot in self.slots:
+            for key in stats:
+                stats[key] += slot.limiter.stats[key]
+            slots.append({
+                'slot': slot.slot_id,
+                'requests': slot.stats['requests'],
+                'quota_errors': slot.stats['quota_errors'],
+                'requests_today': slot.requests_today,
+                'requests_per_day': slot.requests_per_day,
+                'exhausted': not slot.is_available()
+            })
+
+        stats['throttled'] += self.router_stats['quota_waits']
+        stats['wait_seconds'] += self.router_stats['quota_wait_seconds']
+        stats.update({
+            'requests_per_minute': self.requests_per_minute,
+            'tokens_per_minute': self.tokens_per_minute,
+            'max_concurrency': self.max_concurrency,
+            'failovers': self.router_stats['failovers'],
+            'slots': slots
+        })
+        return stats
+
+def is_routing_configured():
+    """是否設定了多個 API Key 或模型"""
+    return len(GEMINI_ROUTER['api_keys']) > 1 or len(GEMINI_ROUTER['models']) > 1
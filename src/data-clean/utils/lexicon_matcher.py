@@ -0,0 +1,209 @@
+"""
+食物詞彙比對工具
+
+以 Aho-Corasick 自動機在單次掃描中比對評論內容與所有已知的料理、店家名稱，
+比對時間只與評論長度有關，與詞彙數量無關。詞彙來源：
+
+- 人工整理的詞彙檔（lexicon/food_lexicon.txt）
+- extracted_food_items 中已提取的 dish_name / vendor_name（出現次數達門檻才採用）
+
+新的提取項目只需讀取上次之後新增的列（依 extracted_food_items.id），
+加入字典樹後重新建立失敗連結，不需重新讀取全部項目。
+"""
+
+import os
+from collections import Counter, deque
+from utils.content_hash import normalize_content
+
+# 太短或太泛用、無法代表具體食物的詞
+MIN_TERM_LENGTH = 2
+STOP_TERMS = {
+    '好吃', '不錯', '便宜', '划算', '食物', '小吃', '東西', '美食', '料理', '餐點',
+    '飲料', '甜點', '攤位', '攤販', '店家', '夜市', '老闆', '口味', '味道', '價格'
+}
+
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                    'lexicon', 'food_lexicon.txt')
+
+class AhoCorasickAutomaton:
+    """可逐步加入詞彙的 Aho-Corasick 自動機"""
+
+    def __init__(self):
+        """初始化只有根節點的自動機"""
+        self._goto = [{}]
+        self._fail = [0]
+        self._terms = [[]]    # 結束於各節點的詞彙
+        self._output = [[]]   # 含失敗連結上的詞彙，由 build 計算
+        self._dirty = False
+        self.term_count = 0
+
+    def add(self, term):
+        """
+        加入一個詞彙（加入後需呼叫 build 才會生效）
+
+        Returns:
+            bool: 是否為新詞彙
+        """
+        node = 0
+        for char in term:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._terms.append([])
+                self._goto[node][char] = next_node
+            node = next_node
+
+        if term in self._terms[node]:
+            return False
+        self._terms[node].append(term)
+        self.term_count += 1
+        self._dirty = True
+        return True
+
+    def build(self):
+        """以廣度優先走訪重新計算失敗連結與輸出集合"""
+        if not self._dirty:
+            return
+
+        # 從各節點自身結束的詞彙開始，再沿失敗連結合併
+        self._output = [list(terms) for terms in self._terms]
+        self._fail = [0] * len(self._goto)
+
+        queue = deque()
+        for child in self._goto[0].values():
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+        self._dirty = False
+
+    def find(self, text):
+        """
+        找出文字中出現的所有詞彙
+
+        Args:
+            text (str): 已正規化的文字
+
+        Returns:
+            list: 出現的詞彙（依結束位置排序，可能重複）
+        """
+        if self._dirty:
+            self.build()
+
+        matches = []
+        node = 0
+        for char in text:
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            if self._output[node]:
+                matches.extend(self._output[node])
+        return matches
+
+class FoodLexicon:
+    """料理與店家名稱詞彙表"""
+
+    def __init__(self, min_support=2):
+        """
+        初始化詞彙表
+
+        Args:
+            min_support (int): 提取項目中的名稱至少出現幾次才加入詞彙表
+        """
+        self.min_support = min_support
+        self.automaton = AhoCorasickAutomaton()
+        self.last_item_id = 0
+        self._support = Counter()
+        self.stats = {'curated_terms': 0, 'extracted_terms': 0, 'items_scanned': 0}
+
+    @staticmethod
+    def normalize_term(term):
+        """正規化詞彙，不適合作為比對依據時返回 None"""
+        if not term:
+            return None
+        normalized = normalize_content(term)
+        if len(normalized) < MIN_TERM_LENGTH or normalized in STOP_TERMS:
+            return None
+        return normalized
+
+    def load_curated(self, path=DEFAULT_LEXICON_PATH):
+        """
+        載入人工整理的詞彙檔（每行一個詞，# 開頭為註解）
+
+        Returns:
+            int: 新加入的詞彙數
+        """
+        added = 0
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                term = self.normalize_term(line.split('#', 1)[0].strip())
+                if term and self.automaton.add(term):
+                    added += 1
+        self.stats['curated_terms'] += added
+        self.automaton.build()
+        return added
+
+    def refresh_from_database(self, db_manager, batch_size=5000):
+        """
+        讀取上次之後新增的提取項目並加入詞彙
+
+        Args:
+            db_manager (DatabaseManager): 資料庫管理器
+            batch_size (int): 每頁數量
+
+        Returns:
+            int: 新加入的詞彙數
+        """
+        added = 0
+        pages = db_manager.iter_keyset_pages(
+            select_clause="id, dish_name, vendor_name",
+            from_clause="extracted_food_items",
+            id_column="id",
+            batch_size=batch_size,
+            start_after=self.last_item_id
+        )
+        for rows in pages:
+            for item_id, dish_name, vendor_name in rows:
+                for name in (dish_name, vendor_name):
+                    term = self.normalize_term(name)
+                    if term is None:
+                        continue
+                    self._support[term] += 1
+                    if self._support[term] >= self.min_support and self.automaton.add(term):
+                        added += 1
+            self.last_item_id = rows[-1][0]
+            self.stats['items_scanned'] += len(rows)
+
+        self.stats['extracted_terms'] += added
+        self.automaton.build()
+        return added
+
+    def match(self, content):
+        """
+        比對評論內容
+
+        Args:
+            content (str): 評論內容
+
+        Returns:
+            list: 出現的詞彙（不重複，依首次出現順序）
+        """
+        if not content:
+            return []
+        return list(dict.fromkeys(self.automaton.find(normalize_content(content))))
+
+    @property
+    def term_count(self):
+        """目前的詞彙數"""
+        return self.automaton.term_count
@@ -0,0 +1,290 @@
+"""
+本地評論分類器
+
+以 review_analysis 中既有的 Gemini 判別結果訓練字元 n-gram TF-IDF + 邏輯迴歸
+模型，輸出經 sigmoid 校準的機率。機率達到信心門檻的評論直接在本地判別，
+其餘評論才送交 Gemini。
+
+review_id % HOLDOUT_MODULUS == 0 的評論保留為評估資料，不參與訓練，分類時
+也一律送交 Gemini，讓重新評估與選擇門檻時使用的標記都來自 Gemini。
+
+需要 scikit-learn（pip install scikit-learn），只在訓練或載入模型時匯入。
+"""
+
+import os
+import pickle
+from datetime import datetime
+from config import LOCAL_CLASSIFIER
+from utils.content_hash import normalize_content
+
+MODEL_FORMAT_VERSION = 1
+HOLDOUT_MODULUS = 10
+
+# 評估時比較的信心門檻（機率 >= 門檻判為是，<= 1 - 門檻判為否）
+DEFAULT_THRESHOLDS = (0.8, 0.85, 0.9, 0.95, 0.97, 0.98, 0.99)
+
+def is_holdout(review_id):
+    """是否為保留評估資料（不參與訓練，分類時一律送交 Gemini）"""
+    return review_id % HOLDOUT_MODULUS == 0
+
+def get_model_path(stage, model_dir=None):
+    """取得處理階段的模型檔路徑"""
+    return os.path.join(model_dir or LOCAL_CLASSIFIER['model_dir'], f"{stage}.pkl")
+
+class LocalReviewClassifier:
+    """字元 n-gram TF-IDF + 校準邏輯迴歸的二元分類器"""
+
+    def __init__(self, stage, ngram_range=(1, 3), min_df=2, max_features=300000):
+        """
+        初始化分類器
+
+        Args:
+            stage (str): 處理階段 ('food_relevance', 'specific_food')
+            ngram_range (tuple): 字元 n-gram 範圍（中文評論不需斷詞）
+            min_df (int): n-gram 至少出現在幾則評論才納入
+            max_features (int): 特徵數上限
+        """
+        self.stage = stage
+        self.ngram_range = ngram_range
+        self.min_df = min_df
+        self.max_features = max_features
+        self.threshold = None
+        self.pipeline = None
+        self.metadata = {}
+
+    def fit(self, texts, labels):
+        """
+        訓練模型
+
+        Args:
+            texts (list): 評論內容
+            labels (list): 對應的判別結果 (True/False)
+
+        Returns:
+            LocalReviewClassifier: self
+        """
+        try:
+            from sklearn.calibration import CalibratedClassifierCV
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            from sklearn.linear_model import LogisticRegression
+            from sklearn.pipeline import make_pipeline
+        except ImportError:
+            raise ImportError("本地分類器需要 scikit-learn，請先執行 pip install scikit-learn")
+
+        labels = [bool(label) for label in labels]
+        minority = min(labels.count(True), labels.count(False))
+        if minority < 2:
+            raise ValueError("訓練資料的兩種標記都至少需要 2 則評論")
+
+        vectorizer = TfidfVectorizer(
+            analyzer='char_wb',
+            ngram_range=self.ngram_range,
+            min_df=self.min_df,
+            max_features=self.max_features,
+            sublinear_tf=True,
+            preprocessor=normalize_content
+        )
+        # 交叉驗證校準機率，讓門檻可直接解讀為預期準確率
+        classifier = CalibratedClassifierCV(
+            LogisticRegression(max_iter=1000, class_weight='balanced'),
+            method='sigmoid',
+            cv=min(5, minority)
+        )
+        self.pipeline = make_pipeline(vectorizer, classifier)
+        self.pipeline.fit(texts, labels)
+
+        self.metadata = {
+            'trained_at': datetime.now().isoformat(timespec='seconds'),
+            'train_size': len(labels),
+            'positive': labels.count(True)
+        }
+        return self
+
+    def predict_proba(self, texts):
+        """
+        計算判別為「是」的機率
+
+        Returns:
+            list: 與 texts 對應的機率
+        """
+        if self.pipeline is None:
+            raise RuntimeError("模型尚未訓練或載入")
+        if not texts:
+            return []
+
+        positive_index = list(self.pipeline.classes_).index(True)
+        return [float(row[positive_index]) for row in self.pipeline.predict_proba(texts)]
+
+    def classify(self, reviews, threshold=None):
+        """
+        判別評論，信心不足或屬於保留評估資料時為 None
+
+        Args:
+            reviews (list): [(id, content), ...]
+            threshold (float): 信心門檻，預設使用訓練時選擇的門檻
+
+        Returns:
+            list: 與 reviews 對應的結果 (True/False/None)
+        """
+        threshold = threshold or self.threshold
+        if threshold is None:
+            raise ValueError("未設定信心門檻")
+
+        candidates = [i for i, (review_id, _) in enumerate(reviews) if not is_holdout(review_id)]
+        probabilities = self.predict_proba([reviews[i][1] for i in candidates])
+
+        results = [None] * len(reviews)
+        for i, probability in zip(candidates, probabilities):
+            if probability >= threshold:
+                results[i] = True
+            elif probability <= 1 - threshold:
+                results[i] = False
+        return results
+
+    def fill_results(self, reviews, results, threshold=None):
+        """
+        以本地判別填入尚無結果的位置（例如回應快取未命中的評論）
+
+        Args:
+            reviews (list): [(id, content), ...]
+            results (list): 與 reviews 對應的結果，None 的位置會嘗試填入
+            threshold (float): 信心門檻
+
+        Returns:
+            int: 填入的評論數
+        """
+        missing = [i for i, result in enumerate(results) if result is None]
+        if not missing:
+            return 0
+
+        filled = 0
+        local_results = self.classify([reviews[i] for i in missing], threshold)
+        for i, result in zip(missing, local_results):
+            if result is not None:
+                results[i] = result
+                filled += 1
+        return filled
+
+    def save(self, path):
+        """儲存模型、門檻與訓練資訊"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        state = {
+            'format': MODEL_FORMAT_VERSION,
+            'stage': self.stage,
+            'params': {'ngram_range': self.ngram_range, 'min_df': self.min_df, 'max_features': self.max_features},
+            'threshold': self.threshold,
+            'metadata': self.metadata,
+            'pipeline': self.pipeline
+        }
+        with open(path, 'wb') as f:
+            pickle.dump(state, f)
+
+    @classmethod
+    def load(cls, path, stage=None):
+        """
+        載入模型（僅載入本專案訓練產生的檔案）
+
+        Args:
+            path (str): 模型檔路徑
+            stage (str): 預期的處理階段，不符時拋出 ValueError
+
+        Returns:
+            LocalReviewClassifier: 分類器
+        """
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+
+        if state.get('format') != MODEL_FORMAT_VERSION:
+            raise ValueError(f"不支援的模型格式: {state.get('format')}，請重新訓練")
+        if stage and state['stage'] != stage:
+            raise ValueError(f"模型為 {state['stage']} 階段，而非 {stage}")
+
+        classifier = cls(state['stage'], **state['params'])
+        classifier.threshold = state['threshold']
+        classifier.metadata = state['metadata']
+        classifier.pipeline = state['pipeline']
+        return classifier
+
+def evaluate_predictions(probabilities, labels, thresholds=DEFAULT_THRESHOLDS, calibration_bins=10):
+    """
+    評估預測結果
+
+    Args:
+        probabilities (list): 判別為「是」的機率
+        labels (list): Gemini 判別結果
+        thresholds (tuple): 要比較的信心門檻
+        calibration_bins (int): 校準曲線的分組數
+
+    Returns:
+        dict: 整體指標 (0.5 門檻)、Brier 分數、各門檻的涵蓋率與準確率、校準分組
+    """
+    total = len(labels)
+    if not total:
+        raise ValueError("沒有評估資料")
+
+    labels = [bool(label) for label in labels]
+    predicted = [probability >= 0.5 for probability in probabilities]
+    true_positive = sum(1 for p, y in zip(predicted, labels) if p and y)
+    false_positive = sum(1 for p, y in zip(predicted, labels) if p and not y)
+    false_negative = sum(1 for p, y in zip(predicted, labels) if not p and y)
+
+    precision = true_positive / (true_positive + false_positive) if true_positive + false_positive else 0.0
+    recall = true_positive / (true_positive + false_negative) if true_positive + false_negative else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+    report = {
+        'size': total,
+        'positive': labels.count(True),
+        'accuracy': sum(1 for p, y in zip(predicted, labels) if p == y) / total,
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'brier': sum((probability - y) ** 2 for probability, y in zip(probabilities, labels)) / total,
+        'thresholds': [],
+        'calibration': []
+    }
+
+    for threshold in thresholds:
+        covered = [(probability >= threshold, y) for probability, y in zip(probabilities, labels)
+                   if probability >= threshold or probability <= 1 - threshold]
+        correct = sum(1 for p, y in covered if p == y)
+        report['thresholds'].append({
+            'threshold': threshold,
+            'coverage': len(covered) / total,
+            'accuracy': correct / len(covered) if covered else None
+        })
+
+    # 校準：各機率區間的平均預測機率與實際比例應接近
+    for b in range(calibration_bins):
+        low, high = b / calibration_bins, (b + 1) / calibration_bins
+        members = [(probability, y) for probability, y in zip(probabilities, labels)
+                   if low <= probability < high or (b == calibration_bins - 1 and probability == 1.0)]
+        if members:
+            report['calibration'].append({
+                'range': [low, high],
+                'count': len(members),
+                'mean_probability': sum(probability for probability, _ in members) / len(members),
+                'positive_rate': sum(1 for _, y in members if y) / len(members)
+            })
+
+    return report
+
+def choose_threshold(report, target_accuracy=None):
+    """
+    選擇涵蓋率最高且準確率達到目標的信心門檻
+
+    Args:
+        report (dict): evaluate_predictions 的結果
+        target_accuracy (float): 本地判別評論的目標準確率，預設依 LOCAL_CLASSIFIER
+
+    Returns:
+        float or None: 信心門檻，沒有門檻達到目標時為 None
+    """
+    target_accuracy = target_accuracy or LOCAL_CLASSIFIER['target_accuracy']
+    for entry in sorted(report['thresholds'], key=lambda entry: entry['threshold']):
+        if entry['accuracy'] is not None and entry['accuracy'] >= target_accuracy:
+            return entry['threshold']
+    return None
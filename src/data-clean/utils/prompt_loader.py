@@ -10,10 +10,12 @@ from prompts import (
     get_food_relevance_batch_prompt,
     get_food_relevance_single_prompt,
     get_specific_food_batch_prompt,
-    get_specific_food_single_prompt
+    get_specific_food_single_prompt,
+    get_fused_batch_prompt
 )
 from prompts.food_relevance_prompts import get_prompt_info as get_food_relevance_info
 from prompts.specific_food_prompts import get_prompt_info as get_specific_food_info
+from prompts.fused_prompts import get_prompt_info as get_fused_info
 
 class PromptLoader:
     """Prompt 載入和管理類別"""
@@ -23,30 +25,32 @@ class PromptLoader:
         self.prompt_cache = {}
         self.usage_stats = {
             'food_relevance': {'batch': 0, 'single': 0},
-            'specific_food': {'batch': 0, 'single': 0}
+            'specific_food': {'batch': 0, 'single': 0},
+            'fused': {'batch': 0, 'single': 0}
         }
 
-    def get_food_relevance_prompt(self, review_batch=None, content=None):
+    def get_food_relevance_prompt(self, review_batch=None, content=None, structured=False):
         """
         取得食物相關性判別 prompt
 
         Args:
             review_batch (list): 批次評論列表 [(id, content), ...]
             content (str): 單則評論內容
+            structured (bool): 批次 prompt 是否要求以評論 id 為鍵的 JSON 陣列回應
 
         Returns:
             str: 格式化後的 prompt
         """
         if review_batch is not None:
             self.usage_stats['food_relevance']['batch'] += 1
-            return get_food_relevance_batch_prompt(review_batch)
+            return get_food_relevance_batch_prompt(review_batch, structured)
         elif content is not None:
             self.usage_stats['food_relevance']['single'] += 1
             return get_food_relevance_single_prompt(content)
         else:
             raise ValueError("必須提供 review_batch 或 content 參數")
 
-    def get_specific_food_prompt(self, review_batch=None, content=None, include_examples=True):
+    def get_specific_food_prompt(self, review_batch=None, content=None, include_examples=True, structured=False):
         """
         取得具體食物項目判別 prompt
 
@@ -54,25 +58,39 @@ class PromptLoader:
             review_batch (list): 批次評論列表 [(id, content), ...]
             content (str): 單則評論內容
             include_examples (bool): 是否包含範例
+            structured (bool): 批次 prompt 是否要求以評論 id 為鍵的 JSON 陣列回應
 
         Returns:
             str: 格式化後的 prompt
         """
         if review_batch is not None:
             self.usage_stats['specific_food']['batch'] += 1
-            return get_specific_food_batch_prompt(review_batch, include_examples)
+            return get_specific_food_batch_prompt(review_batch, include_examples, structured)
         elif content is not None:
             self.usage_stats['specific_food']['single'] += 1
             return get_specific_food_single_prompt(content, include_examples)
         else:
             raise ValueError("必須提供 review_batch 或 content 參數")
 
+    def get_fused_prompt(self, review_batch):
+        """
+        取得融合判別 prompt（相關性、具體提及與項目提取）
+
+        Args:
+            review_batch (list): 批次評論列表 [(id, content), ...]
+
+        Returns:
+            str: 格式化後的 prompt
+        """
+        self.usage_stats['fused']['batch'] += 1
+        return get_fused_batch_prompt(review_batch)
+
     def get_prompt_info(self, prompt_type):
         """
         取得 prompt 版本資訊
 
         Args:
-            prompt_type (str): prompt 類型 ('food_relevance' 或 'specific_food')
+            prompt_type (str): prompt 類型 ('food_relevance'、'specific_food' 或 'fused')
 
         Returns:
             dict: prompt 版本資訊
@@ -81,6 +99,8 @@ class PromptLoader:
             return get_food_relevance_info()
         elif prompt_type == 'specific_food':
             return get_specific_food_info()
+        elif prompt_type == 'fused':
+            return get_fused_info()
         else:
             raise ValueError("不支援的 prompt 類型")
 
@@ -94,6 +114,7 @@ class PromptLoader:
         return {
             'food_relevance': self.get_prompt_info('food_relevance'),
             'specific_food': self.get_prompt_info('specific_food'),
+            'fused': self.get_prompt_info('fused'),
             'last_updated': datetime.now().isoformat()
         }
 
@@ -118,7 +139,8 @@ class PromptLoader:
         """重置使用統計"""
         self.usage_stats = {
             'food_relevance': {'batch': 0, 'single': 0},
-            'specific_food': {'batch': 0, 'single': 0}
+            'specific_food': {'batch': 0, 'single': 0},
+            'fused': {'batch': 0, 'single': 0}
         }
 
     def cache_prompt(self, key, prompt):
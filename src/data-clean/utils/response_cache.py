@@ -0,0 +1,163 @@
+"""
+LLM 回應持久化快取工具
+
+以 SQLite 保存每則評論的判別結果，鍵值為 (模型名稱, prompt 版本, 正規化內容雜湊)。
+中斷後重新執行、調整下游步驟或處理內容重疊的其他市場時，相同模型與 prompt
+版本下已判別過的內容直接取用快取，不再呼叫 Gemini。
+
+快取大小以筆數限制，超過上限時依最後使用時間淘汰最久未使用的紀錄 (LRU)。
+prompt 內容變更時請更新 prompts/ 中的 PROMPT_VERSION，舊版本的紀錄不會再被命中，
+會隨 LRU 淘汰。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+class ResponseCache:
+    """以 SQLite 保存的 LRU 回應快取"""
+
+    def __init__(self, path, max_entries=200000):
+        """
+        初始化快取
+
+        Args:
+            path (str): SQLite 檔案路徑，目錄不存在時自動建立
+            max_entries (int): 最多保存的紀錄數
+        """
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # 非同步客戶端的背景執行緒也可能使用快取，以鎖保護同一個連線
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_response_cache (
+                model_name TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                result TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model_name, prompt_version, content_hash)
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_response_cache_last_used ON llm_response_cache(last_used)"
+        )
+        self._conn.commit()
+
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+
+    def get_many(self, model_name, prompt_version, content_hashes):
+        """
+        查詢多則內容的快取結果
+
+        Args:
+            model_name (str): 模型名稱
+            prompt_version (str): prompt 版本
+            content_hashes (list): 內容雜湊列表
+
+        Returns:
+            list: 與 content_hashes 對應的結果，未命中為 None
+        """
+        if not content_hashes:
+            return []
+
+        unique_hashes = list(dict.fromkeys(content_hashes))
+        placeholders = ', '.join(['?'] * len(unique_hashes))
+        query = f"""
+            SELECT content_hash, result FROM llm_response_cache
+            WHERE model_name = ? AND prompt_version = ? AND content_hash IN ({placeholders})
+        """
+
+        with self._lock:
+            rows = self._conn.execute(query, [model_name, prompt_version] + unique_hashes).fetchall()
+            found = {digest: json.loads(result) for digest, result in rows}
+
+            # 更新命中紀錄的最後使用時間
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE llm_response_cache SET last_used = ? "
+                    "WHERE model_name = ? AND prompt_version = ? AND content_hash = ?",
+                    [(now, model_name, prompt_version, digest) for digest in found]
+                )
+                self._conn.commit()
+
+        results = [found.get(digest) for digest in content_hashes]
+        hits = sum(1 for result in results if result is not None)
+        self.stats['hits'] += hits
+        self.stats['misses'] += len(results) - hits
+        return results
+
+    def put_many(self, model_name, prompt_version, entries):
+        """
+        寫入多則內容的結果，結果為 None 的項目略過
+
+        Args:
+            model_name (str): 模型名稱
+            prompt_version (str): prompt 版本
+            entries (list): [(content_hash, result), ...]，result 需可序列化為 JSON
+
+        Returns:
+            int: 寫入的紀錄數
+        """
+        now = time.time()
+        rows = [(model_name, prompt_version, digest, json.dumps(result, ensure_ascii=False), now)
+                for digest, result in entries if result is not None]
+        if not rows:
+            return 0
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO llm_response_cache "
+                "(model_name, prompt_version, content_hash, result, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self._conn.commit()
+
+        self.stats['writes'] += len(rows)
+        return len(rows)
+
+    def _evict(self):
+        """超過筆數上限時淘汰最久未使用的紀錄（呼叫端需持有鎖）"""
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_response_cache").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+
+        self._conn.execute("""
+            DELETE FROM llm_response_cache WHERE rowid IN (
+                SELECT rowid FROM llm_response_cache ORDER BY last_used LIMIT ?
+            )
+        """, (excess,))
+        self.stats['evictions'] += excess
+
+    def get_stats(self):
+        """
+        取得快取統計
+
+        Returns:
+            dict: 命中、未命中、寫入、淘汰次數與命中率、目前筆數
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_response_cache").fetchone()[0]
+
+        stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups * 100 if lookups else 0.0
+        stats['entries'] = entries
+        stats['max_entries'] = self.max_entries
+        return stats
+
+    def close(self):
+        """關閉 SQLite 連線"""
+        with self._lock:
+            self._conn.close()
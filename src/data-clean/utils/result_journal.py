@@ -0,0 +1,315 @@
+"""
+LLM 結果預寫日誌工具
+
+在寫入資料庫之前先將 Gemini 判別結果附加到本地 JSONL 檔案，
+資料庫更新成功後再附加一筆 commit 記錄。資料庫中斷時已付費的結果
+不會遺失，可在下次執行或透過 replay_journal.py 重新套用。
+
+檔案格式（每行一筆 JSON）:
+    {"type": "result", "batch_id": "...", "column": "is_project_related", "source": "gemini",
+     "entries": [[review_id, label], ...], "written_at": "..."}
+    {"type": "commit", "batch_id": "...", "written_at": "..."}
+
+寫入中的日誌以同名的 .lock 檔加上檔案鎖。分析腳本啟動時以 recover_journals
+重播並壓縮同一處理階段所有未被其他程序使用的日誌（包含已結束的 worker 留下的
+檔案），日誌不會無限增長，重新啟動的 worker 也會接手前一個程序未寫入的結果。
+"""
+
+import glob
+import json
+import os
+import re
+import uuid
+from datetime import datetime
+from config import JOURNAL_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+def _try_lock(lock_file):
+    """
+    以不阻塞的方式對已開啟的檔案加上排他鎖（關閉檔案時自動解除）
+
+    Returns:
+        bool: 是否取得鎖
+    """
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+class ResultJournal:
+    """僅附加寫入的 LLM 結果日誌"""
+
+    def __init__(self, path):
+        """
+        初始化結果日誌
+
+        Args:
+            path (str): 日誌檔案路徑，目錄不存在時自動建立
+        """
+        self.path = path
+        self._lock_file = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def lock_path(self):
+        """鎖定檔路徑"""
+        return f"{self.path}.lock"
+
+    def acquire(self):
+        """
+        取得日誌檔的排他鎖，持有期間其他程序不會重播、壓縮或寫入此檔
+
+        Returns:
+            bool: 是否取得鎖（檔案正被其他程序使用時為 False）
+        """
+        if self._lock_file is not None:
+            return True
+
+        lock_file = open(self.lock_path, 'a+')
+        if not _try_lock(lock_file):
+            lock_file.close()
+            return False
+
+        self._lock_file = lock_file
+        self._terminate_partial_line()
+        return True
+
+    def release(self):
+        """釋放排他鎖"""
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def remove(self):
+        """刪除日誌檔與鎖定檔（須持有鎖，且日誌中沒有未提交的批次）"""
+        os.remove(self.path)
+        lock_path = self.lock_path
+        self.release()
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+    def _terminate_partial_line(self):
+        """程序中斷可能留下沒有換行的半行，補上換行避免後續記錄接在同一行"""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+
+    def _append(self, record):
+        """附加一筆記錄並強制寫入磁碟"""
+        record['written_at'] = datetime.now().isoformat()
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append_results(self, column, updates, source=None):
+        """
+        寫入一批待提交的標記結果
+
+        Args:
+            column (str): 標記欄位名稱
+            updates (list): 更新列表 [(label, review_id), ...]
+            source (str): 標記來源（重播時一併寫回），例如 'gemini'、'local'
+
+        Returns:
+            str: 批次 ID，提交成功後傳給 mark_committed
+        """
+        batch_id = uuid.uuid4().hex
+        self._append({
+            'type': 'result',
+            'batch_id': batch_id,
+            'column': column,
+            'source': source,
+            'entries': [[review_id, label] for label, review_id in updates]
+        })
+        return batch_id
+
+    def mark_committed(self, batch_id):
+        """
+        標記批次已成功寫入資料庫
+
+        Args:
+            batch_id (str): append_results 返回的批次 ID
+        """
+        self._append({'type': 'commit', 'batch_id': batch_id})
+
+    def read_pending(self):
+        """
+        讀取尚未提交的批次
+
+        Returns:
+            list: [{'batch_id', 'column', 'source', 'entries'}, ...]，依寫入順序排列
+        """
+        if not os.path.exists(self.path):
+            return []
+
+        pending = {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 程序中斷時最後一行可能不完整，該批次未提交資料庫也不影響
+                    print(f"略過無法解析的日誌行 {self.path}:{line_number}")
+                    continue
+
+                if record.get('type') == 'result':
+                    pending[record['batch_id']] = record
+                elif record.get('type') == 'commit':
+                    pending.pop(record['batch_id'], None)
+
+        return list(pending.values())
+
+    def replay(self, db_manager, dry_run=False):
+        """
+        將未提交的批次套用到資料庫
+
+        Args:
+            db_manager (ReviewAnalysisManager): 資料庫管理器
+            dry_run (bool): 只統計不寫入
+
+        Returns:
+            dict: {'batches': int, 'entries': int}
+        """
+        stats = {'batches': 0, 'entries': 0}
+        for record in self.read_pending():
+            updates = [(label, review_id) for review_id, label in record['entries']]
+            if not dry_run:
+                db_manager.bulk_update_labels(record['column'], updates, source=record.get('source'))
+                self.mark_committed(record['batch_id'])
+            stats['batches'] += 1
+            stats['entries'] += len(updates)
+        return stats
+
+    def compact(self):
+        """
+        重寫日誌檔，只保留未提交的批次
+
+        Returns:
+            int: 保留的批次數
+        """
+        if not os.path.exists(self.path):
+            return 0
+
+        pending = self.read_pending()
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for record in pending:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        return len(pending)
+
+def journal_paths(stage, journal_dir=JOURNAL_DIR):
+    """
+    取得處理階段的所有日誌檔（<stage>.jsonl 與各 worker 的 <stage>.*.jsonl）
+
+    Returns:
+        list: 日誌檔路徑，依檔名排序
+    """
+    paths = glob.glob(os.path.join(journal_dir, f"{stage}.jsonl"))
+    paths += glob.glob(os.path.join(journal_dir, f"{stage}.*.jsonl"))
+    return sorted(paths)
+
+def recover_journal(journal, db_manager, keep_file=True):
+    """
+    重播並壓縮單一日誌檔（呼叫端須持有鎖）
+
+    Args:
+        journal (ResultJournal): 已取得鎖的日誌
+        db_manager (ReviewAnalysisManager): 資料庫管理器
+        keep_file (bool): 壓縮後沒有未提交的批次時是否保留空檔案
+
+    Returns:
+        dict: {'batches': int, 'entries': int, 'remaining': int}
+    """
+    stats = journal.replay(db_manager)
+    stats['remaining'] = journal.compact()
+    if not stats['remaining'] and not keep_file and os.path.exists(journal.path):
+        journal.remove()
+    return stats
+
+def recover_journals(stage, db_manager, current=None, journal_dir=JOURNAL_DIR):
+    """
+    重播並壓縮處理階段所有未被其他程序使用的日誌
+
+    已結束的程序（例如重新啟動前的 worker）留下的檔案重播後若已全部提交則刪除；
+    正被其他程序寫入的檔案取不到鎖，略過不處理。
+
+    Args:
+        stage (str): 處理階段名稱
+        db_manager (ReviewAnalysisManager): 資料庫管理器
+        current (ResultJournal): 本程序使用中的日誌（已持有鎖，壓縮後保留檔案）
+        journal_dir (str): 日誌目錄
+
+    Returns:
+        dict: {'files': int, 'batches': int, 'entries': int, 'in_use': int, 'failed': list}
+    """
+    totals = {'files': 0, 'batches': 0, 'entries': 0, 'in_use': 0, 'failed': []}
+    current_path = os.path.abspath(current.path) if current is not None else None
+
+    for path in journal_paths(stage, journal_dir):
+        is_current = os.path.abspath(path) == current_path
+        journal = current if is_current else ResultJournal(path)
+        if not journal.acquire():
+            totals['in_use'] += 1
+            continue
+
+        try:
+            stats = recover_journal(journal, db_manager, keep_file=is_current)
+        except Exception as e:
+            totals['failed'].append((path, e))
+            continue
+        finally:
+            if not is_current:
+                journal.release()
+
+        totals['files'] += 1
+        totals['batches'] += stats['batches']
+        totals['entries'] += stats['entries']
+
+    return totals
+
+# 便利函數
+def create_result_journal(stage, worker_id=None, journal_dir=JOURNAL_DIR):
+    """
+    建立並鎖定處理階段的結果日誌
+
+    Args:
+        stage (str): 處理階段名稱
+        worker_id (str): 租約模式的認領者識別碼，各程序使用獨立檔案避免交錯寫入
+        journal_dir (str): 日誌目錄
+
+    Returns:
+        ResultJournal: 已取得鎖的結果日誌實例（檔案使用中時改用以程序 ID 命名的檔案）
+    """
+    filename = stage
+    if worker_id:
+        filename += '.' + re.sub(r'[^A-Za-z0-9_.-]', '_', worker_id)
+
+    journal = ResultJournal(os.path.join(journal_dir, f"{filename}.jsonl"))
+    if not journal.acquire():
+        journal = ResultJournal(os.path.join(journal_dir, f"{filename}.pid{os.getpid()}.jsonl"))
+        journal.acquire()
+    return journal
@@ -0,0 +1,27 @@
+"""
+Token 數估算工具
+
+以字元類型估算 Gemini 的 token 數，不需呼叫 count_tokens API。
+中日韓文字約每字 1 token，其他文字約每 4 個字元 1 token，估算值偏保守。
+"""
+
+import math
+import re
+
+_CJK_PATTERN = re.compile(r'[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]')
+
+def estimate_tokens(text):
+    """
+    估算文字的 token 數
+
+    Args:
+        text (str): 輸入文字
+
+    Returns:
+        int: 估算的 token 數
+    """
+    if not text:
+        return 0
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    other_count = len(text) - cjk_count
+    return cjk_count + math.ceil(other_count / 4)
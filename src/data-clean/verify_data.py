@@ -1,52 +1,89 @@
 #!/usr/bin/env python3
-import mysql.connector
-from config import DATABASE_CONFIG
+"""
+資料驗證腳本
+
+顯示匯入概況，並執行參照完整性與資料品質檢查：
+- review_analysis.review_id 是否都對應到 reviews
+- extracted_food_items.review_id 是否都對應到 review_analysis
+- reviews.review_id 是否重複、rating 是否為 NULL
+- 各階段標記是否前後一致
+
+檢查以 id 範圍分段並在連線池上平行執行，結果寫入 JSON 報告；
+有 error 等級的違規時以結束碼 1 結束，可作為管線執行前的關卡。
+
+使用方式:
+    python verify_data.py
+    python verify_data.py --workers 8 --chunk-size 100000 --report data_quality_report.json
+    python verify_data.py --strict   # warning 等級的違規也視為失敗
+"""
+
+import argparse
+import sys
+from utils.database_manager import DatabaseManager
+from utils.data_quality_checker import DataQualityChecker, save_report
+
+def print_import_summary(db_manager):
+    """顯示資料匯入概況"""
+    search_count = db_manager.execute_query("SELECT COUNT(*) FROM search_metadata", fetch_all=False)[0]
+    reviews_count = db_manager.execute_query("SELECT COUNT(*) FROM reviews", fetch_all=False)[0]
+    analysis_count = db_manager.execute_query("SELECT COUNT(*) FROM review_analysis", fetch_all=False)[0]
+    print(f"search_metadata 表記錄數: {search_count}")
+    print(f"reviews 表記錄數: {reviews_count}")
+    print(f"review_analysis 表記錄數: {analysis_count}")
+
+    date_range = db_manager.execute_query(
+        "SELECT MIN(iso_date), MAX(iso_date) FROM reviews WHERE iso_date IS NOT NULL",
+        fetch_all=False
+    )
+    if date_range[0]:
+        print(f"評論時間範圍: {date_range[0]} 至 {date_range[1]}")
+
+def print_check_results(report):
+    """顯示檢查結果"""
+    print(f"\n=== 資料品質檢查 ({report['duration_seconds']} 秒) ===")
+    for name, result in report['checks'].items():
+        if result['violations'] == 0:
+            mark = '✓'
+        elif result['severity'] == 'error':
+            mark = '✗'
+        else:
+            mark = '⚠'
+        print(f"{mark} {name}: {result['violations']} 筆 - {result['description']}")
+        if result['samples']:
+            print(f"    樣本 id: {', '.join(str(sample) for sample in result['samples'])}")
 
 def verify_import():
     """驗證資料匯入結果"""
+    parser = argparse.ArgumentParser(description='參照完整性與資料品質檢查')
+    parser.add_argument('--workers', type=int, default=4, help='平行查詢數')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='每段 id 範圍大小')
+    parser.add_argument('--report', default='data_quality_report.json', help='JSON 報告輸出路徑')
+    parser.add_argument('--strict', action='store_true', help='warning 等級的違規也以非零結束碼結束')
+    args = parser.parse_args()
+
     try:
-        conn = mysql.connector.connect(**DATABASE_CONFIG)
-        cursor = conn.cursor()
-
-        # 檢查search_metadata表
-        cursor.execute("SELECT COUNT(*) FROM search_metadata")
-        search_count = cursor.fetchone()[0]
-        print(f"search_metadata 表記錄數: {search_count}")
-
-        # 檢查reviews表
-        cursor.execute("SELECT COUNT(*) FROM reviews")
-        reviews_count = cursor.fetchone()[0]
-        print(f"reviews 表記錄數: {reviews_count}")
-
-        # 顯示search_metadata詳細資訊
-        cursor.execute("SELECT * FROM search_metadata LIMIT 1")
-        search_data = cursor.fetchone()
-        if search_data:
-            print(f"\n搜尋元數據:")
-            print(f"- 地點名稱: {search_data[4]}")  # title
-            print(f"- 地址: {search_data[5]}")      # address
-            print(f"- 評分: {search_data[6]}")      # rating
-            print(f"- 總評論數: {search_data[7]}")   # reviews
-
-        # 顯示部分評論資料
-        cursor.execute("SELECT review_id, rating, snippet FROM reviews LIMIT 3")
-        review_samples = cursor.fetchall()
-        print(f"\n評論範例:")
-        for i, review in enumerate(review_samples, 1):
-            snippet = review[2][:100] + "..." if review[2] and len(review[2]) > 100 else review[2]
-            print(f"{i}. 評分: {review[1]}, 內容: {snippet}")
-
-        # 檢查日期範圍
-        cursor.execute("SELECT MIN(iso_date), MAX(iso_date) FROM reviews WHERE iso_date IS NOT NULL")
-        date_range = cursor.fetchone()
-        if date_range[0]:
-            print(f"\n評論時間範圍: {date_range[0]} 至 {date_range[1]}")
-
-        cursor.close()
-        conn.close()
+        print_import_summary(DatabaseManager())
+
+        checker = DataQualityChecker(max_workers=args.workers, chunk_size=args.chunk_size)
+        try:
+            report = checker.run()
+        finally:
+            checker.close()
+
+        print_check_results(report)
+        save_report(report, args.report)
+        print(f"\n報告已寫入 {args.report}")
 
     except Exception as e:
         print(f"驗證錯誤: {e}")
+        return 2
+
+    if not report['passed'] or (args.strict and report['warnings']):
+        print("✗ 資料品質檢查未通過")
+        return 1
+
+    print("✓ 資料品質檢查通過")
+    return 0
 
 if __name__ == "__main__":
-    verify_import()
\ No newline at end of file
+    sys.exit(verify_import())